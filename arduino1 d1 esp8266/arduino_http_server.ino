@@ -1,5 +1,6 @@
 #include <ESP8266WiFi.h>
 #include <ESP8266WebServer.h>
+#include <WiFiUdp.h>
 #include <DHT.h>
 
 // WiFi credentials
@@ -22,6 +23,31 @@ DHT dht(DHTPIN, DHTTYPE);
 const float TEMP_OFFSET = 1.2;  // Adjusted to match thermometer
 const float HUMIDITY_OFFSET = 5.0;  // Adjusted to match thermometer
 
+// The DHT11 is sampled from loop() on a timer and handlers answer from
+// these cached values, so no request waits for a sensor read
+const unsigned long DHT_SAMPLE_INTERVAL = 2000;  // DHT11 needs >1 s between reads
+// After three failed samples in a row the cached values are no longer
+// reported (SENSOR_MAX_AGE in rpi5/arduino_client.py)
+const unsigned long DHT_MAX_AGE = 3 * DHT_SAMPLE_INTERVAL;
+float cachedTemperature = NAN;
+float cachedHumidity = NAN;
+unsigned long lastDhtSample = 0;
+unsigned long lastDhtGood = 0;
+
+// Push telemetry: the state is sent to the RPI5 as a UDP datagram when it
+// changes (and every TELEMETRY_HEARTBEAT ms), so the Pi sees a button press
+// without waiting for its next poll. Leave TELEMETRY_HOST empty to disable.
+const char* TELEMETRY_HOST = "";  // RPI5 IP address, e.g. "192.168.0.20"
+const uint16_t TELEMETRY_PORT = 5005;  // TELEMETRY_PORT in config.env
+const char* DEVICE_ID = "arduino1";  // id of this board in rpi5/devices.json
+const unsigned long TELEMETRY_CHECK_INTERVAL = 100;
+const unsigned long TELEMETRY_HEARTBEAT = 10000;
+WiFiUDP telemetry;
+unsigned long telemetrySeq = 0;
+unsigned long lastTelemetryCheck = 0;
+unsigned long lastTelemetrySent = 0;
+char lastTelemetryState[160] = "";
+
 void setup() {
   Serial.begin(115200);
   delay(100);
@@ -44,6 +70,7 @@ void setup() {
   // Initialize DHT sensor
   dht.begin();
   Serial.println("DHT sensor initialized on D11");
+  sampleDHT();
 
   // Define HTTP routes
   setupRoutes();
@@ -56,6 +83,14 @@ void setup() {
 void loop() {
   server.handleClient();
 
+  if (millis() - lastDhtSample >= DHT_SAMPLE_INTERVAL) {
+    sampleDHT();
+  }
+
+  if (TELEMETRY_HOST[0] != '\0' && millis() - lastTelemetryCheck >= TELEMETRY_CHECK_INTERVAL) {
+    pushTelemetry();
+  }
+
   // Button debounce logic
   static unsigned long lastPress = 0;
   if (digitalRead(BUTTON_PIN) == LOW) {
@@ -67,6 +102,76 @@ void loop() {
   }
 }
 
+void sampleDHT() {
+  lastDhtSample = millis();
+  float temperature = dht.readTemperature();
+  float humidity = dht.readHumidity();
+
+  if (isnan(temperature) || isnan(humidity)) {
+    Serial.println("[ERROR] Failed to read from DHT sensor");
+    return;  // keep the last good values; /state reports their age
+  }
+  cachedTemperature = temperature + TEMP_OFFSET;
+  cachedHumidity = humidity + HUMIDITY_OFFSET;
+  lastDhtGood = lastDhtSample;
+}
+
+// Whether the cached DHT values are from a recent good read
+bool dhtFresh() {
+  return !isnan(cachedTemperature) && !isnan(cachedHumidity) && millis() - lastDhtGood <= DHT_MAX_AGE;
+}
+
+// Every pin and the cached sensor values as JSON members (no braces):
+// switches as 0/1, readings as numbers (null without a recent good DHT read)
+void formatState(char* buffer, size_t size) {
+  char temperature[8] = "null";
+  char humidity[8] = "null";
+  if (dhtFresh()) {
+    dtostrf(cachedTemperature, 1, 1, temperature);
+    dtostrf(cachedHumidity, 1, 1, humidity);
+  }
+
+  snprintf(buffer, size,
+           "\"v\":1,\"led\":%d,\"builtin_led\":%d,\"button\":%d,\"temperature\":%s,\"humidity\":%s,\"ip\":\"%s\"",
+           digitalRead(LED_PIN) ? 1 : 0,
+           digitalRead(BUILTIN_LED_PIN) == LOW ? 1 : 0,
+           digitalRead(BUTTON_PIN) == LOW ? 1 : 0,
+           temperature,
+           humidity,
+           WiFi.localIP().toString().c_str());
+}
+
+// Response of /state and /set: the state plus sensor_age = ms since the last
+// good DHT sample
+void sendState() {
+  char state[160];
+  formatState(state, sizeof(state));
+
+  char response[192];
+  snprintf(response, sizeof(response), "{%s,\"sensor_age\":%lu}", state, millis() - lastDhtGood);
+
+  server.send(200, "application/json", response);
+}
+
+void pushTelemetry() {
+  lastTelemetryCheck = millis();
+  char state[160];
+  formatState(state, sizeof(state));
+  if (strcmp(state, lastTelemetryState) == 0 && millis() - lastTelemetrySent < TELEMETRY_HEARTBEAT) {
+    return;
+  }
+
+  char packet[224];
+  int length = snprintf(packet, sizeof(packet), "{\"id\":\"%s\",\"seq\":%lu,%s,\"sensor_age\":%lu}",
+                        DEVICE_ID, ++telemetrySeq, state, millis() - lastDhtGood);
+  telemetry.beginPacket(TELEMETRY_HOST, TELEMETRY_PORT);
+  telemetry.write((const uint8_t*)packet, length);
+  telemetry.endPacket();
+
+  strcpy(lastTelemetryState, state);
+  lastTelemetrySent = millis();
+}
+
 void connectToWiFi() {
   Serial.println();
   Serial.print("Connecting to WiFi: ");
@@ -99,19 +204,8 @@ void setupRoutes() {
     String buttonState = digitalRead(BUTTON_PIN) ? "RELEASED" : "PRESSED";
     String builtinLedState = (digitalRead(BUILTIN_LED_PIN) == LOW) ? "ON" : "OFF";
 
-    float temperature = dht.readTemperature() + TEMP_OFFSET;
-    float humidity = dht.readHumidity() + HUMIDITY_OFFSET;
-
-    if (isnan(temperature) || isnan(humidity)) {
-      Serial.println("[ERROR] Failed to read from DHT sensor");
-    } else {
-      Serial.print("[INFO] Temperature: ");
-      Serial.print(temperature);
-      Serial.println(" °C");
-      Serial.print("[INFO] Humidity: ");
-      Serial.print(humidity);
-      Serial.println(" %");
-    }
+    float temperature = cachedTemperature;
+    float humidity = cachedHumidity;
 
     String response = "{\"led\":\"";
     response += ledState;
@@ -122,7 +216,7 @@ void setupRoutes() {
     response += "\",\"ip\":\"";
     response += WiFi.localIP().toString();
 
-    if (!isnan(temperature) && !isnan(humidity)) {
+    if (dhtFresh()) {
       response += "\",\"temperature\":\"";
       response += String(temperature);
       response += "\",\"humidity\":\"";
@@ -179,12 +273,28 @@ void setupRoutes() {
     server.send(200, "application/json", response);
   });
 
+  // GET /state - every pin and the cached sensor values in one compact
+  // response (see formatState), sensor_age = ms since the last good sample
+  server.on("/state", HTTP_GET, sendState);
+
+  // GET /set?led=1&builtin_led=0 - set several outputs in one request (same
+  // names and 0/1 values as /state) and answer with the new state
+  server.on("/set", HTTP_GET, []() {
+    if (server.hasArg("led")) {
+      digitalWrite(LED_PIN, server.arg("led") == "1" ? HIGH : LOW);
+    }
+    if (server.hasArg("builtin_led")) {
+      digitalWrite(BUILTIN_LED_PIN, server.arg("builtin_led") == "1" ? LOW : HIGH);  // active LOW
+    }
+    sendState();
+  });
+
   // GET /sensor - returns calibrated temperature and humidity
   server.on("/sensor", HTTP_GET, []() {
-    float temperature = dht.readTemperature() + TEMP_OFFSET;
-    float humidity = dht.readHumidity() + HUMIDITY_OFFSET;
+    float temperature = cachedTemperature;
+    float humidity = cachedHumidity;
 
-    if (isnan(temperature) || isnan(humidity)) {
+    if (!dhtFresh()) {
       server.send(500, "application/json", "{\"error\":\"Failed to read from DHT sensor\"}");
       return;
     }
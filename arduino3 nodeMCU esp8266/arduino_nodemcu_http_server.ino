@@ -1,6 +1,7 @@
 // Include necessary libraries
 #include <ESP8266WiFi.h>
 #include <ESP8266WebServer.h>
+#include <WiFiUdp.h>
 
 // WiFi credentials
 const char* ssid = "Mimi";
@@ -24,6 +25,35 @@ const int relay2Pin = D1;
 const int mhSensorDigitalPin = D2; // Digital output pin
 const int mhSensorAnalogPin = A0;  // Analog output pin
 
+// The MH-Sensor is sampled from loop() on a timer and handlers answer from
+// the cached values (frequent analogRead calls also disturb the ESP8266 WiFi)
+const unsigned long MH_SAMPLE_INTERVAL = 500;
+int mhDigitalValue = LOW;
+int mhAnalogValue = 0;
+unsigned long lastMhSample = 0;
+
+// Push telemetry: the state is sent to the RPI5 as a UDP datagram when it
+// changes (and every TELEMETRY_HEARTBEAT ms). Leave TELEMETRY_HOST empty to disable.
+const char* TELEMETRY_HOST = "";  // RPI5 IP address, e.g. "192.168.0.20"
+const uint16_t TELEMETRY_PORT = 5005;  // TELEMETRY_PORT in config.env
+const char* DEVICE_ID = "arduino3";  // id of this board in rpi5/devices.json
+const unsigned long TELEMETRY_CHECK_INTERVAL = 100;
+const unsigned long TELEMETRY_HEARTBEAT = 10000;
+// The analog reading jitters; smaller moves are not pushed on their own
+const int MH_ANALOG_PUSH_DELTA = 8;
+WiFiUDP telemetry;
+unsigned long telemetrySeq = 0;
+unsigned long lastTelemetryCheck = 0;
+unsigned long lastTelemetrySent = 0;
+char lastTelemetryState[160] = "";
+int lastPushedAnalog = -1000;
+
+void sampleMHSensor() {
+  lastMhSample = millis();
+  mhDigitalValue = digitalRead(mhSensorDigitalPin);
+  mhAnalogValue = analogRead(mhSensorAnalogPin);
+}
+
 // Function to handle root endpoint
 void handleRoot() {
   String message = "<html><body><h1>NodeMCU Status</h1>";
@@ -112,18 +142,84 @@ void turnRelay2Off() {
 
 // Function to read the digital output of the MH-Sensor
 void readMHSensorDigital() {
-  int digitalValue = digitalRead(mhSensorDigitalPin);
-  String response = "{\"digital\":\"" + String(digitalValue == HIGH ? "HIGH" : "LOW") + "\"}";
+  String response = "{\"digital\":\"" + String(mhDigitalValue == HIGH ? "HIGH" : "LOW") + "\"}";
   server.send(200, "application/json", response);
 }
 
 // Function to read the analog output of the MH-Sensor
 void readMHSensorAnalog() {
-  int analogValue = analogRead(mhSensorAnalogPin);
-  String response = "{\"analog\":" + String(analogValue) + "}";
+  String response = "{\"analog\":" + String(mhAnalogValue) + "}";
   server.send(200, "application/json", response);
 }
 
+// Every pin and the cached sensor values as JSON members (no braces),
+// switches as 0/1. The analog reading is left out with withAnalog = false.
+void formatState(char* buffer, size_t size, bool withAnalog) {
+  char analog[20] = "";
+  if (withAnalog) {
+    snprintf(analog, sizeof(analog), ",\"mh_analog\":%d", mhAnalogValue);
+  }
+  snprintf(buffer, size,
+           "\"v\":1,\"builtin_led\":%d,\"relay_channel_1\":%d,\"relay_channel_2\":%d,\"mh_digital\":%d%s,\"ip\":\"%s\"",
+           digitalRead(LED_BUILTIN) == LOW ? 1 : 0,
+           channel1Status ? 1 : 0,
+           channel2Status ? 1 : 0,
+           mhDigitalValue == HIGH ? 1 : 0,
+           analog,
+           WiFi.localIP().toString().c_str());
+}
+
+// Function to return every pin and the cached sensor values in one compact
+// response, sensor_age = ms since the last sample
+void handleState() {
+  char state[160];
+  formatState(state, sizeof(state), true);
+  char response[192];
+  snprintf(response, sizeof(response), "{%s,\"sensor_age\":%lu}", state, millis() - lastMhSample);
+  server.send(200, "application/json", response);
+}
+
+// Function to set several outputs in one request, e.g.
+// /set?builtin_led=1&relay_channel_1=0 (same names and 0/1 values as /state),
+// answering with the new state so the RPI5 needs no follow-up poll
+void handleSet() {
+  if (server.hasArg("builtin_led")) {
+    digitalWrite(LED_BUILTIN, server.arg("builtin_led") == "1" ? LOW : HIGH); // Active LOW
+  }
+  if (server.hasArg("relay_channel_1")) {
+    channel1Status = server.arg("relay_channel_1") == "1";
+    digitalWrite(relay1Pin, channel1Status ? LOW : HIGH); // active LOW
+  }
+  if (server.hasArg("relay_channel_2")) {
+    channel2Status = server.arg("relay_channel_2") == "1";
+    digitalWrite(relay2Pin, channel2Status ? LOW : HIGH); // active LOW
+  }
+  handleState();
+}
+
+// Function to push the state to the RPI5 when it changed
+void pushTelemetry() {
+  lastTelemetryCheck = millis();
+  char state[160];
+  formatState(state, sizeof(state), false);
+  bool analogMoved = abs(mhAnalogValue - lastPushedAnalog) >= MH_ANALOG_PUSH_DELTA;
+  if (!analogMoved && strcmp(state, lastTelemetryState) == 0 && millis() - lastTelemetrySent < TELEMETRY_HEARTBEAT) {
+    return;
+  }
+
+  formatState(state, sizeof(state), true);
+  char packet[224];
+  int length = snprintf(packet, sizeof(packet), "{\"id\":\"%s\",\"seq\":%lu,%s,\"sensor_age\":%lu}",
+                        DEVICE_ID, ++telemetrySeq, state, millis() - lastMhSample);
+  telemetry.beginPacket(TELEMETRY_HOST, TELEMETRY_PORT);
+  telemetry.write((const uint8_t*)packet, length);
+  telemetry.endPacket();
+
+  formatState(lastTelemetryState, sizeof(lastTelemetryState), false);
+  lastPushedAnalog = mhAnalogValue;
+  lastTelemetrySent = millis();
+}
+
 // Function to log requests
 void logRequest(String endpoint) {
   Serial.print("Received request for endpoint: ");
@@ -161,6 +257,7 @@ void setup() {
   // Initialize MH-Sensor pins
   pinMode(mhSensorDigitalPin, INPUT);
   pinMode(mhSensorAnalogPin, INPUT);
+  sampleMHSensor();
 
   // Define server routes
   server.on("/", handleRoot);
@@ -180,6 +277,11 @@ void setup() {
   server.on("/relay1/off", turnRelay1Off);
   server.on("/relay2/on", turnRelay2On);
   server.on("/relay2/off", turnRelay2Off);
+  server.on("/state", HTTP_GET, handleState);
+  server.on("/set", HTTP_GET, []() {
+    logRequest("/set");
+    handleSet();
+  });
   server.on("/mh/digital", HTTP_GET, []() {
     logRequest("/mh/digital");
     readMHSensorDigital();
@@ -197,4 +299,12 @@ void setup() {
 void loop() {
   // Handle client requests
   server.handleClient();
+
+  if (millis() - lastMhSample >= MH_SAMPLE_INTERVAL) {
+    sampleMHSensor();
+  }
+
+  if (TELEMETRY_HOST[0] != '\0' && millis() - lastTelemetryCheck >= TELEMETRY_CHECK_INTERVAL) {
+    pushTelemetry();
+  }
 }
\ No newline at end of file
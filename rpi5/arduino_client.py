@@ -1,24 +1,81 @@
 #!/usr/bin/env python3
 """
 RPI5 HTTP Client for Arduino Devices
+Run without a command for the interactive menu, or with one of the
+scriptable commands, which talk to many boards at once and print NDJSON:
+
+    python3 rpi5/arduino_client.py status
+    python3 rpi5/arduino_client.py watch -d arduino3 --interval 1 --changes
+    python3 rpi5/arduino_client.py set -d arduino3 relay1_on relay2_off
+    python3 rpi5/arduino_client.py batch -f actions.json
 """
 
+import os
+import re
 import requests
 import json
 import time
 import sys
 from datetime import datetime
+from urllib.parse import urlsplit
+
+import http_pool
+
+# Combined state endpoint of the sketches: every pin and cached sensor value
+# in one response, so a poll is a single round trip
+STATE_PATH = "/state"
+STATE_VERSION = 1
+# Switch fields sent as 0/1, with the labels used everywhere else
+STATE_LABELS = {
+    "led": ("ON", "OFF"),
+    "builtin_led": ("ON", "OFF"),
+    "relay_channel_1": ("ON", "OFF"),
+    "relay_channel_2": ("ON", "OFF"),
+    "button": ("PRESSED", "RELEASED"),
+    "mh_digital": ("HIGH", "LOW"),
+}
+# Protocol fields that are not board state
+STATE_META = ("v", "sensor_age")
+# Readings the boards sample on a timer and report with their sensor_age (ms).
+# Past SENSOR_MAX_AGE (three missed DHT samples, same limit as the firmware)
+# they are left out, so a dead sensor's last value does not pass for fresh
+SENSOR_FIELDS = ("temperature", "humidity", "mh_digital", "mh_analog")
+SENSOR_MAX_AGE = 3 * 2000
+# Bytes read at a time from a streamed /api/export download
+EXPORT_CHUNK = 64 * 1024
+
+def parse_state(data):
+    """Decode a /state payload into the field names and values of the web interface.
+
+    e.g. {"v":1,"led":1,"builtin_led":0,"button":0,"temperature":22.1,...}
+    becomes {"led": "ON", "builtin_led": "OFF", "button": "RELEASED",
+    "temperature": 22.1, ...}; null readings (sensor not read yet) and
+    readings older than SENSOR_MAX_AGE are left out.
+    """
+    if not isinstance(data, dict) or data.get("v") != STATE_VERSION:
+        raise ValueError(f"Unsupported state payload: {str(data)[:80]}")
+    age = data.get("sensor_age")
+    stale = isinstance(age, (int, float)) and age > SENSOR_MAX_AGE
+    fields = {}
+    for name, value in data.items():
+        if name in STATE_META or value is None or (stale and name in SENSOR_FIELDS):
+            continue
+        labels = STATE_LABELS.get(name)
+        fields[name] = value if labels is None else labels[0 if value else 1]
+    return fields
 
 class ArduinoClient:
-    def __init__(self, arduino_ip, arduino_port=8080):
+    def __init__(self, arduino_ip, arduino_port=8080, pool=None):
         """Initialize Arduino client"""
         self.base_url = f"http://{arduino_ip}:{arduino_port}"
-        self.timeout = 5
+        self.timeout = http_pool.DEFAULT_TIMEOUT
+        # Keep-alive sessions shared with any other client in this process
+        self.http = pool or http_pool.default_pool
         
     def is_connected(self):
         """Check if Arduino is reachable"""
         try:
-            response = requests.get(f"{self.base_url}/status", timeout=self.timeout)
+            response = self.http.get(f"{self.base_url}/status", timeout=self.timeout)
             return response.status_code == 200
         except:
             return False
@@ -26,7 +83,7 @@ class ArduinoClient:
     def get_status(self):
         """Get current status from Arduino"""
         try:
-            response = requests.get(f"{self.base_url}/status", timeout=self.timeout)
+            response = self.http.get(f"{self.base_url}/status", timeout=self.timeout)
             if response.status_code == 200:
                 return response.json()
             else:
@@ -39,10 +96,26 @@ class ArduinoClient:
             print(f"Error: {e}")
             return None
     
+    def get_state(self):
+        """Get every pin and sensor value in one request (sketches with /state)"""
+        try:
+            response = self.http.get(f"{self.base_url}{STATE_PATH}", timeout=self.timeout)
+            if response.status_code == 200:
+                return parse_state(response.json())
+            else:
+                print(f"Error: HTTP {response.status_code}")
+                return None
+        except requests.exceptions.ConnectionError:
+            print(f"Error: Cannot connect to Arduino at {self.base_url}")
+            return None
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
     def led_on(self):
         """Turn LED on"""
         try:
-            response = requests.get(f"{self.base_url}/led/on", timeout=self.timeout)
+            response = self.http.get(f"{self.base_url}/led/on", timeout=self.timeout)
             return response.json() if response.status_code == 200 else None
         except Exception as e:
             print(f"Error: {e}")
@@ -51,7 +124,7 @@ class ArduinoClient:
     def led_off(self):
         """Turn LED off"""
         try:
-            response = requests.get(f"{self.base_url}/led/off", timeout=self.timeout)
+            response = self.http.get(f"{self.base_url}/led/off", timeout=self.timeout)
             return response.json() if response.status_code == 200 else None
         except Exception as e:
             print(f"Error: {e}")
@@ -60,7 +133,7 @@ class ArduinoClient:
     def led_toggle(self):
         """Toggle LED"""
         try:
-            response = requests.get(f"{self.base_url}/led/toggle", timeout=self.timeout)
+            response = self.http.get(f"{self.base_url}/led/toggle", timeout=self.timeout)
             return response.json() if response.status_code == 200 else None
         except Exception as e:
             print(f"Error: {e}")
@@ -69,7 +142,7 @@ class ArduinoClient:
     def get_channel_status(self):
         """Get the status of both channels"""
         try:
-            response = requests.get(f"{self.base_url}/", timeout=self.timeout)
+            response = self.http.get(f"{self.base_url}/", timeout=self.timeout)
             if response.status_code == 200:
                 return response.text  # Assuming the server returns HTML
             else:
@@ -85,19 +158,515 @@ class ArduinoClient:
     def toggle_channel(self, channel):
         """Toggle a specific channel (1 or 2)"""
         try:
-            response = requests.get(f"{self.base_url}/toggleChannel{channel}", timeout=self.timeout)
+            response = self.http.get(f"{self.base_url}/toggleChannel{channel}", timeout=self.timeout)
             return response.text if response.status_code == 200 else None
         except Exception as e:
             print(f"Error: {e}")
             return None
 
+class AsyncArduinoClient:
+    """asyncio client that drives many boards at once.
+
+    Calls to different boards run concurrently over one shared httpx
+    connection pool, while a per-board semaphore keeps the number of
+    in-flight requests to any single ESP8266 at http_pool.POOL_MAXSIZE.
+    Every call returns (payload, error) instead of raising.
+
+        async with AsyncArduinoClient() as client:
+            results = await client.poll_all(["192.168.0.37:8080", "192.168.0.161:80"])
+    """
+
+    def __init__(self, max_connections=32, per_device=http_pool.POOL_MAXSIZE,
+                 timeout=http_pool.DEFAULT_TIMEOUT, default_port=8080):
+        """Initialize the shared connection pool"""
+        # Only needed by async callers; the blocking client works without httpx
+        import httpx
+
+        connect_timeout, read_timeout = timeout
+        self.default_port = default_port
+        self.per_device = per_device
+        self._limits = {}
+        self.pool_limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            # Same policy as the blocking pool: only connect failures are retried.
+            # The limits go on the transport: httpx ignores the client's own
+            # limits once a transport is given
+            transport=httpx.AsyncHTTPTransport(retries=http_pool.CONNECT_RETRIES, limits=self.pool_limits),
+            headers={"Connection": "keep-alive"},
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close every pooled connection"""
+        await self.http.aclose()
+
+    def base_url(self, target):
+        """Base URL for "ip", "ip:port" or "http://ip:port" targets"""
+        if "://" in target:
+            return target.rstrip("/")
+        if ":" not in target:
+            target = f"{target}:{self.default_port}"
+        return f"http://{target}"
+
+    def _limit(self, url):
+        """Semaphore capping in-flight requests to one board"""
+        import asyncio
+
+        key = urlsplit(url).netloc
+        limit = self._limits.get(key)
+        if limit is None:
+            limit = self._limits[key] = asyncio.Semaphore(self.per_device)
+        return limit
+
+    async def fetch(self, url):
+        """GET an absolute URL; returns (JSON or text payload, error)"""
+        async with self._limit(url):
+            try:
+                response = await self.http.get(url)
+            except Exception as e:
+                return None, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        if response.status_code != 200:
+            return None, f"HTTP {response.status_code}"
+        try:
+            return response.json(), None
+        except ValueError:
+            return response.text, None
+
+    async def request(self, target, path):
+        """GET a path on one board"""
+        return await self.fetch(f"{self.base_url(target)}{path}")
+
+    async def get_status(self, target):
+        """Get current status from a board"""
+        return await self.request(target, "/status")
+
+    async def get_state(self, target):
+        """Get every pin and sensor value of a board in one request"""
+        payload, error = await self.request(target, STATE_PATH)
+        if error is not None:
+            return None, error
+        try:
+            return parse_state(payload), None
+        except ValueError as e:
+            return None, str(e)
+
+    async def led_on(self, target):
+        """Turn LED on"""
+        return await self.request(target, "/led/on")
+
+    async def led_off(self, target):
+        """Turn LED off"""
+        return await self.request(target, "/led/off")
+
+    async def led_toggle(self, target):
+        """Toggle LED"""
+        return await self.request(target, "/led/toggle")
+
+    async def relay(self, target, channel, state):
+        """Switch a NodeMCU relay channel on or off"""
+        return await self.request(target, f"/relay{channel}/{'on' if state else 'off'}")
+
+    async def toggle_channel(self, target, channel):
+        """Toggle a specific channel (1 or 2)"""
+        return await self.request(target, f"/toggleChannel{channel}")
+
+    async def batch(self, calls):
+        """Run (target, path) calls concurrently; returns {(target, path): (payload, error)}"""
+        import asyncio
+
+        calls = list(calls)
+        results = await asyncio.gather(*(self.request(target, path) for target, path in calls))
+        return dict(zip(calls, results))
+
+    async def send_all(self, targets, path):
+        """Send the same path to every target; returns {target: (payload, error)}"""
+        results = await self.batch((target, path) for target in targets)
+        return {target: results[(target, path)] for target in targets}
+
+    async def poll_all(self, targets):
+        """Get the status of every target concurrently"""
+        return await self.send_all(targets, "/status")
+
+    async def run_action(self, devices, action):
+        """Run a named registry action on several devices, e.g. relay1_off on all NodeMCUs.
+
+        devices are device_registry.Device objects; returns {device id: (payload, error)}.
+        """
+        import asyncio
+
+        async def run(device):
+            url = device.action_url(action)
+            if url is None:
+                return None, f"Device '{device.id}' has no action '{action}'"
+            return await self.fetch(url)
+
+        devices = list(devices)
+        results = await asyncio.gather(*(run(device) for device in devices))
+        return {device.id: result for device, result in zip(devices, results)}
+
+
+class GatewayClient:
+    """Client for the web interface's /api on the Pi (or through its ngrok URL).
+
+    Authenticates with an API token (see auth.py) instead of the login form;
+    the token defaults to $ARDUINO_WEB_TOKEN. Every call returns
+    (payload, error) like AsyncArduinoClient.
+
+        gateway = GatewayClient("https://example.ngrok.app")
+        status, error = gateway.status()
+    """
+
+    def __init__(self, base_url, token=None, timeout=http_pool.DEFAULT_TIMEOUT):
+        """Initialize a keep-alive session carrying the token"""
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.http = requests.Session()
+        token = token or os.environ.get("ARDUINO_WEB_TOKEN")
+        if token:
+            self.http.headers["Authorization"] = f"Bearer {token}"
+
+    def close(self):
+        self.http.close()
+
+    def request(self, method, path, **kwargs):
+        """Call an API path; returns (JSON payload, error)"""
+        try:
+            response = self.http.request(method, f"{self.base_url}{path}", timeout=self.timeout,
+                                         allow_redirects=False, **kwargs)
+        except requests.RequestException as e:
+            return None, f"{type(e).__name__}: {e}"
+        if response.is_redirect:
+            return None, "Not authenticated (missing API token)"
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        if response.status_code >= 400:
+            message = payload.get("message") if isinstance(payload, dict) else None
+            return None, f"HTTP {response.status_code}" + (f": {message}" if message else "")
+        return payload, None
+
+    def status(self, refresh=False):
+        """Status of every board"""
+        return self.request("GET", "/api/status", params={"refresh": 1} if refresh else None)
+
+    def devices(self):
+        """Devices and actions of the registry"""
+        return self.request("GET", "/api/devices")
+
+    def device_status(self, device_id):
+        """Status of one board"""
+        return self.request("GET", f"/api/devices/{device_id}/status")
+
+    def action(self, device_id, action):
+        """Run a named registry action, e.g. action("arduino3", "relay1_on")"""
+        return self.request("POST", f"/api/devices/{device_id}/{action}")
+
+    def batch(self, steps):
+        """Run (device id, action) steps in one call; each board gets its steps in order"""
+        return self.request("POST", "/api/devices/batch",
+                            json={"actions": [{"device": device, "action": action} for device, action in steps]})
+
+    def scene(self, name):
+        """Run a named scene from devices.json"""
+        return self.request("POST", f"/api/scenes/{name}")
+
+    def export(self, output, **params):
+        """Stream /api/export (see export.py) into a binary file; returns (bytes written, error)"""
+        try:
+            with self.http.get(f"{self.base_url}/api/export", params=params, timeout=self.timeout,
+                               allow_redirects=False, stream=True) as response:
+                if response.is_redirect:
+                    return None, "Not authenticated (missing API token)"
+                if response.status_code >= 400:
+                    try:
+                        payload = response.json()
+                    except ValueError:
+                        payload = {}
+                    return None, f"HTTP {response.status_code}: {payload.get('error') or payload.get('message') or response.reason}"
+                written = 0
+                for chunk in response.iter_content(EXPORT_CHUNK):
+                    output.write(chunk)
+                    written += len(chunk)
+                return written, None
+        except requests.RequestException as e:
+            return None, f"{type(e).__name__}: {e}"
+
+
+# Commands of the scriptable CLI; anything else starts the interactive menu
+CLI_COMMANDS = ("status", "watch", "set", "batch")
+# Port of a bare IP target (the D1 sketch's)
+DEFAULT_PORT = 8080
+_IP_TARGET = re.compile(r"^\d{1,3}(\.\d{1,3}){3}(:\d+)?$")
+# Boards contacted at once
+CLI_WORKERS = 16
+
+
+def fetch(url, timeout=None):
+    """GET an absolute URL through the shared pool; returns (JSON or text payload, error)"""
+    try:
+        response = http_pool.get(url, timeout=timeout)
+    except requests.RequestException as e:
+        return None, f"{type(e).__name__}: {e}"
+    if response.status_code != 200:
+        return None, f"HTTP {response.status_code}"
+    try:
+        return response.json(), None
+    except ValueError:
+        return response.text, None
+
+
+def load_registry(path=None):
+    """The device registry, with config.env and the web interface's IP overrides applied"""
+    from dotenv import load_dotenv
+    from device_registry import DeviceRegistry
+    from shared_state import runtime_dir
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.env'))
+    return DeviceRegistry(path, overrides_path=os.path.join(runtime_dir(), "overrides.json"))
+
+
+def resolve_targets(names, registry_path=None):
+    """Devices for registry ids, "all" (every polled board) or ip[:port] targets"""
+    from device_registry import Device, RegistryError
+
+    names = [name for value in names for name in value.split(",") if name]
+    registry = None
+    devices = {}
+    for name in names:
+        if not _IP_TARGET.match(name):
+            registry = registry or load_registry(registry_path)
+            if name == "all":
+                devices.update((device.id, device) for device in registry.all() if device.poll)
+                continue
+            if registry.get(name) is not None:
+                devices[name] = registry.get(name)
+                continue
+            if "." not in name:
+                raise SystemExit(f"Unknown device '{name}' (not in {registry.path})")
+        host, _, port = name.partition(":")
+        try:
+            devices[name] = Device(name, {"host": host, "port": port or DEFAULT_PORT, "state": STATE_PATH})
+        except (RegistryError, ValueError) as e:
+            raise SystemExit(str(e))
+    return list(devices.values())
+
+
+def read_device(device, timeout=None):
+    """Every field of a board, from its /state when it has one; returns (fields, error)"""
+    if device.state_path:
+        payload, error = fetch(device.url(device.state_path), timeout)
+        if error is None:
+            try:
+                return parse_state(payload), None
+            except ValueError as e:
+                return None, str(e)
+        # Older firmware without /state: fall back to the poll endpoints
+        if error != "HTTP 404":
+            return None, error
+    if not device.poll:
+        return fetch(device.url("/status"), timeout)
+    fields = {}
+    for endpoint in device.poll:
+        if endpoint["fallback"] and all(name in fields for name in endpoint["fields"]):
+            continue
+        payload, error = fetch(device.url(endpoint["path"]), timeout)
+        if error is not None or not isinstance(payload, dict):
+            if endpoint["fallback"]:
+                continue
+            return None, error or f"Unexpected reply from {endpoint['path']}"
+        for name, value in device.normalize(endpoint, payload).items():
+            if endpoint["fallback"]:
+                fields.setdefault(name, value)
+            else:
+                fields[name] = value
+    return fields, None
+
+
+def run_actions(device, actions, timeout=None):
+    """Send actions to one board in order; returns [(action, reply, error)].
+
+    Actions that only set fixed values go out as one "set" request when the
+    board has one; otherwise one request each, stopping at the first
+    failure. An action starting with / is sent as a raw path.
+    """
+    query = device.set_query(actions)
+    if query is not None:
+        payload, error = fetch(device.url(query), timeout)
+        if error != "HTTP 404":
+            try:
+                payload = parse_state(payload) if error is None else None
+            except ValueError:
+                pass
+            return [(action, payload, error) for action in actions]
+    results = []
+    failed = None
+    for action in actions:
+        if failed:
+            results.append((action, None, f"Not sent: {failed} failed"))
+            continue
+        spec = device.actions.get(action)
+        if action.startswith("/"):
+            payload, error = fetch(device.url(action), timeout)
+        elif spec is not None:
+            payload, error = fetch(device.url(spec["path"]), timeout)
+        else:
+            payload, error = None, f"Device '{device.id}' has no action '{action}'"
+        results.append((action, payload, error))
+        if error:
+            failed = action
+    return results
+
+
+def concurrently(fn, items):
+    """[(item, fn(item))] with up to CLI_WORKERS boards contacted at once"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(CLI_WORKERS, len(items))) as pool:
+        return list(zip(items, pool.map(fn, items)))
+
+
+def emit(record):
+    """Print one NDJSON line at once (watch output is read while it runs)"""
+    print(json.dumps(dict(ts=round(time.time(), 3), **record)), flush=True)
+
+
+def _read_record(device, result):
+    fields, error = result
+    return {"device": device.id, "error": error} if error else {"device": device.id, "fields": fields}
+
+
+def command_status(args):
+    devices = resolve_targets(args.device or ["all"], args.registry)
+    failed = False
+    for device, result in concurrently(lambda device: read_device(device, args.timeout), devices):
+        emit(_read_record(device, result))
+        failed = failed or result[1] is not None
+    return 1 if failed else 0
+
+
+def command_watch(args):
+    devices = resolve_targets(args.device or ["all"], args.registry)
+    previous = {}
+    rounds = 0
+    while True:
+        started = time.monotonic()
+        for device, result in concurrently(lambda device: read_device(device, args.timeout), devices):
+            if args.changes and previous.get(device.id) == result:
+                continue
+            previous[device.id] = result
+            emit(_read_record(device, result))
+        rounds += 1
+        if args.count and rounds >= args.count:
+            return 0
+        time.sleep(max(0, args.interval - (time.monotonic() - started)))
+
+
+def _run_groups(groups, timeout):
+    """Run {device: [actions]} with boards in parallel; prints one line per action"""
+    failed = False
+    for device, results in concurrently(lambda device: run_actions(device, groups[device], timeout), groups):
+        for action, reply, error in results:
+            record = {"device": device.id, "action": action}
+            record.update({"error": error} if error else {"result": reply})
+            emit(record)
+            failed = failed or error is not None
+    return 1 if failed else 0
+
+
+def command_set(args):
+    devices = resolve_targets(args.device, args.registry)
+    return _run_groups({device: args.actions for device in devices}, args.timeout)
+
+
+def command_batch(args):
+    if args.scene:
+        steps = load_registry(args.registry).scene(args.scene)
+        if steps is None:
+            raise SystemExit(f"Unknown scene '{args.scene}'")
+    else:
+        with (sys.stdin if args.file == "-" else open(args.file)) as f:
+            steps = json.load(f)
+        if isinstance(steps, dict):
+            steps = steps.get("actions")
+    if not isinstance(steps, list) or not all(
+            isinstance(step, dict) and step.get("device") and step.get("action") for step in steps):
+        raise SystemExit('Expected a list of {"device": ..., "action": ...} steps')
+    # A step's device may be "all" or a comma list: it runs on each board
+    # it names, in step order per board
+    targets = {name: resolve_targets([name], args.registry)
+               for name in dict.fromkeys(step["device"] for step in steps)}
+    devices, actions = {}, {}
+    for step in steps:
+        for device in targets[step["device"]]:
+            devices.setdefault(device.id, device)
+            actions.setdefault(device.id, []).append(step["action"])
+    return _run_groups({devices[device_id]: actions[device_id] for device_id in devices}, args.timeout)
+
+
+def run_cli(argv):
+    """Scriptable CLI: one NDJSON line per board (status, watch) or action (set, batch)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Read and switch the boards. Run without a command for the interactive menu.")
+    parser.add_argument("--registry", help="devices.json to use (default $DEVICES_FILE or rpi5/devices.json)")
+    parser.add_argument("--timeout", type=float, help="read timeout per request, seconds")
+    commands = parser.add_subparsers(dest="command", required=True)
+    targets = argparse.ArgumentParser(add_help=False)
+    targets.add_argument("-d", "--device", action="append",
+                         help="device id, 'all' or ip[:port]; repeatable or comma-separated (default all)")
+
+    commands.add_parser("status", parents=[targets], help="read every field of the boards once")
+    watch = commands.add_parser("watch", parents=[targets], help="read the boards repeatedly")
+    watch.add_argument("--interval", type=float, default=2, help="seconds between rounds (default 2)")
+    watch.add_argument("--count", type=int, default=0, help="stop after this many rounds (default: never)")
+    watch.add_argument("--changes", action="store_true", help="only print boards whose reading changed")
+    set_parser = commands.add_parser("set", parents=[targets], help="run actions, e.g. relay1_on builtin_off")
+    set_parser.add_argument("actions", nargs="+", help="action names from devices.json, or raw /paths")
+    batch = commands.add_parser("batch", help="run {device, action} steps; boards in parallel")
+    source = batch.add_mutually_exclusive_group(required=True)
+    source.add_argument("-f", "--file", help="JSON list of steps (or {\"actions\": [...]}), - for stdin")
+    source.add_argument("--scene", help="a scene from devices.json")
+    args = parser.parse_args(argv)
+
+    if args.command == "set" and not args.device:
+        parser.error("set needs at least one --device")
+    if args.timeout:
+        args.timeout = (http_pool.CONNECT_TIMEOUT, args.timeout)
+    handler = {"status": command_status, "watch": command_watch,
+               "set": command_set, "batch": command_batch}[args.command]
+    try:
+        return handler(args)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head): drop what is still buffered
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+
+
 def main():
+    """Scriptable commands (see run_cli), or the interactive menu for one board"""
+    if len(sys.argv) > 1 and (sys.argv[1] in CLI_COMMANDS or sys.argv[1].startswith("-")):
+        sys.exit(run_cli(sys.argv[1:]))
+    interactive(sys.argv[1] if len(sys.argv) > 1 else None)
+
+
+def interactive(arduino_ip=None):
     """Interactive CLI for Arduino control"""
     
     # Get Arduino IP from argument or prompt
-    if len(sys.argv) > 1:
-        arduino_ip = sys.argv[1]
-    else:
+    if not arduino_ip:
         arduino_ip = input("Enter Arduino IP address: ")
     
     client = ArduinoClient(arduino_ip)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Fingerprinted Static Assets for the RPI5 Web Interface
+At startup every file of the static folder is read once, named after a
+hash of its content (script.js -> script.1a2b3c4d5e.js) and compressed
+with gzip, and with brotli when that module is installed. The names
+change whenever the content does, so browsers and the ngrok edge may keep
+them for a year without revalidating; a page load then only fetches the
+HTML.
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+
+log = logging.getLogger(__name__)
+
+# Cache lifetime of a fingerprinted file: its name changes with its content
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Files smaller than this are sent as they are
+MIN_COMPRESS_SIZE = 256
+
+
+class Asset:
+    def __init__(self, name, data):
+        """Fingerprint and precompress one static file"""
+        self.name = name
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.digest = hashlib.blake2b(data, digest_size=5).hexdigest()
+        stem, ext = os.path.splitext(name)
+        self.fingerprinted = f"{stem}.{self.digest}{ext}"
+        # Content-Encoding -> body, best first
+        self.encodings = {}
+        if len(data) >= MIN_COMPRESS_SIZE:
+            brotli = _brotli()
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(data, quality=11)
+            self.encodings["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+        self.encodings = {encoding: body for encoding, body in self.encodings.items() if len(body) < len(data)}
+        self.encodings[None] = data
+
+    def body(self, accept_encodings):
+        """(Content-Encoding or None, body) for a request's Accept-Encoding"""
+        for encoding, body in self.encodings.items():
+            if encoding is None or encoding in accept_encodings:
+                return encoding, body
+
+
+def _brotli():
+    """The brotli module, or None (optional: gzip is used without it)"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class AssetBundle:
+    def __init__(self, directory):
+        """Load every file under directory"""
+        self.directory = directory
+        self._by_name = {}
+        self._by_fingerprint = {}
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    asset = Asset(name, f.read())
+                self._by_name[name] = asset
+                self._by_fingerprint[asset.fingerprinted] = asset
+        log.info("assets loaded count=%d brotli=%s", len(self._by_name), _brotli() is not None)
+
+    def url_name(self, name):
+        """Fingerprinted name of a static file (the plain name if it is unknown)"""
+        asset = self._by_name.get(name)
+        return name if asset is None else asset.fingerprinted
+
+    def get(self, fingerprinted):
+        """The asset with this fingerprinted name, or None"""
+        return self._by_fingerprint.get(fingerprinted)
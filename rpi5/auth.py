@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Authentication for the RPI5 Web Interface
+The login password is checked against a salted hash from config.env,
+scripts authenticate with API tokens (Authorization: Bearer <token>),
+login attempts are rate-limited per client with token buckets, and
+decoded session cookies are cached so the check on every request stays
+cheap. Create the config.env lines with:
+
+    python3 rpi5/auth.py password         # WEB_PASSWORD_HASH=...
+    python3 rpi5/auth.py token <name>     # a new API token and its API_TOKENS entry
+"""
+
+import argparse
+import collections
+import getpass
+import hashlib
+import hmac
+import ipaddress
+import logging
+import os
+import secrets
+import threading
+import time
+
+from flask.sessions import SecureCookieSessionInterface
+from werkzeug.security import check_password_hash, generate_password_hash
+
+log = logging.getLogger(__name__)
+
+# Used until WEB_USERNAME / WEB_PASSWORD_HASH are configured
+DEFAULT_USERNAME = "fcp"
+DEFAULT_PASSWORD = "88888888"
+
+# Login attempts per client: a burst, then one every LOGIN_INTERVAL seconds
+LOGIN_BURST = 5
+LOGIN_INTERVAL = 10
+# All clients together; each attempt costs a deliberately slow hash check
+LOGIN_GLOBAL_BURST = 10
+LOGIN_GLOBAL_INTERVAL = 0.5
+# Clients tracked by a limiter before idle ones are forgotten
+MAX_TRACKED_CLIENTS = 10000
+
+# Seconds a verified session cookie is reused without decoding it again
+SESSION_CACHE_TTL = 60
+MAX_CACHED_SESSIONS = 1024
+
+
+class Credentials:
+    def __init__(self, username, password_hash):
+        """Initialize the single web user from a werkzeug password hash"""
+        self.username = username
+        self.password_hash = password_hash
+
+    @classmethod
+    def from_env(cls):
+        """WEB_USERNAME / WEB_PASSWORD_HASH, or the default login with a warning"""
+        username = os.environ.get("WEB_USERNAME", DEFAULT_USERNAME)
+        password_hash = os.environ.get("WEB_PASSWORD_HASH")
+        if not password_hash:
+            log.warning("WEB_PASSWORD_HASH not set, the default password is in use")
+            password_hash = generate_password_hash(DEFAULT_PASSWORD)
+        return cls(username, password_hash)
+
+    def check(self, username, password):
+        """True if both match; the hash is checked either way so timing does not reveal the username"""
+        password_ok = check_password_hash(self.password_hash, password)
+        return hmac.compare_digest(username.encode(), self.username.encode()) and password_ok
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenStore:
+    def __init__(self, hashes=None):
+        """Initialize from {sha256 hex of token: client name}"""
+        self._names = dict(hashes or {})
+
+    @classmethod
+    def from_env(cls):
+        """API_TOKENS=name:sha256hex,name2:sha256hex"""
+        hashes = {}
+        for entry in os.environ.get("API_TOKENS", "").split(","):
+            name, _, digest = entry.strip().partition(":")
+            if name and digest:
+                hashes[digest.lower()] = name
+        return cls(hashes)
+
+    def __bool__(self):
+        return bool(self._names)
+
+    def lookup(self, token):
+        """Name of the client owning a token, or None.
+
+        Only hashes are stored, and tokens are long random strings, so a
+        plain SHA-256 (fast enough for every request) is sufficient.
+        """
+        return self._names.get(hash_token(token)) if token else None
+
+
+def bearer_token(header):
+    """Token of an "Authorization: Bearer <token>" header, or None"""
+    scheme, _, token = (header or "").partition(" ")
+    return token.strip() or None if scheme.lower() == "bearer" else None
+
+
+class RateLimiter:
+    def __init__(self, burst, interval, max_clients=MAX_TRACKED_CLIENTS):
+        """Token bucket per key: burst attempts, refilled one per interval seconds"""
+        self.burst = burst
+        self.interval = interval
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets = collections.OrderedDict()
+
+    def allow(self, key, now=None):
+        """(allowed, seconds until the next attempt is allowed)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) / self.interval)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) * self.interval
+
+
+def client_address(request):
+    """Address of the client; behind the local ngrok agent, the one ngrok saw.
+
+    ngrok appends the client address to X-Forwarded-For, so the last entry
+    is the one it added (earlier ones come from the client and may be forged).
+    """
+    remote = request.remote_addr or ""
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        try:
+            if ipaddress.ip_address(remote).is_loopback:
+                return forwarded.split(",")[-1].strip()
+        except ValueError:
+            pass
+    return remote
+
+
+class CachedSessionInterface(SecureCookieSessionInterface):
+    """Signed cookie sessions whose verified contents are cached per cookie value.
+
+    Verifying and decoding the cookie is a sizeable part of a cached status
+    request; a cookie seen in the last SESSION_CACHE_TTL seconds is reused.
+    Cookies stay exactly as valid as before, they are only checked less often.
+    """
+
+    def __init__(self, ttl=SESSION_CACHE_TTL, max_entries=MAX_CACHED_SESSIONS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+
+    def open_session(self, app, request):
+        value = request.cookies.get(self.get_cookie_name(app))
+        if not value:
+            return super().open_session(app, request)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(value)
+        if cached is not None and now - cached[1] < self.ttl:
+            return self.session_class(cached[0])
+        session = super().open_session(app, request)
+        if session:
+            with self._lock:
+                self._cache[value] = (dict(session), now)
+                self._cache.move_to_end(value)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create login and API token settings for config.env")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("password", help="hash a new login password")
+    token_parser = commands.add_parser("token", help="generate an API token for a script")
+    token_parser.add_argument("name", help="name of the script or client using the token")
+    args = parser.parse_args()
+
+    if args.command == "password":
+        password = getpass.getpass("New password: ")
+        if password != getpass.getpass("Repeat: "):
+            raise SystemExit("Passwords differ")
+        print(f"WEB_PASSWORD_HASH='{generate_password_hash(password)}'")
+    else:
+        token = secrets.token_urlsafe(32)
+        print(f"Token (give it to the client, it is not stored): {token}")
+        print(f"Add to API_TOKENS in config.env: {args.name}:{hash_token(token)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Federation Demo for the RPI5 Web Interface
+Starts several gateways as separate processes, each polling its own
+simulated boards, and one more gateway following them as sites (see
+federation.py). It then measures /api/status on that gateway while one
+site hangs (SIGSTOP) and another is killed, to show that a dead or slow
+site only turns stale and never delays the response:
+
+    python3 rpi5/bench/federation_demo.py --sites 3
+    python3 rpi5/bench/federation_demo.py --mode poll --stale-after 5
+"""
+
+import argparse
+import json
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import hash_token  # noqa: E402
+from load_test import percentile, start_app  # noqa: E402
+from simulator import DEFAULT_PORT, Faults, Simulator  # noqa: E402
+
+TOKEN_ENV = "FEDERATION_DEMO_TOKEN"
+# Ports used by each gateway's simulated boards
+PORTS_PER_GATEWAY = 10
+STARTUP_TIMEOUT = 30
+
+
+def run_gateway(sim_port, sites):
+    """Child process: simulated boards plus a web server, printing its URL"""
+    simulator = Simulator(Faults(), port=sim_port).start()
+    url, _ = start_app(simulator, tempfile.mkdtemp(prefix="federation-"), {"sites": sites} if sites else None)
+    print(url, flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+def spawn(index, env, sites=None):
+    command = [sys.executable, os.path.abspath(__file__), "--gateway",
+               "--sim-port", str(DEFAULT_PORT + PORTS_PER_GATEWAY * index)]
+    if sites:
+        command += ["--sites-json", json.dumps(sites)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, text=True)
+    url = process.stdout.readline().strip()
+    if not url.startswith("http"):
+        raise SystemExit(f"gateway {index} did not start")
+    return process, url
+
+
+def measure(session, url, samples):
+    """(p50 ms, max ms, sites) of /api/status on the following gateway"""
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        session.get(f"{url}/api/status", timeout=10).raise_for_status()
+        times.append((time.perf_counter() - start) * 1000)
+    sites = session.get(f"{url}/api/sites", timeout=10).json()
+    return percentile(times, 0.5), max(times), sites
+
+
+def report(title, result):
+    p50, worst, sites = result
+    print(f"\n{title}: /api/status p50 {p50:.1f} ms, max {worst:.1f} ms")
+    for name, site in sorted(sites.items()):
+        state = "STALE" if site["stale"] else "fresh"
+        print(f"  {name:<8} {state:<6} connected={site['connected']!s:<5} age={site['age']}s "
+              f"boards={len(site['boards'])} error={site['last_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a federation of local gateways and measure the follower")
+    parser.add_argument("--sites", type=int, default=3, help="gateways followed as sites (default 3)")
+    parser.add_argument("--mode", choices=("stream", "poll"), default="stream", help="how sites are followed")
+    parser.add_argument("--stale-after", type=float, default=20,
+                        help="seconds without news before a site is stale (default 20)")
+    parser.add_argument("--samples", type=int, default=50, help="/api/status requests per measurement")
+    parser.add_argument("--gateway", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--sim-port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--sites-json", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.gateway:
+        run_gateway(args.sim_port, json.loads(args.sites_json) if args.sites_json else None)
+        return
+
+    token = secrets.token_urlsafe(16)
+    env = dict(os.environ, API_TOKENS=f"demo:{hash_token(token)}", **{TOKEN_ENV: token})
+    processes = []
+    try:
+        sites = {}
+        for index in range(1, args.sites + 1):
+            process, url = spawn(index, env)
+            processes.append(process)
+            sites[f"site{index}"] = {"url": url, "token_env": TOKEN_ENV, "mode": args.mode,
+                                     "interval": 1, "stale_after": args.stale_after}
+            print(f"site{index}: {url} (pid {process.pid})")
+        process, url = spawn(0, env, sites)
+        processes.append(process)
+        print(f"follower: {url} (pid {process.pid})")
+
+        session = requests.Session()
+        session.headers["Authorization"] = f"Bearer {token}"
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            followed = session.get(f"{url}/api/sites", timeout=10).json()
+            if len(followed) == args.sites and all(site["boards"] for site in followed.values()):
+                break
+            time.sleep(0.5)
+        report("all sites up", measure(session, url, args.samples))
+
+        hung, killed = processes[0], processes[1] if args.sites > 1 else None
+        hung.send_signal(signal.SIGSTOP)
+        if killed is not None:
+            killed.kill()
+        report("site1 hung, site2 killed", measure(session, url, args.samples))
+        time.sleep(args.stale_after + 2)
+        report(f"after {args.stale_after + 2:.0f} s", measure(session, url, args.samples))
+
+        hung.send_signal(signal.SIGCONT)
+        time.sleep(3)
+        report("site1 resumed", measure(session, url, args.samples))
+    finally:
+        for process in processes:
+            process.send_signal(signal.SIGCONT)
+            process.kill()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Load Test for the RPI5 Web Interface
+Drives the Flask app with many concurrent clients against the board
+simulator and reports, per endpoint, latency percentiles, throughput and
+upstream amplification: board requests caused per client request, after
+subtracting what background polling sends anyway. No hardware needed:
+
+    python3 rpi5/bench/load_test.py --clients 20 --seconds 10
+    python3 rpi5/bench/load_test.py --latency 50 --failure-rate 0.05 --json results.json
+
+By default the simulator and the app (threaded development server) run in
+this process. To measure gunicorn instead, start simulator.py with
+--write-devices, run gunicorn with DEVICES_FILE set to that file and pass
+--url and --sim-port here.
+"""
+
+import argparse
+import collections
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from camera_proxy import boundary_from, read_frames  # noqa: E402
+from simulator import DEFAULT_PORT, STATS_PATH, Faults, Simulator  # noqa: E402
+
+# "METHOD path" per phase; "STREAM" reads frames from an MJPEG endpoint
+DEFAULT_ENDPOINTS = [
+    "GET /api/status",
+    "GET /api/devices/arduino1/status",
+    "GET /api/arduino3/mh",
+    "GET /api/status?refresh=1",
+    "POST /api/devices/arduino3/relay1_on",
+    "POST /api/nodemcu/toggle/1",
+    "GET /api/camera/snapshot",
+    "STREAM /api/camera/stream",
+]
+# Seconds without clients used to measure background polling
+IDLE_SECONDS = 3
+# Frames each stream client reads before reconnecting
+STREAM_FRAMES = 10
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def ok(status):
+    """True for an HTTP status below 400 (errors are other codes or exception names)"""
+    return isinstance(status, int) and status < 400
+
+
+def start_app(simulator, work_dir, sections=None):
+    """Run web_server in this process against the simulator; returns its base URL.
+
+    sections are extra top-level registry sections, e.g. {"sites": {...}}.
+    """
+    devices_file = os.path.join(work_dir, "devices.json")
+    simulator.write_devices(devices_file)
+    if sections:
+        with open(devices_file) as f:
+            config = json.load(f)
+        config.update(sections)
+        with open(devices_file, "w") as f:
+            json.dump(config, f, indent=2)
+    os.environ.update(DEVICES_FILE=devices_file, WEB_RUNTIME_DIR=os.path.join(work_dir, "run"),
+                      HISTORY_DB=os.path.join(work_dir, "history.db"),
+                      CAMERA_ARCHIVE_DIR=os.path.join(work_dir, "camera"))
+    for name in [name for name in os.environ if name.startswith("DEVICE_")]:
+        del os.environ[name]  # config.env host overrides would point away from the simulator
+
+    from werkzeug.serving import make_server
+    import web_server
+
+    web_server.start_background()
+    server = make_server("127.0.0.1", 0, web_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="load-test-app", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", web_server
+
+
+class LoadTest:
+    def __init__(self, url, sim_urls, username, password, clients, seconds, timeout):
+        """Initialize a test of the app at url; sim_urls are the boards' base URLs"""
+        self.url = url.rstrip("/")
+        self.sim_urls = sim_urls
+        self.clients = clients
+        self.seconds = seconds
+        self.timeout = timeout
+        self.cookies = self._login(username, password)
+
+    def _login(self, username, password):
+        with requests.Session() as session:
+            response = session.post(f"{self.url}/login", data={"username": username, "password": password},
+                                    allow_redirects=False, timeout=self.timeout)
+            if response.status_code != 302 or "login" in response.headers.get("Location", ""):
+                raise SystemExit(f"Login to {self.url} failed (HTTP {response.status_code})")
+            return session.cookies.get_dict()
+
+    def upstream_calls(self):
+        """Requests served so far by every simulated board"""
+        total = 0
+        for url in self.sim_urls:
+            total += requests.get(url + STATS_PATH, timeout=self.timeout).json()["total"]
+        return total
+
+    def idle_rate(self, seconds):
+        """Board requests per second sent by background polling alone"""
+        before = self.upstream_calls()
+        time.sleep(seconds)
+        return (self.upstream_calls() - before) / seconds
+
+    def _request(self, session, method, path):
+        response = session.request(method, self.url + path, timeout=self.timeout, allow_redirects=False)
+        response.content
+        return response.status_code
+
+    def _stream(self, session, path):
+        """Open the stream, read STREAM_FRAMES frames; latency is the time to the first frame"""
+        with session.get(self.url + path, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                return response.status_code, None
+            frames = read_frames(response.raw, boundary_from(response.headers.get("Content-Type", "")))
+            first = None
+            for count, _ in enumerate(frames, 1):
+                if first is None:
+                    first = time.perf_counter()
+                if count >= STREAM_FRAMES:
+                    return response.status_code, first
+            return "ended", first
+
+    def _client(self, method, path, stop, results):
+        with requests.Session() as session:
+            session.cookies.update(self.cookies)
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    if method == "STREAM":
+                        status, first = self._stream(session, path)
+                        end = first or time.perf_counter()
+                    else:
+                        status = self._request(session, method, path)
+                        end = time.perf_counter()
+                except requests.RequestException as e:
+                    status, end = type(e).__name__, time.perf_counter()
+                results.append((status, end - start))
+
+    def phase(self, endpoint, idle_rate):
+        """Run every client against one endpoint for self.seconds"""
+        method, _, path = endpoint.partition(" ")
+        if not path:
+            method, path = "GET", method
+        results = []
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._client, args=(method.upper(), path, stop, results), daemon=True)
+                   for _ in range(self.clients)]
+        before = self.upstream_calls()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(self.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        upstream = self.upstream_calls() - before
+        latencies = [latency * 1000 for status, latency in results if ok(status)]
+        errors = collections.Counter(str(status) for status, _ in results if not ok(status))
+        extra = max(0.0, upstream - idle_rate * elapsed)
+        return {
+            "endpoint": endpoint,
+            "requests": len(results),
+            "errors": sum(errors.values()),
+            "error_statuses": dict(errors),
+            "throughput": len(results) / elapsed,
+            "p50_ms": percentile(latencies, 0.5),
+            "p99_ms": percentile(latencies, 0.99),
+            "max_ms": max(latencies, default=float("nan")),
+            "upstream": upstream,
+            "amplification": extra / len(results) if results else float("nan"),
+        }
+
+
+def report(results, idle_rate):
+    print(f"background polling: {idle_rate:.1f} board requests/s")
+    print(f"{'endpoint':<42} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'upstream':>9} {'ampl':>6}")
+    for r in results:
+        print(f"{r['endpoint']:<42} {r['requests']:>7} {r['errors']:>5} {r['throughput']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f} {r['upstream']:>9} "
+              f"{r['amplification']:>6.2f}")
+        if r["errors"]:
+            print(f"{'':<42} errors: " + ", ".join(f"{status} x{count}" for status, count in r["error_statuses"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the web server against simulated boards")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent clients per endpoint (default 20)")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of each endpoint phase (default 10)")
+    parser.add_argument("--endpoint", action="append", dest="endpoints", metavar="'METHOD PATH'",
+                        help="endpoint to test, repeatable (default: a read, command and camera mix)")
+    parser.add_argument("--url", help="test a running server instead of starting one in this process")
+    parser.add_argument("--sim-port", type=int, help=f"first port of a simulator already running "
+                        f"(with --url; simulator.py uses {DEFAULT_PORT})")
+    parser.add_argument("--username", default=os.environ.get("LOAD_TEST_USER", "fcp"))
+    parser.add_argument("--password", default=os.environ.get("LOAD_TEST_PASSWORD", "88888888"))
+    parser.add_argument("--timeout", type=float, default=15, help="client request timeout, seconds")
+    parser.add_argument("--latency", type=float, default=0, help="simulated board latency, ms")
+    parser.add_argument("--jitter", type=float, default=0, help="simulated latency jitter, ms")
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of board requests failing")
+    parser.add_argument("--timeout-rate", type=float, default=0, help="fraction of board requests never answered")
+    parser.add_argument("--idle", type=float, default=IDLE_SECONDS, help="seconds measuring background polling")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    simulator = None
+    if args.url:
+        if args.sim_port is None:
+            parser.error("--url needs --sim-port (the simulator the server polls)")
+        url = args.url
+        sim_urls = [f"http://127.0.0.1:{args.sim_port + offset}" for offset in range(len(Simulator.boards))]
+    else:
+        faults = Faults(args.latency / 1000, args.jitter / 1000, args.failure_rate, args.timeout_rate)
+        simulator = Simulator(faults).start()
+        sim_urls = list(simulator.urls().values())
+        url, _ = start_app(simulator, tempfile.mkdtemp(prefix="load-test-"))
+        time.sleep(2)  # first polls
+
+    test = LoadTest(url, sim_urls, args.username, args.password, args.clients, args.seconds, args.timeout)
+    idle_rate = test.idle_rate(args.idle)
+    results = []
+    for endpoint in args.endpoints or DEFAULT_ENDPOINTS:
+        result = test.phase(endpoint, idle_rate)
+        results.append(result)
+        print(f"{endpoint}: {result['requests']} requests, p99 {result['p99_ms']:.1f} ms", file=sys.stderr)
+    report(results, idle_rate)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"clients": args.clients, "seconds": args.seconds, "idle_rate": idle_rate,
+                       "results": results}, f, indent=2)
+    if simulator is not None:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Board Simulator for the RPI5 Web Interface
+Serves the HTTP APIs of the D1, NodeMCU and ESP32-CAM sketches on local
+ports, with configurable network latency, jitter, failures and hung
+requests, so the server can be run and measured without the hardware:
+
+    python3 rpi5/bench/simulator.py --latency 20 --jitter 10 --failure-rate 0.02 \\
+        --write-devices /tmp/bench-devices.json
+    DEVICES_FILE=/tmp/bench-devices.json python3 rpi5/web_server.py
+
+Like the ESP8266WebServer, each board handles one request at a time. Every
+board counts the requests it served (GET /_sim/stats), which is how the
+load test measures upstream calls per client request.
+"""
+
+import argparse
+import collections
+import io
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+DEFAULT_REGISTRY_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "devices.json")
+DEFAULT_PORT = 18080
+STATS_PATH = "/_sim/stats"
+
+# Time a board spends handling one request (it serves one at a time)
+SERVICE_TIME = 0.002
+# Seconds a hung request is held before the connection is dropped
+# (longer than the server's read timeout)
+HANG_SECONDS = 30
+# Camera frames per second and the size of the fallback frames without Pillow
+CAMERA_FPS = 10
+FRAME_BYTES = 20 * 1024
+CAMERA_FRAMES = 30
+
+
+class Faults:
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, timeout_rate=0.0,
+                 hang=HANG_SECONDS, seed=None):
+        """Initialize the fault model (latency and jitter in seconds, rates 0-1)"""
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Network delay of one request: latency +/- jitter"""
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def pick(self):
+        """'timeout', 'failure' or None for one request"""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.timeout_rate:
+            return "timeout"
+        if roll < self.timeout_rate + self.failure_rate:
+            return "failure"
+        return None
+
+
+class Board:
+    kind = None
+    not_found = (404, "application/json", '{"error":"Not Found"}')
+
+    def __init__(self, device_id, faults, serial=True, service_time=SERVICE_TIME):
+        """Initialize a simulated board; serial=False lets it answer requests in parallel"""
+        self.device_id = device_id
+        self.faults = faults
+        self.service_time = service_time
+        self.started = time.monotonic()
+        self._busy = threading.Lock() if serial else None
+        self._lock = threading.Lock()
+        self.calls = collections.Counter()
+        self.failures = 0
+        self.timeouts = 0
+        self.routes = {}
+        # An offline board drops every connection without answering
+        self.online = True
+
+    def uptime_ms(self):
+        return int((time.monotonic() - self.started) * 1000)
+
+    def stats(self):
+        with self._lock:
+            return {"device": self.device_id, "kind": self.kind, "total": sum(self.calls.values()),
+                    "calls": dict(self.calls), "failures": self.failures, "timeouts": self.timeouts}
+
+    def serve(self, request):
+        path, _, query = request.path.partition("?")
+        if path == STATS_PATH:
+            return send(request, 200, "application/json", json.dumps(self.stats()))
+        if not self.online:
+            request.close_connection = True
+            return None
+        with self._lock:
+            self.calls[path] += 1
+        time.sleep(self.faults.delay())
+        fault = self.faults.pick()
+        if fault == "timeout":
+            with self._lock:
+                self.timeouts += 1
+            time.sleep(self.faults.hang)
+            request.close_connection = True
+            return None
+        if fault == "failure":
+            with self._lock:
+                self.failures += 1
+            return send(request, 500, "application/json", '{"error":"Simulated failure"}')
+        if self._busy is None:
+            return self.handle(request, path, query)
+        with self._busy:
+            return self.handle(request, path, query)
+
+    def handle(self, request, path, query):
+        time.sleep(self.service_time)
+        route = self.routes.get(path)
+        status, content_type, body = route(query) if route else self.not_found
+        return send(request, status, content_type, body)
+
+
+def send(request, status, content_type, body):
+    data = body if isinstance(body, bytes) else body.encode()
+    request.send_response(status)
+    request.send_header("Content-Type", content_type)
+    request.send_header("Content-Length", str(len(data)))
+    request.end_headers()
+    request.wfile.write(data)
+
+
+def on_off(value):
+    return "ON" if value else "OFF"
+
+
+def switch_args(query):
+    """{name: bool} from a ?name=0/1 query string"""
+    return {name: values[-1] == "1" for name, values in parse_qs(query).items()}
+
+
+def reply(message):
+    return 200, "application/json", json.dumps({"status": message}, separators=(",", ":"))
+
+
+class D1Board(Board):
+    kind = "d1"
+
+    def __init__(self, device_id, faults, **options):
+        """Initialize the D1: LED, built-in LED, button and DHT sensor"""
+        super().__init__(device_id, faults, **options)
+        self.led = False
+        self.builtin_led = False
+        self.button = False
+        self.routes = {
+            "/status": self.status, "/state": self.state, "/sensor": self.sensor, "/set": self.set_outputs,
+            "/button": lambda query: (200, "application/json", json.dumps({"button": self._button()})),
+            "/led/on": lambda query: self.set_led(True), "/led/off": lambda query: self.set_led(False),
+            "/led/toggle": lambda query: self.set_led(not self.led, "LED toggled to"),
+            "/builtin/on": lambda query: self.set_builtin(True),
+            "/builtin/off": lambda query: self.set_builtin(False),
+            "/builtin/toggle": lambda query: self.set_builtin(not self.builtin_led, "Built-in LED toggled to"),
+        }
+
+    def reading(self):
+        """Slowly drifting temperature and humidity"""
+        t = time.time() / 60
+        return round(22 + 1.5 * math.sin(t), 1), round(45 + 5 * math.cos(t / 2), 1)
+
+    def _button(self):
+        return "PRESSED" if self.button else "RELEASED"
+
+    def status(self, query):
+        temperature, humidity = self.reading()
+        return 200, "application/json", json.dumps({
+            "led": on_off(self.led), "button": self._button(), "builtin_led": on_off(self.builtin_led),
+            "ip": "127.0.0.1", "temperature": f"{temperature:.2f}", "humidity": f"{humidity:.2f}",
+        }, separators=(",", ":"))
+
+    def state(self, query):
+        temperature, humidity = self.reading()
+        return 200, "application/json", json.dumps({
+            "v": 1, "led": int(self.led), "builtin_led": int(self.builtin_led), "button": int(self.button),
+            "temperature": temperature, "humidity": humidity, "ip": "127.0.0.1",
+            "sensor_age": self.uptime_ms() % 2000,
+        }, separators=(",", ":"))
+
+    def sensor(self, query):
+        temperature, humidity = self.reading()
+        return 200, "application/json", json.dumps({"temperature": temperature, "humidity": humidity})
+
+    def set_outputs(self, query):
+        """/set?led=1&builtin_led=0: several outputs at once, answered with the new state"""
+        values = switch_args(query)
+        self.led = values.get("led", self.led)
+        self.builtin_led = values.get("builtin_led", self.builtin_led)
+        return self.state(query)
+
+    def set_led(self, on, message="LED turned"):
+        self.led = on
+        return reply(f"{message} {on_off(on)}")
+
+    def set_builtin(self, on, message="Built-in LED turned"):
+        self.builtin_led = on
+        return reply(f"{message} {on_off(on)}")
+
+
+class NodeMcuBoard(Board):
+    kind = "nodemcu"
+
+    def __init__(self, device_id, faults, **options):
+        """Initialize the NodeMCU: built-in LED, two relays and the MH sensor"""
+        super().__init__(device_id, faults, **options)
+        self.builtin_led = False
+        self.relays = {1: False, 2: False}
+        self.routes = {
+            "/": self.root, "/status": self.status, "/state": self.state, "/set": self.set_outputs,
+            "/mh/digital": lambda query: (200, "application/json",
+                                          json.dumps({"digital": "HIGH" if self.mh_digital() else "LOW"})),
+            "/mh/analog": lambda query: (200, "application/json", json.dumps({"analog": self.mh_analog()})),
+            "/builtin/on": lambda query: self.set_builtin(True),
+            "/builtin/off": lambda query: self.set_builtin(False),
+            "/builtin/toggle": lambda query: self.set_builtin(not self.builtin_led, "Built-in LED toggled to"),
+        }
+        for channel in self.relays:
+            self.routes[f"/relay{channel}/on"] = lambda query, c=channel: self.set_relay(c, True)
+            self.routes[f"/relay{channel}/off"] = lambda query, c=channel: self.set_relay(c, False)
+            self.routes[f"/toggleChannel{channel}"] = lambda query, c=channel: self.toggle_channel(c)
+
+    def mh_analog(self):
+        return int(512 + 300 * math.sin(time.time() / 30))
+
+    def mh_digital(self):
+        return self.mh_analog() > 512
+
+    def root(self, query):
+        return 200, "text/html", (f"<html><body><h1>NodeMCU Relay Control</h1><p>Channel 1: {on_off(self.relays[1])}"
+                                  f"</p><p>Channel 2: {on_off(self.relays[2])}</p></body></html>")
+
+    def status(self, query):
+        return 200, "application/json", json.dumps({
+            "relay1": on_off(self.relays[1]), "relay2": on_off(self.relays[2]),
+            "builtin_led": on_off(self.builtin_led),
+        }, separators=(",", ":"))
+
+    def state(self, query):
+        return 200, "application/json", json.dumps({
+            "v": 1, "builtin_led": int(self.builtin_led), "relay_channel_1": int(self.relays[1]),
+            "relay_channel_2": int(self.relays[2]), "mh_digital": int(self.mh_digital()),
+            "mh_analog": self.mh_analog(), "ip": "127.0.0.1", "sensor_age": self.uptime_ms() % 500,
+        }, separators=(",", ":"))
+
+    def set_outputs(self, query):
+        """/set?builtin_led=1&relay_channel_1=0: several outputs at once, answered with the new state"""
+        values = switch_args(query)
+        self.builtin_led = values.get("builtin_led", self.builtin_led)
+        for channel in self.relays:
+            self.relays[channel] = values.get(f"relay_channel_{channel}", self.relays[channel])
+        return self.state(query)
+
+    def set_builtin(self, on, message="Built-in LED turned"):
+        self.builtin_led = on
+        return reply(f"{message} {on_off(on)}")
+
+    def set_relay(self, channel, on):
+        self.relays[channel] = on
+        return reply(f"Relay {channel} turned {on_off(on)}")
+
+    def toggle_channel(self, channel):
+        self.relays[channel] = not self.relays[channel]
+        return 200, "text/plain", f"Channel {channel} {on_off(self.relays[channel])}"
+
+
+def camera_frames(count=CAMERA_FRAMES, size=(320, 240)):
+    """JPEG frames of a moving square (Pillow), or JPEG-framed filler bytes without it"""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        filler = bytes(FRAME_BYTES - 4)
+        return [b"\xff\xd8" + filler + b"\xff\xd9" for _ in range(count)]
+    frames = []
+    for i in range(count):
+        image = Image.new("RGB", size, (40, 40, 40))
+        x = int((size[0] - 60) * i / max(1, count - 1))
+        ImageDraw.Draw(image).rectangle([x, 90, x + 60, 150], fill=(220, 180, 40))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=70)
+        frames.append(buffer.getvalue())
+    return frames
+
+
+class CameraBoard(Board):
+    kind = "esp32cam"
+    not_found = (404, "text/plain", "Not found")
+
+    def __init__(self, device_id, faults, fps=CAMERA_FPS, **options):
+        """Initialize the ESP32-CAM: MJPEG stream, capture and flash"""
+        super().__init__(device_id, faults, **options)
+        self.fps = fps
+        self.flash = False
+        self.frames = camera_frames()
+        self.stopped = threading.Event()
+        self.routes = {"/capture": self.capture, "/flash": self.set_flash,
+                       "/": lambda query: (200, "text/html", "<html><body><img src=\"/stream\"></body></html>")}
+
+    def frame(self):
+        return self.frames[int(time.monotonic() * self.fps) % len(self.frames)]
+
+    def capture(self, query):
+        return 200, "image/jpeg", self.frame()
+
+    def set_flash(self, query):
+        self.flash = "state=on" in query.split("&")
+        return 200, "text/plain", "flash:on" if self.flash else "flash:off"
+
+    def handle(self, request, path, query):
+        if path != "/stream":
+            return super().handle(request, path, query)
+        # Like the sketch, the board does nothing else while it streams
+        request.close_connection = True
+        request.send_response(200)
+        request.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        request.send_header("Cache-Control", "no-cache")
+        request.send_header("Connection", "close")
+        request.end_headers()
+        try:
+            while not self.stopped.is_set():
+                data = self.frame()
+                request.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(data))
+                request.wfile.write(data)
+                request.wfile.write(b"\r\n")
+                request.wfile.flush()
+                time.sleep(1 / self.fps)
+        except OSError:
+            pass
+        return None
+
+
+def _handler(board):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            board.serve(self)
+
+    return Handler
+
+
+class BoardServer:
+    def __init__(self, board, host="127.0.0.1", port=0):
+        """Bind a board to host:port (port 0 picks a free one)"""
+        self.board = board
+        self.httpd = ThreadingHTTPServer((host, port), _handler(board))
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=f"sim-{self.board.device_id}",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.board.online = False
+        if isinstance(self.board, CameraBoard):
+            self.board.stopped.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class Simulator:
+    boards = (("arduino1", D1Board), ("arduino3", NodeMcuBoard), ("arduino2", CameraBoard))
+
+    def __init__(self, faults=None, host="127.0.0.1", port=0, serial=True, fps=CAMERA_FPS):
+        """Bind one server per board on consecutive ports from port (free ports with 0)"""
+        self.faults = faults or Faults()
+        self.servers = {}
+        for offset, (device_id, board_class) in enumerate(self.boards):
+            options = {"serial": serial}
+            if board_class is CameraBoard:
+                options["fps"] = fps
+            board = board_class(device_id, self.faults, **options)
+            self.servers[device_id] = BoardServer(board, host, port + offset if port else 0)
+
+    def start(self):
+        for server in self.servers.values():
+            server.start()
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.stop()
+
+    def set_online(self, device_id, online):
+        """Take a board off the network (connections dropped) or bring it back"""
+        self.servers[device_id].board.online = online
+
+    def urls(self):
+        return {device_id: server.url for device_id, server in self.servers.items()}
+
+    def stats(self):
+        return {device_id: server.board.stats() for device_id, server in self.servers.items()}
+
+    def devices_config(self, registry_file=DEFAULT_REGISTRY_FILE):
+        """The registry file with every simulated board pointed at its local server (camera enabled)"""
+        with open(registry_file) as f:
+            raw = json.load(f)
+        for device_id, server in self.servers.items():
+            config = raw.get("devices", {}).get(device_id)
+            if config is not None:
+                config.update(host=server.host, port=server.port, enabled=True)
+        return raw
+
+    def write_devices(self, path, registry_file=DEFAULT_REGISTRY_FILE):
+        with open(path, "w") as f:
+            json.dump(self.devices_config(registry_file), f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the Arduino boards' HTTP APIs on local ports")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"first port; D1, NodeMCU and camera use port, port+1, port+2 (default {DEFAULT_PORT})")
+    parser.add_argument("--latency", type=float, default=0, help="network latency per request, ms")
+    parser.add_argument("--jitter", type=float, default=0, help="latency varies by +/- this many ms")
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--timeout-rate", type=float, default=0, help="fraction of requests never answered")
+    parser.add_argument("--hang", type=float, default=HANG_SECONDS, help="seconds a never-answered request is held")
+    parser.add_argument("--parallel", action="store_true", help="answer requests in parallel (boards are serial)")
+    parser.add_argument("--fps", type=float, default=CAMERA_FPS, help="camera frames per second")
+    parser.add_argument("--seed", type=int, help="random seed for repeatable fault sequences")
+    parser.add_argument("--write-devices", metavar="PATH", help="write a devices.json pointing at the simulator")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency / 1000, args.jitter / 1000, args.failure_rate, args.timeout_rate,
+                    args.hang, args.seed)
+    simulator = Simulator(faults, args.host, args.port, serial=not args.parallel, fps=args.fps).start()
+    for device_id, url in simulator.urls().items():
+        print(f"{device_id}: {url}")
+    if args.write_devices:
+        simulator.write_devices(args.write_devices)
+        print(f"Registry written to {args.write_devices}; start the server with DEVICES_FILE={args.write_devices}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
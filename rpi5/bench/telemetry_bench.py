@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Telemetry Ingest Benchmark
+Simulates many boards pushing state datagrams to a TelemetryListener on
+loopback and measures ingest throughput and end-to-end latency (datagram
+sent -> change published by the state cache, which is when /api/stream
+clients get it). No hardware needed:
+
+    python3 rpi5/bench/telemetry_bench.py --boards 50 --rate 20 --seconds 10
+    python3 rpi5/bench/telemetry_bench.py --boards 50 --rate 0     # as fast as possible
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from device_cache import DeviceStateCache  # noqa: E402
+from telemetry import TelemetryListener  # noqa: E402
+
+
+def datagram(board, seq):
+    """A board's state; mh_analog carries the sequence number so each change is unique"""
+    return json.dumps({
+        "id": f"board{board}", "seq": seq, "v": 1,
+        "builtin_led": seq % 2, "relay_channel_1": 0, "relay_channel_2": 1,
+        "mh_digital": 1, "mh_analog": seq, "sensor_age": 0, "ip": "127.0.0.1",
+    }, separators=(",", ":")).encode()
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Bench:
+    def __init__(self, boards, rate, seconds, senders):
+        """Initialize the listener, the state cache it feeds and the simulated boards"""
+        self.boards = boards
+        self.rate = rate
+        self.seconds = seconds
+        self.senders = senders
+        self.cache = DeviceStateCache(ttl=3600)
+        self.listener = TelemetryListener(self.apply, "127.0.0.1", 0)
+        # (board id, seq) -> perf_counter at send
+        self.sent_at = {}
+        self.sent = 0
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def apply(self, batch):
+        for device_id, fields, received, _ in batch:
+            self.cache.update(device_id, fields, now=received)
+
+    def watch(self, subscription, stop):
+        while not stop.is_set():
+            event = subscription.get(timeout=0.2)
+            if event is None or "mh_analog" not in event["fields"]:
+                continue
+            now = time.perf_counter()
+            with self._lock:
+                sent = self.sent_at.pop((event["device"], event["fields"]["mh_analog"]), None)
+            if sent is not None:
+                self.latencies.append(now - sent)
+
+    def send(self, boards, stop):
+        sockets = {board: socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for board in boards}
+        interval = 1 / self.rate if self.rate else 0
+        seq = 0
+        next_tick = time.perf_counter()
+        while not stop.is_set():
+            seq += 1
+            for board, sock in sockets.items():
+                with self._lock:
+                    self.sent_at[(f"board{board}", seq)] = time.perf_counter()
+                    self.sent += 1
+                sock.sendto(datagram(board, seq), self.listener.address)
+            if interval:
+                next_tick += interval
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        for sock in sockets.values():
+            sock.close()
+
+    def run(self):
+        subscription = self.cache.subscribe()
+        stop_watch = threading.Event()
+        stop_send = threading.Event()
+        watcher = threading.Thread(target=self.watch, args=(subscription, stop_watch), daemon=True)
+        watcher.start()
+        self.listener.start()
+
+        groups = [list(range(i, self.boards, self.senders)) for i in range(self.senders)]
+        threads = [threading.Thread(target=self.send, args=(group, stop_send), daemon=True) for group in groups if group]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(self.seconds)
+        stop_send.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        time.sleep(0.5)  # let the listener drain
+        stop_watch.set()
+        watcher.join()
+        self.listener.stop()
+        return elapsed
+
+    def report(self, elapsed):
+        counts = self.listener.counts
+        accepted = counts["decoded"]
+        batches = max(1, self.listener.batches)
+        print(f"boards={self.boards} rate={self.rate or 'max'}/s per board seconds={elapsed:.1f}")
+        print(f"sent={self.sent} accepted={accepted} lost={self.sent - accepted - counts['stale'] - counts['invalid']} "
+              f"stale={counts['stale']} invalid={counts['invalid']}")
+        print(f"ingest={accepted / elapsed:.0f} datagrams/s  batches={self.listener.batches} "
+              f"avg_batch={accepted / batches:.1f}")
+        ms = [latency * 1000 for latency in self.latencies]
+        print(f"latency_ms p50={percentile(ms, 0.5):.2f} p95={percentile(ms, 0.95):.2f} "
+              f"p99={percentile(ms, 0.99):.2f} max={max(ms, default=float('nan')):.2f} "
+              f"(measured={len(ms)}; the rest were dropped or merged into a later datagram of the same board)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loopback benchmark of the UDP telemetry ingest")
+    parser.add_argument("--boards", type=int, default=50, help="simulated boards (default 50)")
+    parser.add_argument("--rate", type=float, default=20, help="datagrams per second per board, 0 = unthrottled")
+    parser.add_argument("--seconds", type=float, default=10, help="test duration (default 10)")
+    parser.add_argument("--senders", type=int, default=4, help="sender threads (default 4)")
+    args = parser.parse_args()
+
+    bench = Bench(args.boards, args.rate, args.seconds, args.senders)
+    bench.report(bench.run())
+
+
+if __name__ == "__main__":
+    main()
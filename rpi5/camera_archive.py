@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Camera Recording for the RPI5 Web Interface
+Records frames from the camera relay into rolling segment files: each
+segment is an append-only file of concatenated JPEGs plus an index of
+(timestamp, offset, length, flags) records. Writes leave in large
+buffered chunks, old segments are deleted past a size and age budget, and
+playback memory-maps a segment and seeks through its index. An optional
+motion detector (NumPy + Pillow) raises the recording rate from one frame
+every few seconds to every frame while something moves.
+"""
+
+import bisect
+import io
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "camera")
+
+# Seconds of recording per segment file
+SEGMENT_SECONDS = 600
+# Oldest segments are deleted beyond this total size or age
+MAX_ARCHIVE_BYTES = 4 * 1024 ** 3
+RETENTION = 7 * 24 * 3600
+# Frames are buffered in memory and written out at most every FLUSH_INTERVAL
+# seconds or whenever WRITE_BUFFER bytes are pending: few, large SD card writes
+WRITE_BUFFER = 1024 * 1024
+FLUSH_INTERVAL = 5
+
+# Seconds between recorded frames while nothing moves
+IDLE_INTERVAL = 5
+# Seconds every frame is kept after the last detected motion
+MOTION_HOLD = 10
+# Seconds between motion checks (each decodes a downscaled frame)
+DETECT_INTERVAL = 0.2
+# Frames are compared at this size, in grayscale
+MOTION_SIZE = (160, 120)
+# A pixel changed if its brightness moved by more than this (0-255)
+MOTION_PIXEL_DELTA = 25
+# Motion if at least this fraction of the pixels changed
+MOTION_AREA = 0.01
+
+# Index record: timestamp, offset and length in the data file, flags
+INDEX_RECORD = struct.Struct("<dQII")
+FLAG_MOTION = 1
+
+DATA_SUFFIX = ".mjpg"
+INDEX_SUFFIX = ".idx"
+
+
+class SegmentWriter:
+    def __init__(self, directory, start):
+        """Open (or continue) the segment starting at start"""
+        base = os.path.join(directory, str(int(start * 1000)))
+        self.start = start
+        self.data_path = base + DATA_SUFFIX
+        self.index_path = base + INDEX_SUFFIX
+        self._data = open(self.data_path, "ab", buffering=WRITE_BUFFER)
+        self._index = open(self.index_path, "ab", buffering=64 * 1024)
+        self.offset = self._data.tell()
+
+    def append(self, ts, data, flags=0):
+        self._data.write(data)
+        self._index.write(INDEX_RECORD.pack(ts, self.offset, len(data), flags))
+        self.offset += len(data)
+
+    def flush(self):
+        # Data first: an index record must never point past the data on disk
+        self._data.flush()
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+
+class SegmentReader:
+    def __init__(self, data_path, index_path):
+        """Memory-map one segment and load its index"""
+        size = os.path.getsize(data_path)
+        with open(index_path, "rb") as index_file:
+            raw = index_file.read()
+        raw = raw[:len(raw) - len(raw) % INDEX_RECORD.size]
+        # Records written after the last data flush (e.g. a crash) are dropped
+        self.entries = [entry for entry in INDEX_RECORD.iter_unpack(raw) if entry[1] + entry[2] <= size]
+        self.times = [entry[0] for entry in self.entries]
+        self._file = open(data_path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def find(self, ts):
+        """Index of the last frame at or before ts, or -1"""
+        return bisect.bisect_right(self.times, ts) - 1
+
+    def frame(self, i):
+        """(ts, jpeg bytes, flags) of frame i; only its pages are read from disk"""
+        ts, offset, length, flags = self.entries[i]
+        return ts, self._map[offset:offset + length], flags
+
+    def frames(self, start, end):
+        """Frames with start <= ts < end, in order"""
+        for i in range(bisect.bisect_left(self.times, start), bisect.bisect_left(self.times, end)):
+            yield self.frame(i)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class CameraArchive:
+    def __init__(self, directory=None, segment_seconds=SEGMENT_SECONDS,
+                 max_bytes=MAX_ARCHIVE_BYTES, retention=RETENTION):
+        """Initialize the archive of one camera; nothing is written until append()"""
+        self.directory = directory or DEFAULT_ARCHIVE_DIR
+        self.segment_seconds = segment_seconds
+        self.max_bytes = max_bytes
+        self.retention = retention
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writer = None
+        self._last_flush = time.monotonic()
+
+    def append(self, ts, data, flags=0):
+        """Record one frame, starting a new segment every segment_seconds"""
+        with self._lock:
+            if self._writer is None or ts - self._writer.start >= self.segment_seconds:
+                if self._writer is not None:
+                    self._writer.close()
+                self._writer = SegmentWriter(self.directory, ts)
+                self.prune(ts)
+            self._writer.append(ts, data, flags)
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        if time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Write buffered frames out"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if self._writer is not None:
+                self._writer.flush()
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    def _paths(self, start):
+        base = os.path.join(self.directory, str(start))
+        return base + DATA_SUFFIX, base + INDEX_SUFFIX
+
+    def segment_starts(self):
+        """Start times (ms) of every segment, oldest first"""
+        starts = []
+        for name in os.listdir(self.directory):
+            stem, suffix = os.path.splitext(name)
+            if suffix == INDEX_SUFFIX and stem.isdigit():
+                starts.append(int(stem))
+        return sorted(starts)
+
+    def prune(self, now=None):
+        """Delete the oldest segments beyond the age and size budget (never the one being written)"""
+        now = time.time() if now is None else now
+        current = None if self._writer is None else int(self._writer.start * 1000)
+        segments = [(start, self._paths(start)) for start in self.segment_starts() if start != current]
+        total = sum(os.path.getsize(path) for _, paths in segments for path in paths if os.path.exists(path))
+        if self._writer is not None:
+            total += self._writer.offset
+        for start, paths in segments:
+            if start / 1000 >= now - self.retention and total <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    total -= os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def open_segment(self, start):
+        """SegmentReader for the segment starting at start (ms)"""
+        return SegmentReader(*self._paths(start))
+
+    def segments(self):
+        """Summary of every segment: start/end time, frames and size"""
+        summaries = []
+        for start in self.segment_starts():
+            data_path, index_path = self._paths(start)
+            try:
+                count = os.path.getsize(index_path) // INDEX_RECORD.size
+                end = start / 1000
+                if count:
+                    with open(index_path, "rb") as index_file:
+                        index_file.seek((count - 1) * INDEX_RECORD.size)
+                        end = INDEX_RECORD.unpack(index_file.read(INDEX_RECORD.size))[0]
+                summaries.append({"start": start / 1000, "end": end, "frames": count,
+                                  "bytes": os.path.getsize(data_path)})
+            except OSError:
+                continue
+        return summaries
+
+    def _covering(self, start, end):
+        starts = self.segment_starts()
+        first = max(0, bisect.bisect_right(starts, start * 1000) - 1)
+        return [s for s in starts[first:] if s < end * 1000]
+
+    def frame_at(self, ts):
+        """(ts, jpeg, flags) of the last recorded frame at or before ts, or None"""
+        for start in reversed(self._covering(ts, ts + 1e-3)):
+            with self.open_segment(start) as segment:
+                i = segment.find(ts)
+                if i >= 0:
+                    return segment.frame(i)
+        return None
+
+    def frames(self, start, end):
+        """Recorded frames with start <= ts < end, in order"""
+        for segment_start in self._covering(start, end):
+            with self.open_segment(segment_start) as segment:
+                yield from segment.frames(start, end)
+
+
+class MotionDetector:
+    def __init__(self, size=MOTION_SIZE, pixel_delta=MOTION_PIXEL_DELTA, area=MOTION_AREA):
+        """Initialize the detector; raises ImportError without numpy and Pillow"""
+        import numpy
+        from PIL import Image
+
+        self._np = numpy
+        self._image = Image
+        self.size = size
+        self.pixel_delta = pixel_delta
+        self.area = area
+        self.score = 0.0
+        self._previous = None
+
+    def update(self, jpeg):
+        """Compare a frame with the previous one; True if enough pixels changed"""
+        image = self._image.open(io.BytesIO(jpeg))
+        # libjpeg decodes straight to 1/2..1/8 scale, far cheaper than a full decode
+        image.draft("L", self.size)
+        pixels = self._np.asarray(image.convert("L").resize(self.size), dtype=self._np.int16)
+        previous, self._previous = self._previous, pixels
+        if previous is None:
+            return False
+        changed = self._np.count_nonzero(self._np.abs(pixels - previous) > self.pixel_delta)
+        self.score = changed / pixels.size
+        return self.score >= self.area
+
+
+class CameraRecorder:
+    def __init__(self, proxy, archive, idle_interval=IDLE_INTERVAL, motion_hold=MOTION_HOLD):
+        """Initialize a recorder feeding frames from a CameraProxy into a CameraArchive"""
+        self.proxy = proxy
+        self.archive = archive
+        self.idle_interval = idle_interval
+        self.motion_hold = motion_hold
+        try:
+            self.detector = MotionDetector()
+        except ImportError:
+            self.detector = None
+            log.warning("motion detection disabled (needs numpy and Pillow) camera=%s", proxy.name)
+        self.motion = False
+        self.recorded = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"record-{self.proxy.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _check_motion(self, frame):
+        try:
+            moving = self.detector.update(frame.data)
+        except (OSError, ValueError) as e:
+            log.debug("motion check skipped camera=%s error=%s", self.proxy.name, e)
+            return False
+        if moving and not self.motion:
+            log.info("motion detected camera=%s score=%.3f", self.proxy.name, self.detector.score)
+        return moving
+
+    def _run(self):
+        # Holding a viewer slot keeps the camera connection open while recording
+        self.proxy.attach()
+        try:
+            seq = 0
+            last_saved = last_check = motion_until = 0
+            while not self._stop.is_set():
+                frames = self.proxy.frames_since(seq, timeout=1)
+                if not frames:
+                    self.archive.flush_if_due()
+                    continue
+                for frame in frames:
+                    seq = frame.seq
+                    if self.detector is not None and frame.ts - last_check >= DETECT_INTERVAL:
+                        last_check = frame.ts
+                        if self._check_motion(frame):
+                            motion_until = frame.ts + self.motion_hold
+                    self.motion = frame.ts < motion_until
+                    if self.motion or frame.ts - last_saved >= self.idle_interval:
+                        self.archive.append(frame.ts, frame.data, FLAG_MOTION if self.motion else 0)
+                        last_saved = frame.ts
+                        self.recorded += 1
+        finally:
+            self.proxy.detach()
+            self.archive.close()
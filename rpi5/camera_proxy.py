@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Camera Relay for the RPI5 Web Interface
+Keeps a single MJPEG connection to the ESP32-CAM whatever the number of
+viewers, and keeps the last few frames in a ring buffer. Every viewer is
+sent the newest frame (slow viewers skip frames instead of queueing them),
+and snapshots come from the buffer. Under several gunicorn workers one
+worker owns the camera connection and relays frames to the others over a
+Unix socket.
+"""
+
+import collections
+import io
+import logging
+import os
+import socket
+import threading
+import time
+
+import requests
+
+import http_pool
+from shared_state import LeaderLock
+
+log = logging.getLogger(__name__)
+
+# Frames kept in memory per camera
+FRAME_BUFFER_SIZE = 8
+# Seconds without viewers before the camera connection is closed
+IDLE_TIMEOUT = 30
+# Seconds between reconnect attempts while viewers are waiting
+RECONNECT_DELAY = 2
+# A frame older than this is not served as a snapshot without refreshing
+SNAPSHOT_MAX_AGE = 2
+# Seconds a snapshot request waits for a fresh frame
+SNAPSHOT_WAIT = 5
+# Seconds without a new frame before a viewer's stream is ended
+STREAM_STALL_TIMEOUT = 30
+# Read timeout on the MJPEG connection (the camera sends several frames per second)
+STREAM_READ_TIMEOUT = 10
+
+MAX_FRAME_SIZE = 2 * 1024 * 1024
+MAX_HEADER_LINE = 1024
+
+# Boundary used towards viewers (the ESP32-CAM sketch uses the same)
+BOUNDARY = "frame"
+
+
+class Frame:
+    __slots__ = ("seq", "data", "ts")
+
+    def __init__(self, seq, data, ts):
+        self.seq = seq
+        self.data = data
+        self.ts = ts
+
+
+def part_header(length):
+    """Multipart header sent before each frame"""
+    return (
+        f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {length}\r\n\r\n"
+    ).encode()
+
+
+def boundary_from(content_type):
+    """Boundary parameter of a multipart Content-Type header"""
+    for param in content_type.split(";")[1:]:
+        name, _, value = param.strip().partition("=")
+        if name.lower() == "boundary":
+            return value.strip('"').encode()
+    raise ValueError(f"No multipart boundary in '{content_type}'")
+
+
+def read_frames(stream, boundary):
+    """Yield JPEG payloads from a multipart/x-mixed-replace byte stream.
+
+    Each part must carry a Content-Length header (the ESP32-CAM sketch sends
+    one), so a frame is read in one call instead of scanning for the boundary.
+    """
+    delimiter = b"--" + boundary
+    while True:
+        line = stream.readline(MAX_HEADER_LINE)
+        if not line:
+            return
+        if not line.strip().startswith(delimiter):
+            continue
+        length = None
+        while True:
+            header = stream.readline(MAX_HEADER_LINE)
+            if not header:
+                return
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value.strip())
+        if length is None or length > MAX_FRAME_SIZE:
+            raise ValueError("Frame without a usable Content-Length")
+        data = stream.read(length)
+        if len(data) < length:
+            return
+        yield data
+
+
+class _ArrivedBytes(io.RawIOBase):
+    """Raw stream over a urllib3 response whose reads return what has arrived.
+
+    urllib3's read(n) waits for all n bytes, so a BufferedReader on top of
+    it would hold frames back until its whole buffer filled.
+    """
+
+    def __init__(self, response):
+        self._response = response
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._response.read1(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class CameraProxy:
+    def __init__(self, name, url, runtime_dir, buffer_size=FRAME_BUFFER_SIZE, idle_timeout=IDLE_TIMEOUT):
+        """Initialize the relay for one camera; nothing connects until a viewer arrives"""
+        self.name = name
+        self.url = url
+        self.idle_timeout = idle_timeout
+        self.frames = collections.deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._viewers = 0
+        self._last_viewer = time.monotonic()
+        self._thread = None
+        self._server = None
+        # Held by the worker that talks to the camera itself
+        self.owner_lock = LeaderLock(os.path.join(runtime_dir, f"camera-{name}.lock"))
+        self.socket_path = os.path.join(runtime_dir, f"camera-{name}.sock")
+        self.source = None
+        self.error = None
+        self.frames_received = 0
+        self.connects = 0
+
+    def _publish(self, data):
+        with self._cond:
+            self._seq += 1
+            self.frames.append(Frame(self._seq, data, time.time()))
+            self.frames_received += 1
+            self._cond.notify_all()
+
+    def latest(self):
+        """Newest buffered frame, or None"""
+        with self._cond:
+            return self.frames[-1] if self.frames else None
+
+    def wait_frame(self, after_seq, timeout):
+        """Wait for a frame newer than after_seq; returns the newest one or None"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.frames and self.frames[-1].seq > after_seq, timeout)
+            frame = self.frames[-1] if self.frames else None
+            return frame if frame is not None and frame.seq > after_seq else None
+
+    def frames_since(self, after_seq, timeout):
+        """Wait for frames newer than after_seq; returns every one still buffered, oldest first"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.frames and self.frames[-1].seq > after_seq, timeout)
+            return [frame for frame in self.frames if frame.seq > after_seq]
+
+    def attach(self):
+        """Register a viewer, connecting to the camera if needed"""
+        with self._cond:
+            self._viewers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"camera-{self.name}", daemon=True)
+                self._thread.start()
+
+    def detach(self):
+        """Unregister a viewer"""
+        with self._cond:
+            self._viewers -= 1
+            self._last_viewer = time.monotonic()
+
+    @property
+    def viewers(self):
+        with self._cond:
+            return self._viewers
+
+    def _idle(self):
+        with self._cond:
+            return self._viewers <= 0 and time.monotonic() - self._last_viewer > self.idle_timeout
+
+    def stream(self):
+        """Multipart chunks for one viewer.
+
+        The frame is yielded as the same bytes object for every viewer, so
+        fan-out does not copy frame data.
+        """
+        self.attach()
+        try:
+            seq = 0
+            while True:
+                frame = self.wait_frame(seq, STREAM_STALL_TIMEOUT)
+                if frame is None:
+                    return  # camera stalled; the browser reconnects
+                seq = frame.seq
+                yield part_header(len(frame.data))
+                yield frame.data
+                yield b"\r\n"
+        finally:
+            self.detach()
+
+    def snapshot(self, max_age=SNAPSHOT_MAX_AGE):
+        """Latest frame from the buffer; opens the relay briefly if it is idle"""
+        frame = self.latest()
+        if frame is not None and time.time() - frame.ts <= max_age:
+            return frame
+        self.attach()
+        try:
+            fresh = self.wait_frame(frame.seq if frame else 0, SNAPSHOT_WAIT)
+        finally:
+            self.detach()
+        return fresh or frame
+
+    def stats(self):
+        """Relay state for /api/camera/status"""
+        frame = self.latest()
+        return {
+            "camera": self.name,
+            "source": self.source,
+            "viewers": self.viewers,
+            "frames_received": self.frames_received,
+            "connects": self.connects,
+            "last_frame_age": None if frame is None else round(time.time() - frame.ts, 3),
+            "error": self.error,
+        }
+
+    def _run(self):
+        while True:
+            self._serve()
+            with self._cond:
+                # Let go of the camera before attach() may start another
+                # thread; a viewer that arrived meanwhile keeps this one
+                if not self._idle():
+                    continue
+                self._stop_relay_server()
+                self.owner_lock.release()
+                self.source = None
+                self._thread = None
+                return
+
+    def _serve(self):
+        """Feed the buffer from the camera or another worker's relay until idle"""
+        while not self._idle():
+            try:
+                if self.owner_lock.try_acquire():
+                    self.source = "camera"
+                    self._start_relay_server()
+                    self._read_camera()
+                else:
+                    self.source = "relay"
+                    self._read_relay()
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                log.warning("camera stream failed camera=%s source=%s error=%s", self.name, self.source, e)
+            if not self._idle():
+                time.sleep(RECONNECT_DELAY)
+
+    def _consume(self, stream, boundary):
+        self.connects += 1
+        for data in read_frames(stream, boundary):
+            self._publish(data)
+            if self._idle():
+                return
+
+    def _read_camera(self):
+        """Read frames straight from the camera (one connection for all viewers)"""
+        timeout = (http_pool.CONNECT_TIMEOUT, STREAM_READ_TIMEOUT)
+        with requests.get(self.url, stream=True, timeout=timeout) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code} from {self.url}")
+            boundary = boundary_from(response.headers.get("Content-Type", ""))
+            response.raw.decode_content = False
+            self._consume(io.BufferedReader(_ArrivedBytes(response.raw), 64 * 1024), boundary)
+
+    def _read_relay(self):
+        """Read frames from the worker that owns the camera connection"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(STREAM_READ_TIMEOUT)
+            sock.connect(self.socket_path)
+            with sock.makefile("rb") as stream:
+                self._consume(stream, BOUNDARY.encode())
+
+    def _start_relay_server(self):
+        if self._server is not None:
+            return
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen(8)
+        self._server = server
+        threading.Thread(target=self._accept_relay_clients, args=(server,), daemon=True).start()
+
+    def _stop_relay_server(self):
+        if self._server is None:
+            return
+        self._server.close()
+        self._server = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    def _accept_relay_clients(self, server):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._relay_to, args=(conn,), daemon=True).start()
+
+    def _relay_to(self, conn):
+        """Send the frame stream to another worker (counts as a viewer)"""
+        chunks = self.stream()
+        try:
+            with conn:
+                for chunk in chunks:
+                    conn.sendall(chunk)
+        except OSError:
+            pass
+        finally:
+            chunks.close()
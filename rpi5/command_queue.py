@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Command Coalescing for the RPI5 Web Interface
+Reads of the same board are shared by every caller that asks while one is
+already in flight ("single-flight"). Commands to a board run one at a time
+in arrival order, and a repeated idempotent command (on, on, on) joins the
+identical command ahead of it instead of being sent again.
+"""
+
+import threading
+
+# Commands waiting per board before new ones are refused
+MAX_PENDING = 8
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a board already has MAX_PENDING commands waiting"""
+
+
+class _Call:
+    def __init__(self, key):
+        self.key = key
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def run(self, fn):
+        try:
+            self.result = fn()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+        return self.wait()
+
+
+class SingleFlight:
+    def __init__(self):
+        """Initialize the table of in-flight calls"""
+        self._lock = threading.Lock()
+        self._calls = {}
+        # Callers that shared another caller's result
+        self.joined = 0
+
+    def do(self, key, fn):
+        """Run fn, or wait for the identical call already running and share its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            owner = call is None
+            if owner:
+                call = self._calls[key] = _Call(key)
+            else:
+                self.joined += 1
+        if not owner:
+            return call.wait()
+        try:
+            return call.run(fn)
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class DeviceCommandQueue:
+    def __init__(self, max_pending=MAX_PENDING):
+        """Initialize an empty FIFO for one board"""
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        # Last command submitted; an identical idempotent one may join it
+        self._tail = None
+        self.joined = 0
+
+    def submit(self, key, fn, idempotent=False):
+        """Run fn after every command submitted before it and return its result.
+
+        If the command submitted just before this one has the same key, is
+        idempotent and has not finished, its result is shared instead.
+        """
+        with self._cond:
+            tail = self._tail
+            if idempotent and tail is not None and tail.key == key and not tail.done.is_set():
+                join = tail
+                self.joined += 1
+            else:
+                join = None
+                if self._next_ticket - self._serving >= self.max_pending:
+                    raise QueueFullError(f"{self._next_ticket - self._serving} commands already waiting")
+                call = self._tail = _Call(key)
+                ticket = self._next_ticket
+                self._next_ticket += 1
+        if join is not None:
+            return join.wait()
+
+        with self._cond:
+            while self._serving != ticket:
+                self._cond.wait()
+        try:
+            return call.run(fn)
+        finally:
+            with self._cond:
+                self._serving += 1
+                self._cond.notify_all()
+
+    def pending(self):
+        """Commands waiting or running"""
+        with self._cond:
+            return self._next_ticket - self._serving
+
+
+class CommandRouter:
+    def __init__(self, max_pending=MAX_PENDING):
+        """Initialize per-board command queues and the shared read table"""
+        self.max_pending = max_pending
+        self.reads = SingleFlight()
+        self._lock = threading.Lock()
+        self._queues = {}
+
+    def queue(self, device_id):
+        """The command queue of one board"""
+        with self._lock:
+            queue = self._queues.get(device_id)
+            if queue is None:
+                queue = self._queues[device_id] = DeviceCommandQueue(self.max_pending)
+            return queue
+
+    def read(self, device_id, key, fn):
+        """Coalesce identical concurrent reads of a board"""
+        return self.reads.do((device_id, key), fn)
+
+    def command(self, device_id, key, fn, idempotent=False):
+        """Queue a command to a board"""
+        return self.queue(device_id).submit(key, fn, idempotent)
+
+    def stats(self):
+        """How many reads and commands were served by joining an identical one"""
+        with self._lock:
+            queues = list(self._queues.values())
+        return {"read": self.reads.joined, "command": sum(queue.joined for queue in queues)}
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Device State Cache for the RPI5 Web Interface
+Holds the last known state of every board, fed by the background pollers.
+Read endpoints answer from here instead of calling the boards, and
+subscribers (e.g. the /api/stream push channel) receive state deltas.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Seconds a poll result is considered fresh
+DEFAULT_TTL = 10
+
+# Pending events per subscriber before it is told to resynchronize
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class Subscription:
+    def __init__(self):
+        """Initialize a subscriber's event queue"""
+        self.events = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Set when events were dropped; the consumer should send a full snapshot
+        self.lagged = False
+
+    def publish(self, event):
+        """Queue an event without ever blocking the publisher"""
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.lagged = True
+
+    def get(self, timeout=None):
+        """Wait for the next event; returns None on timeout"""
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class DeviceStateCache:
+    def __init__(self, ttl=DEFAULT_TTL):
+        """Initialize an empty cache"""
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._subscribers = set()
+        # Bumped on every write, so a reader can tell whether anything changed
+        self.version = 0
+
+    def subscribe(self):
+        """Register for state-change events and return the subscription"""
+        subscription = Subscription()
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop delivering events to a subscription"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        """Number of active subscriptions"""
+        with self._lock:
+            return len(self._subscribers)
+
+    def _publish(self, event):
+        """Fan an event out to every subscriber (lock held)"""
+        for subscription in self._subscribers:
+            subscription.publish(event)
+
+    def _entry(self, device):
+        """Return the entry for a device, creating it if needed (lock held)"""
+        entry = self._devices.get(device)
+        if entry is None:
+            entry = {
+                "fields": {},
+                "field_ts": {},
+                "last_success": None,
+                "last_attempt": None,
+                "error": None,
+            }
+            self._devices[device] = entry
+        return entry
+
+    def update(self, device, fields, now=None, success=True):
+        """Record polled fields; only the given fields are stamped.
+
+        With success=False the fields are stored (e.g. a secondary endpoint
+        answered) but the device is not marked as successfully polled.
+        A field already stamped later than now (e.g. by a command that
+        completed while this poll was in flight) keeps its newer value.
+        Returns the fields whose value changed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self.version += 1
+            entry = self._entry(device)
+            changed = {}
+            for name, value in fields.items():
+                if entry["field_ts"].get(name, now) > now:
+                    continue
+                if name not in entry["fields"] or entry["fields"][name] != value:
+                    changed[name] = value
+                entry["fields"][name] = value
+                entry["field_ts"][name] = now
+            recovered = False
+            if success:
+                recovered = entry["error"] is not None or entry["last_success"] is None
+                entry["last_success"] = max(now, entry["last_success"] or now)
+                entry["last_attempt"] = max(now, entry["last_attempt"] or now)
+                entry["error"] = None
+            if changed or recovered:
+                self._publish({"device": device, "fields": changed, "error": entry["error"], "ts": now})
+            return changed
+
+    def mark_error(self, device, error, now=None):
+        """Record a failed poll, keeping the previous field values"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.version += 1
+            entry = self._entry(device)
+            entry["last_attempt"] = now
+            previous = entry["error"]
+            entry["error"] = str(error)
+            if previous is None:
+                self._publish({"device": device, "fields": {}, "error": entry["error"], "ts": now})
+
+    def export(self):
+        """Return the raw state of every device (JSON-serializable)"""
+        with self._lock:
+            return {
+                device: {
+                    "fields": dict(entry["fields"]),
+                    "field_ts": dict(entry["field_ts"]),
+                    "last_success": entry["last_success"],
+                    "last_attempt": entry["last_attempt"],
+                    "error": entry["error"],
+                }
+                for device, entry in self._devices.items()
+            }
+
+    def merge(self, device, state):
+        """Apply a device state exported by another process.
+
+        Values older than what this cache already holds are ignored, and
+        subscribers receive the same deltas as for a local update.
+        """
+        with self._lock:
+            self.version += 1
+            entry = self._entry(device)
+            changed = {}
+            for name, value in state["fields"].items():
+                ts = state["field_ts"].get(name) or 0
+                if ts < (entry["field_ts"].get(name) or 0):
+                    continue
+                if name not in entry["fields"] or entry["fields"][name] != value:
+                    changed[name] = value
+                entry["fields"][name] = value
+                entry["field_ts"][name] = ts
+            if (state["last_success"] or 0) > (entry["last_success"] or 0):
+                entry["last_success"] = state["last_success"]
+            error_changed = False
+            if (state["last_attempt"] or 0) >= (entry["last_attempt"] or 0):
+                error_changed = state["error"] != entry["error"]
+                entry["last_attempt"] = state["last_attempt"]
+                entry["error"] = state["error"]
+            if changed or error_changed:
+                self._publish({
+                    "device": device,
+                    "fields": changed,
+                    "error": entry["error"],
+                    "ts": entry["last_attempt"] or time.time(),
+                })
+
+    def is_fresh(self, device, now=None):
+        """Return True if the device had a successful poll within the TTL"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._devices.get(device)
+            return bool(entry and entry["last_success"] and now - entry["last_success"] <= self.ttl)
+
+    def get(self, device, now=None):
+        """Return a snapshot of a device's state, or None if never polled"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._devices.get(device)
+            if entry is None:
+                return None
+            last_success = entry["last_success"]
+            return {
+                "fields": dict(entry["fields"]),
+                "field_ts": dict(entry["field_ts"]),
+                "last_success": last_success,
+                "last_attempt": entry["last_attempt"],
+                "error": entry["error"],
+                "age": None if last_success is None else now - last_success,
+                "fresh": bool(last_success and now - last_success <= self.ttl),
+            }
+
+    def devices(self):
+        """Return the ids of all devices seen so far"""
+        with self._lock:
+            return list(self._devices)
+
+
+def format_timestamp(ts):
+    """Format an epoch timestamp the way the API has always reported it"""
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Device Registry for the RPI5 Web Interface
+Describes every board (address, capabilities, status endpoints, key
+normalization and actions) from a JSON file, so new boards need a config
+entry instead of new code. The file is reloaded when it changes.
+"""
+
+import copy
+import json
+import logging
+import os
+import re
+import threading
+from urllib.parse import urlencode
+
+log = logging.getLogger(__name__)
+
+# Trailing ON/OFF in a toggle reply, e.g. "LED toggled to ON" or "Channel 1 OFF"
+_TOGGLE_REPLY = re.compile(r"\b(ON|OFF)\s*$")
+
+DEFAULT_REGISTRY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "devices.json")
+
+
+class RegistryError(ValueError):
+    """Raised when the registry file is missing or malformed"""
+
+
+class Device:
+    def __init__(self, device_id, config):
+        """Build a device from its registry entry"""
+        self.id = device_id
+        self.config = config
+        try:
+            self.host = config["host"]
+        except KeyError:
+            raise RegistryError(f"Device '{device_id}' has no host")
+        try:
+            self.port = int(config.get("port", 80))
+            self.poll_interval = float(config.get("poll_interval", 2))
+        except (TypeError, ValueError):
+            raise RegistryError(f"Device '{device_id}' has an invalid port/poll_interval")
+        self.name = config.get("name", device_id)
+        self.kind = config.get("kind", "generic")
+        self.capabilities = set(config.get("capabilities", []))
+        self.base_url = f"http://{self.host}:{self.port}"
+
+        # Combined state endpoint (one request per poll); boards whose firmware
+        # answers 404 are polled through the "poll" endpoints instead
+        self.state_path = config.get("state")
+        self.state_supported = None
+        # Endpoint setting several outputs in one request (?field=0/1&...) and
+        # answering with the /state payload; without it (or when the firmware
+        # answers 404) a batch is sent one action at a time
+        self.set_path = config.get("set")
+        self.set_supported = None
+
+        self.poll = []
+        for endpoint in config.get("poll", []):
+            if "path" not in endpoint:
+                raise RegistryError(f"Device '{device_id}' has a poll endpoint without a path")
+            self.poll.append({
+                "path": endpoint["path"],
+                "fields": {name: _as_key_list(keys) for name, keys in endpoint.get("fields", {}).items()},
+                "defaults": endpoint.get("defaults", {}),
+                # Only fetched when the regular endpoints did not provide these fields
+                "fallback": bool(endpoint.get("fallback", False)),
+            })
+
+        self.actions = {}
+        for action, spec in config.get("actions", {}).items():
+            spec = {"path": spec} if isinstance(spec, str) else dict(spec)
+            if "path" not in spec:
+                raise RegistryError(f"Action '{action}' of device '{device_id}' has no path")
+            spec.setdefault("sets", {})
+            # Repeating an action that sets fixed values changes nothing, so
+            # repeats may be collapsed; toggles and unknown effects may not
+            spec.setdefault("idempotent", bool(spec["sets"]) and "toggles" not in spec)
+            self.actions[action] = spec
+
+        self.camera = config.get("camera")
+        # Numeric fields whose readings are kept in the history store
+        self.metrics = list(config.get("metrics", []))
+
+    def url(self, path):
+        """Absolute URL of a path on this board"""
+        return f"{self.base_url}{path}"
+
+    def action_url(self, action):
+        """Absolute URL of a named action, or None if the board lacks it"""
+        spec = self.actions.get(action)
+        return None if spec is None else self.url(spec["path"])
+
+    def set_query(self, actions):
+        """Path applying several actions in one request, or None if they cannot be combined.
+
+        Possible when the board has a "set" endpoint and every action sets
+        fixed ON/OFF values (no toggles); a later action wins on a shared field.
+        """
+        if not self.set_path or self.set_supported is False:
+            return None
+        values = {}
+        for action in actions:
+            spec = self.actions.get(action)
+            if spec is None or "toggles" in spec or not spec["sets"]:
+                return None
+            for name, value in spec["sets"].items():
+                if value not in ("ON", "OFF"):
+                    return None
+                values[name] = 1 if value == "ON" else 0
+        return f"{self.set_path}?{urlencode(values)}"
+
+    def action_effect(self, action, reply, current):
+        """Fields an action changed, from its "sets"/"toggles" spec and the board's reply.
+
+        current holds the cached field values, used to flip a toggled field
+        when the reply does not say the new state.
+        """
+        spec = self.actions.get(action)
+        if spec is None:
+            return {}
+        fields = dict(spec["sets"])
+        toggled = spec.get("toggles")
+        if toggled:
+            text = reply.get("status", "") if isinstance(reply, dict) else str(reply or "")
+            match = _TOGGLE_REPLY.search(text.strip())
+            if match:
+                fields[toggled] = match.group(1)
+            elif current.get(toggled) in ("ON", "OFF"):
+                fields[toggled] = "OFF" if current[toggled] == "ON" else "ON"
+        return fields
+
+    def normalize(self, endpoint, data):
+        """Map one endpoint's raw JSON onto canonical field names"""
+        fields = {}
+        for name, keys in endpoint["fields"].items():
+            for key in keys:
+                if key in data:
+                    fields[name] = data[key]
+                    break
+            else:
+                if name in endpoint["defaults"]:
+                    fields[name] = endpoint["defaults"][name]
+        return fields
+
+    def describe(self):
+        """Public description used by /api/devices"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "kind": self.kind,
+            "ip": self.host,
+            "port": self.port,
+            "capabilities": sorted(self.capabilities),
+            "actions": sorted(self.actions),
+            "poll_interval": self.poll_interval,
+            "metrics": self.metrics,
+        }
+
+
+def _as_key_list(keys):
+    return [keys] if isinstance(keys, str) else list(keys)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path) if path else None
+    except OSError:
+        return None
+
+
+class DeviceRegistry:
+    def __init__(self, path=None, overrides_path=None):
+        """Initialize the registry and load the file.
+
+        overrides_path, if given, stores runtime overrides so that every
+        process sharing it sees them (e.g. all gunicorn workers).
+        """
+        self.path = path or os.environ.get("DEVICES_FILE", DEFAULT_REGISTRY_FILE)
+        self.overrides_path = overrides_path
+        self._lock = threading.Lock()
+        self._raw = {}
+        self._devices = {}
+        self._mtime = None
+        # Runtime overrides (e.g. from /api/config) survive reloads
+        self._overrides = {}
+        self._overrides_mtime = None
+        self.reload()
+
+    def _read(self):
+        try:
+            with open(self.path) as registry_file:
+                raw = json.load(registry_file)
+        except OSError as e:
+            raise RegistryError(f"Cannot read device registry {self.path}: {e}")
+        except ValueError as e:
+            raise RegistryError(f"Invalid JSON in device registry {self.path}: {e}")
+        return raw
+
+    def _read_overrides(self):
+        if not self.overrides_path or not os.path.exists(self.overrides_path):
+            return {}
+        try:
+            with open(self.overrides_path) as overrides_file:
+                return json.load(overrides_file)
+        except (OSError, ValueError) as e:
+            log.warning("ignoring device overrides path=%s error=%s", self.overrides_path, e)
+            return self._overrides
+
+    def _write_overrides(self):
+        tmp_path = f"{self.overrides_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as overrides_file:
+            json.dump(self._overrides, overrides_file)
+        os.replace(tmp_path, self.overrides_path)
+        self._overrides_mtime = _mtime(self.overrides_path)
+
+    def _build(self, raw):
+        devices = {}
+        for device_id, config in raw.get("devices", {}).items():
+            if not config.get("enabled", True):
+                continue
+            config = copy.deepcopy(config)
+            env_prefix = f"DEVICE_{device_id.upper()}_"
+            if os.environ.get(env_prefix + "HOST"):
+                config["host"] = os.environ[env_prefix + "HOST"]
+            if os.environ.get(env_prefix + "PORT"):
+                config["port"] = os.environ[env_prefix + "PORT"]
+            config.update(self._overrides.get(device_id, {}))
+            devices[device_id] = Device(device_id, config)
+        return devices
+
+    def reload(self):
+        """Load the registry file, replacing the device table atomically"""
+        with self._lock:
+            mtime = _mtime(self.path)
+            overrides_mtime = _mtime(self.overrides_path)
+            raw = self._read()
+            self._overrides = self._read_overrides()
+            devices = self._build(raw)
+            self._raw = raw
+            self._devices = devices
+            self._mtime = mtime
+            self._overrides_mtime = overrides_mtime
+
+    def reload_if_changed(self):
+        """Reload when the file (or the shared overrides) changed; returns True if reloaded"""
+        mtime = _mtime(self.path)
+        if mtime is None:
+            return False
+        if mtime == self._mtime and _mtime(self.overrides_path) == self._overrides_mtime:
+            return False
+        try:
+            self.reload()
+        except RegistryError as e:
+            # Keep serving the previous table until the file is fixed
+            self._mtime = mtime
+            log.warning("registry not reloaded error=%s", e)
+            return False
+        return True
+
+    def override(self, device_id, **settings):
+        """Change a device's settings at runtime (kept across reloads)"""
+        with self._lock:
+            if device_id not in self._devices:
+                raise KeyError(device_id)
+            self._overrides.setdefault(device_id, {}).update(settings)
+            self._devices = self._build(self._raw)
+            if self.overrides_path:
+                self._write_overrides()
+
+    def get(self, device_id):
+        """Return the device with this id, or None"""
+        return self._devices.get(device_id)
+
+    def all(self):
+        """Return every enabled device, in registry order"""
+        return list(self._devices.values())
+
+    def ids(self):
+        """Return the ids of every enabled device"""
+        return list(self._devices)
+
+    def section(self, name, default=None):
+        """Return a top-level section of the registry file other than devices"""
+        return copy.deepcopy(self._raw.get(name, default))
+
+    def scene(self, name):
+        """Return a named scene as a list of {"device", "action"} steps, or None"""
+        steps = self.section("scenes", {}).get(name)
+        if steps is None:
+            return None
+        if not isinstance(steps, list) or not all(isinstance(step, dict) for step in steps):
+            raise RegistryError(f"Scene '{name}' must be a list of {{\"device\", \"action\"}} steps")
+        return steps
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Sensor History Export for the RPI5 Web Interface
+Streams recorded readings as CSV, NDJSON or Parquet for analysis off the
+Pi. Rows are read from the history store a page at a time, then encoded
+and compressed chunk by chunk, so memory use stays flat whatever the range.
+Used by /api/export and from the command line:
+
+    python3 rpi5/export.py --device arduino3 --from 2026-01-01 -o mh.csv.gz
+    python3 rpi5/export.py --url https://<ngrok-url> --format parquet -o history.parquet
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+
+from history import PAGE_ROWS, parse_time
+
+# format -> (mimetype, file extension)
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "ndjson": ("application/x-ndjson", ".ndjson"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+COLUMNS = ("device", "metric", "ts", "time", "min", "max", "avg", "count")
+# Range exported when no start is given: the retention of the hourly rollups
+DEFAULT_RANGE = 365 * 24 * 3600
+# Rows per Parquet row group (a few MB of columns in memory at a time)
+PARQUET_ROW_GROUP = 65536
+GZIP_LEVEL = 6
+
+
+class ExportError(ValueError):
+    """Raised for an export that cannot be produced"""
+
+
+def select_series(store, device=None, metric=None):
+    """Recorded (device, metric) pairs, optionally limited to one device and/or metric"""
+    return [(d, m) for d, m in store.series() if device in (None, d) and metric in (None, m)]
+
+
+def export_rows(store, series, start, end, step=None, now=None):
+    """Yield one row per bucket (see COLUMNS) of every series, oldest first.
+
+    Without a step every part of the range comes at the finest resolution
+    still stored: raw samples for the last two days, 1-minute rollups for
+    the last month, hourly ones before that.
+    """
+    start, end = int(start), int(end)
+    if step:
+        table, step = store.plan(start, end, step, now)
+        parts = [(table, step, start, end)]
+    else:
+        parts = store.finest(start, end, now)
+    for device, metric in series:
+        for table, width, part_start, part_end in parts:
+            for bucket, low, high, mean, count in store.iter_buckets(
+                    device, metric, part_start, part_end, table, width):
+                stamp = datetime.fromtimestamp(bucket, timezone.utc).isoformat()
+                yield device, metric, bucket, stamp, low, high, round(mean, 3), count
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for batch in _batches(rows, PAGE_ROWS):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(rows):
+    for batch in _batches(rows, PAGE_ROWS):
+        yield "".join(json.dumps(dict(zip(COLUMNS, row))) + "\n" for row in batch).encode()
+
+
+class _ChunkSink:
+    """Write-only file collecting what the Parquet writer produces between reads"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def parquet_chunks(rows):
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+    schema = pa.schema([("device", pa.string()), ("metric", pa.string()), ("ts", pa.int64()),
+                        ("time", pa.string()), ("min", pa.float64()), ("max", pa.float64()),
+                        ("avg", pa.float64()), ("count", pa.int64())])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    for batch in _batches(rows, PARQUET_ROW_GROUP):
+        writer.write_table(pa.Table.from_pydict(dict(zip(COLUMNS, zip(*batch))), schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def _pyarrow():
+    """The pyarrow module (optional: only the Parquet format needs it)"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ExportError("Parquet export needs pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+ENCODERS = {"csv": csv_chunks, "ndjson": ndjson_chunks, "parquet": parquet_chunks}
+
+
+def encoder(fmt):
+    """Chunk encoder for a format; raises ExportError if it cannot be produced here"""
+    if fmt not in ENCODERS:
+        raise ExportError(f"Unknown format '{fmt}' (use {', '.join(ENCODERS)})")
+    if fmt == "parquet":
+        _pyarrow()
+    return ENCODERS[fmt]
+
+
+def gzip_chunks(chunks, level=GZIP_LEVEL):
+    """Compress a stream of byte chunks into one gzip stream as it goes"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def filename(fmt, device=None, metric=None, compressed=False):
+    """Download name, e.g. history-arduino3-mh_analog.csv"""
+    parts = ["history"] + [part for part in (device, metric) if part]
+    return "-".join(parts) + FORMATS[fmt][1] + (".gz" if compressed else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export recorded sensor history as CSV, NDJSON or Parquet")
+    parser.add_argument("--device", help="only this device")
+    parser.add_argument("--metric", help="only this metric")
+    parser.add_argument("--from", dest="start", help="start (epoch seconds or ISO 8601), default one year ago")
+    parser.add_argument("--to", dest="end", help="end (epoch seconds or ISO 8601), default now")
+    parser.add_argument("--step", type=int, help="bucket seconds (default: finest stored)")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the output name, else csv")
+    parser.add_argument("-o", "--output", help="output file (default stdout); a .gz name is gzip-compressed")
+    parser.add_argument("--db", help="history database (default $HISTORY_DB or rpi5/data/history.db)")
+    parser.add_argument("--url", help="export from a running web interface instead of the database")
+    parser.add_argument("--token", help="API token for --url (default $ARDUINO_WEB_TOKEN)")
+    args = parser.parse_args()
+
+    name = (args.output or "").removesuffix(".gz")
+    fmt = args.format or next((f for f, (_, ext) in FORMATS.items() if name.endswith(ext)), "csv")
+    compress = bool(args.output) and args.output.endswith(".gz")
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        if args.url:
+            error = _download(args, fmt, output, compress)
+        else:
+            error = _export_local(args, fmt, output, compress)
+    finally:
+        if args.output:
+            output.close()
+    if error:
+        if args.output:
+            os.remove(args.output)
+        raise SystemExit(error)
+
+
+def _export_local(args, fmt, output, compress):
+    from history import HistoryStore
+
+    try:
+        encode = encoder(fmt)
+        end = parse_time(args.end, time.time())
+        start = parse_time(args.start, end - DEFAULT_RANGE)
+    except ValueError as e:
+        return str(e)
+    store = HistoryStore(args.db, flush_interval=3600)
+    try:
+        series = select_series(store, args.device, args.metric)
+        if not series:
+            return "No recorded series matches"
+        chunks = encode(export_rows(store, series, start, end, args.step))
+        for chunk in gzip_chunks(chunks) if compress else chunks:
+            output.write(chunk)
+    finally:
+        store.close()
+
+
+def _download(args, fmt, output, compress):
+    from arduino_client import GatewayClient
+
+    params = {"device": args.device, "metric": args.metric, "from": args.start,
+              "to": args.end, "step": args.step, "format": fmt}
+    gateway = GatewayClient(args.url, token=args.token)
+    target = gzip.GzipFile(fileobj=output, mode="wb", compresslevel=GZIP_LEVEL) if compress else output
+    try:
+        _, error = gateway.export(target, **{key: value for key, value in params.items() if value is not None})
+    finally:
+        if compress:
+            target.close()
+        gateway.close()
+    return error
+
+
+if __name__ == "__main__":
+    main()
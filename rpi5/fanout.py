@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Concurrent fan-out helpers for the RPI5 Web Interface
+Runs several upstream calls in parallel and collects per-call results
+within a single timeout budget, so one slow board never blocks the rest.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class GrowingPool:
+    """Executor with a worker for every call in flight.
+
+    A fixed pool makes calls beyond its size queue behind slow ones and
+    time out unstarted; this one replaces its executor with a larger one
+    (threads start only as needed) whenever more calls are running than
+    it has workers, so any number of boards shares one timeout budget.
+    """
+
+    def __init__(self, min_workers, thread_name_prefix):
+        self._lock = threading.Lock()
+        self._prefix = thread_name_prefix
+        self._workers = min_workers
+        self._running = 0
+        self._executor = ThreadPoolExecutor(max_workers=min_workers, thread_name_prefix=thread_name_prefix)
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self._running += 1
+            if self._running > self._workers:
+                self._workers = max(self._running, self._workers * 2)
+                previous, self._executor = self._executor, ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix=self._prefix)
+                # Its calls still finish; its threads exit once they have
+                previous.shutdown(wait=False)
+            future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        with self._lock:
+            self._running -= 1
+
+    @property
+    def workers(self):
+        with self._lock:
+            return self._workers
+
+
+# Individual upstream HTTP calls
+call_pool = GrowingPool(16, "upstream")
+# Whole-device aggregations, which may themselves fan out on call_pool.
+# Keeping them on a separate pool means an aggregation never waits on
+# workers that are busy waiting on it.
+device_pool = GrowingPool(8, "device")
+
+
+def fan_out(calls, timeout, executor=None):
+    """Run {key: callable} concurrently and return {key: (result, error)}.
+
+    Calls still running when the timeout expires are reported as timed out;
+    they keep running in the background but the caller does not wait.
+    """
+    executor = executor or call_pool
+    futures = {key: executor.submit(fn) for key, fn in calls.items()}
+    done, _ = wait(futures.values(), timeout=timeout)
+    results = {}
+    for key, future in futures.items():
+        if future in done:
+            error = future.exception()
+            results[key] = (None, str(error)) if error else (future.result(), None)
+        else:
+            future.cancel()
+            results[key] = (None, f"Timed out after {timeout}s")
+    return results
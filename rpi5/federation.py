@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Multi-Site Federation for the RPI5 Web Interface
+A gateway can show the boards of other gateways (sites) listed under
+"sites" in devices.json. Each site is followed over one persistent
+connection to its /api/stream (a snapshot, then deltas as they happen);
+with "mode": "poll", or when a site has no stream, its /api/dashboard is
+polled with If-None-Match on a keep-alive session instead. Requests are
+answered from the local copy only, so a slow or unreachable site never
+delays /api/status: its boards are reported with their last known state
+and marked stale.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+log = logging.getLogger(__name__)
+
+# Seconds between /api/dashboard polls of a site in poll mode
+DEFAULT_POLL_INTERVAL = 5
+# A site that sent nothing (not even a keep-alive) for this long is
+# reported stale; streams send a keep-alive every 15 s
+DEFAULT_STALE_AFTER = 35
+CONNECT_TIMEOUT = 5
+# A stream silent for this long is reconnected
+STREAM_READ_TIMEOUT = 40
+# Reconnect delay after a failure, doubling up to RETRY_MAX
+RETRY_MIN = 1
+RETRY_MAX = 60
+
+
+class SiteError(ValueError):
+    """Raised for a site entry that cannot be used"""
+
+
+class Site:
+    def __init__(self, name, config, on_change):
+        """Build a site from its registry entry; on_change() is called after every update"""
+        self.name = name
+        self.config = config
+        self._on_change = on_change
+        self.url = str(config.get("url") or "").rstrip("/")
+        if not self.url.startswith(("http://", "https://")):
+            raise SiteError(f"Site '{name}' needs an http(s) url")
+        self.mode = config.get("mode", "stream")
+        if self.mode not in ("stream", "poll"):
+            raise SiteError(f"Site '{name}': mode must be stream or poll")
+        try:
+            self.interval = float(config.get("interval", DEFAULT_POLL_INTERVAL))
+            self.stale_after = float(config.get("stale_after", DEFAULT_STALE_AFTER))
+        except (TypeError, ValueError):
+            raise SiteError(f"Site '{name}' has a non-numeric interval or stale_after")
+
+        self.http = requests.Session()
+        # The API token comes from the environment (config.env), not devices.json
+        token = os.environ.get(config["token_env"]) if config.get("token_env") else None
+        if token:
+            self.http.headers["Authorization"] = f"Bearer {token}"
+
+        self._lock = threading.Lock()
+        self.devices = {}
+        self.connected = False
+        self.last_message = None
+        self.last_error = None
+        self._etag = None
+        self._response = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"site-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            # Unblocks a stream read waiting for the next event
+            response.close()
+        self.http.close()
+
+    def _run(self):
+        delay = RETRY_MIN
+        while not self._stop.is_set():
+            try:
+                if self.mode == "stream":
+                    self._follow_stream()
+                    delay = RETRY_MIN
+                else:
+                    self._poll()
+                    delay = RETRY_MIN
+                    self._stop.wait(self.interval)
+                    continue
+            except _NoStream:
+                log.info("site has no stream, polling site=%s", self.name)
+                self.mode = "poll"
+                continue
+            except (requests.RequestException, ValueError, SiteError) as e:
+                if self._stop.is_set():
+                    return
+                if self.connected:
+                    # It worked until now: reconnect promptly
+                    delay = RETRY_MIN
+                self._failed(e)
+            self._stop.wait(delay)
+            delay = min(RETRY_MAX, delay * 2)
+
+    def _get(self, path, **kwargs):
+        response = self.http.get(f"{self.url}{path}", allow_redirects=False, **kwargs)
+        if response.is_redirect or response.status_code == 401:
+            response.close()
+            raise SiteError("not authenticated (check the site's token_env)")
+        return response
+
+    def _follow_stream(self):
+        response = self._get("/api/stream", stream=True, timeout=(CONNECT_TIMEOUT, STREAM_READ_TIMEOUT))
+        if response.status_code == 404:
+            response.close()
+            raise _NoStream()
+        response.raise_for_status()
+        self._response = response
+        try:
+            event, data = None, []
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if line is None or self._stop.is_set():
+                    return
+                if line.startswith(":"):
+                    self._touch()
+                elif line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and event:
+                    self._apply(event, json.loads("\n".join(data)))
+                    event, data = None, []
+            raise SiteError("stream closed by the site")
+        finally:
+            self._response = None
+            response.close()
+
+    def _poll(self):
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        response = self._get("/api/dashboard", headers=headers, timeout=(CONNECT_TIMEOUT, self.interval + CONNECT_TIMEOUT))
+        if response.status_code == 304:
+            self._touch()
+            return
+        response.raise_for_status()
+        self._apply("snapshot", response.json())
+        self._etag = response.headers.get("ETag")
+
+    def _apply(self, event, data):
+        with self._lock:
+            if event == "snapshot":
+                self.devices = data
+            elif event == "delta":
+                state = self.devices.setdefault(data["device"], {"fields": {}})
+                state.setdefault("fields", {}).update(data["fields"])
+                state["error"] = data["error"]
+                state["last_update"] = data["last_update"]
+            else:
+                return
+            self._seen()
+        self._on_change()
+
+    def _touch(self):
+        with self._lock:
+            self._seen()
+        self._on_change()
+
+    def _seen(self):
+        if not self.connected:
+            log.info("site connected site=%s mode=%s", self.name, self.mode)
+        self.connected = True
+        self.last_message = time.time()
+        self.last_error = None
+
+    def _failed(self, error):
+        with self._lock:
+            if self.connected or self.last_error is None:
+                log.warning("site unreachable site=%s error=%s", self.name, error)
+            self.connected = False
+            self.last_error = str(error)
+        self._on_change()
+
+    def export(self):
+        """State shared with the followers and used for /api/status and /api/sites"""
+        with self._lock:
+            return {
+                "url": self.url,
+                "mode": self.mode,
+                "connected": self.connected,
+                "last_message": self.last_message,
+                "last_error": self.last_error,
+                "stale_after": self.stale_after,
+                "devices": json.loads(json.dumps(self.devices)),
+            }
+
+
+class _NoStream(Exception):
+    """The site answered 404 for /api/stream"""
+
+
+class Federation:
+    def __init__(self):
+        """Initialize without sites"""
+        self._lock = threading.Lock()
+        self._sites = {}
+        # Bumped on every update from a site, so the state can be republished
+        self.version = 0
+
+    def _changed(self):
+        self.version += 1
+
+    def load(self, config):
+        """Follow the sites in config; a site whose entry did not change keeps its connection"""
+        sites = {}
+        for name, entry in (config or {}).items():
+            if not isinstance(entry, dict) or not entry.get("enabled", True):
+                continue
+            previous = self._sites.get(name)
+            if previous is not None and previous.config == entry:
+                sites[name] = previous
+                continue
+            try:
+                sites[name] = Site(name, entry, self._changed).start()
+            except SiteError as e:
+                log.warning("site ignored error=%s", e)
+        with self._lock:
+            removed = [site for name, site in self._sites.items() if sites.get(name) is not site]
+            self._sites = sites
+        for site in removed:
+            site.stop()
+        self._changed()
+
+    def stop(self):
+        with self._lock:
+            sites, self._sites = list(self._sites.values()), {}
+        for site in sites:
+            site.stop()
+
+    def export(self):
+        """{site: state} of every followed site"""
+        with self._lock:
+            sites = dict(self._sites)
+        return {name: site.export() for name, site in sites.items()}
+
+
+def site_status(state, now=None):
+    """A site's exported state with its age and staleness at this moment (without its boards)"""
+    now = time.time() if now is None else now
+    age = None if state["last_message"] is None else round(now - state["last_message"], 1)
+    status = {key: value for key, value in state.items() if key != "devices"}
+    status.update(age=age, stale=age is None or age > state["stale_after"])
+    return status
+
+
+def site_devices(name, state, now=None):
+    """{"site/device": status} of one site's boards, shaped like local /api/status entries"""
+    stale = site_status(state, now)["stale"]
+    statuses = {}
+    for device_id, device_state in state["devices"].items():
+        fields = dict(device_state.get("fields") or {})
+        if stale or device_state.get("error"):
+            status = {"error": f"Site '{name}' unreachable" if stale else device_state["error"]}
+            if fields:
+                status["last_known"] = dict(fields, last_update=device_state.get("last_update"))
+        else:
+            status = dict(fields, last_update=device_state.get("last_update"))
+        status.update(site=name, stale=stale)
+        statuses[f"{name}/{device_id}"] = status
+    return statuses
@@ -0,0 +1,31 @@
+"""
+Gunicorn Settings for the RPI5 Web Interface
+Usage (from the rpi5 directory): gunicorn -c gunicorn.conf.py wsgi:app
+Workers, threads and the bind address can be set through the environment
+(WEB_WORKERS, WEB_THREADS, WEB_BIND), e.g. in the systemd unit.
+"""
+
+import os
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:5000")
+
+# Threaded workers: every open /api/stream (SSE) connection holds a thread,
+# so workers x threads bounds the number of browsers connected at once,
+# and slow clients on the tunnel do not block each other
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_WORKERS", 2))
+threads = int(os.environ.get("WEB_THREADS", 16))
+
+# Each worker imports the app itself so its background thread lives in the
+# worker, not in the master; the leader lock picks the one that polls
+preload_app = False
+
+timeout = 30
+graceful_timeout = 10
+keepalive = 5
+
+# ngrok connects from localhost; trust its X-Forwarded-* headers only there
+forwarded_allow_ips = os.environ.get("WEB_FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+accesslog = os.environ.get("WEB_ACCESS_LOG") or None
+errorlog = "-"
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Device Health for the RPI5 Web Interface
+Tracks every board's health from the upstream requests themselves:
+smoothed latency, error rate and a circuit breaker. After
+FAILURE_THRESHOLD unreachable requests in a row the breaker opens and
+requests to the board fail at once instead of waiting out the timeout;
+the leader's scheduled polls keep probing it, and after the open period
+one request is let through as a trial (half-open). A success closes the
+breaker, a failure opens it again for twice as long.
+"""
+
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Unreachable requests in a row that open the breaker
+FAILURE_THRESHOLD = 3
+# First open period; doubles while trials fail, up to MAX_OPEN_SECONDS
+OPEN_SECONDS = 5
+MAX_OPEN_SECONDS = 60
+# A trial not reported back within this many seconds is given up
+TRIAL_TIMEOUT = 15
+# Weight of the newest request in the smoothed latency and error rate
+SMOOTHING = 0.2
+# Above these a reachable board is reported as degraded
+DEGRADED_LATENCY = 1.0
+DEGRADED_ERROR_RATE = 0.2
+
+
+class DeviceHealth:
+    def __init__(self, device_id):
+        """Initialize a board as healthy with a closed breaker"""
+        self.device_id = device_id
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.open_seconds = OPEN_SECONDS
+        self.retry_at = 0
+        # Start of the trial request running while half-open, or None
+        self.trial_started = None
+        self.latency = None
+        self.error_rate = 0.0
+        self.last_success = None
+        self.last_failure = None
+        self.last_error = None
+        self.rejected = 0
+
+    def allow(self, probe=False, now=None):
+        """True if a request may go to the board now.
+
+        While open only probes (the leader's scheduled polls) get through,
+        and once the open period is over a single trial request.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.trial_started is not None and now - self.trial_started > TRIAL_TIMEOUT:
+                self.trial_started = None
+            if probe or (now >= self.retry_at and self.trial_started is None):
+                self.state = HALF_OPEN
+                self.trial_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency, error=None, now=None):
+        """The board answered; error is set for an HTTP error reply"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.latency = latency if self.latency is None else self.latency + SMOOTHING * (latency - self.latency)
+            self.error_rate += SMOOTHING * ((1 if error else 0) - self.error_rate)
+            self.last_success = now
+            if error:
+                self.last_error = error
+            self.failures = 0
+            if self.state != CLOSED:
+                log.info("circuit closed device=%s", self.device_id)
+            self.state = CLOSED
+            self.open_seconds = OPEN_SECONDS
+            self.trial_started = None
+
+    def record_failure(self, error, now=None):
+        """The board could not be reached (connect error, timeout)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.error_rate += SMOOTHING * (1 - self.error_rate)
+            self.last_failure = now
+            self.last_error = str(error)
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.open_seconds = min(MAX_OPEN_SECONDS, self.open_seconds * 2)
+                self._open(now)
+            elif self.state == CLOSED and self.failures >= FAILURE_THRESHOLD:
+                self._open(now)
+
+    def _open(self, now):
+        if self.state != OPEN:
+            log.warning("circuit open device=%s failures=%d retry_in=%.0fs error=%s",
+                        self.device_id, self.failures, self.open_seconds, self.last_error)
+        self.state = OPEN
+        self.retry_at = now + self.open_seconds
+        self.trial_started = None
+
+    def status(self):
+        """healthy, degraded (slow or erroring) or down (breaker not closed)"""
+        if self.state != CLOSED:
+            return "down"
+        if (self.latency or 0) > DEGRADED_LATENCY or self.error_rate > DEGRADED_ERROR_RATE:
+            return "degraded"
+        return "healthy"
+
+    def retry_in(self, now=None):
+        """Seconds until the breaker lets a trial through (0 when closed)"""
+        now = time.time() if now is None else now
+        return max(0.0, self.retry_at - now) if self.state != CLOSED else 0.0
+
+    def describe(self, now=None):
+        """Public description used by /api/health"""
+        with self._lock:
+            return {
+                "status": self.status(),
+                "breaker": self.state,
+                "failures": self.failures,
+                "retry_in": round(self.retry_in(now), 1),
+                "retry_at": self.retry_at if self.state != CLOSED else None,
+                "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+                "error_rate": round(self.error_rate, 3),
+                "last_success": self.last_success,
+                "last_failure": self.last_failure,
+                "last_error": self.last_error,
+                "rejected": self.rejected,
+            }
+
+    def follow(self, leader_state, now=None):
+        """Adopt the leader's breaker (followers do not poll, so they cannot probe)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if leader_state["breaker"] == CLOSED:
+                if self.state == OPEN:
+                    self.state = CLOSED
+                    self.failures = 0
+                    self.open_seconds = OPEN_SECONDS
+            elif self.state == CLOSED:
+                self.state = OPEN
+                self.retry_at = max(now, leader_state["retry_at"] or now)
+                self.last_error = leader_state["last_error"]
+
+
+class HealthRegistry:
+    def __init__(self):
+        """Initialize an empty table of per-board health"""
+        self._lock = threading.Lock()
+        self._devices = {}
+
+    def get(self, device_id):
+        """Health of one board, created on first use"""
+        with self._lock:
+            health = self._devices.get(device_id)
+            if health is None:
+                health = self._devices[device_id] = DeviceHealth(device_id)
+            return health
+
+    def export(self):
+        """{device id: description} of every board seen so far"""
+        with self._lock:
+            devices = dict(self._devices)
+        now = time.time()
+        return {device_id: health.describe(now) for device_id, health in devices.items()}
+
+    def follow(self, exported):
+        """Apply the leader's exported breakers"""
+        for device_id, state in exported.items():
+            self.get(device_id).follow(state)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Sensor History Store for the RPI5 Web Interface
+Keeps DHT and MH sensor readings in SQLite (WAL mode) on the Pi.
+Samples are buffered in memory and written in batches, rolled up into
+1-minute and 1-hour min/max/avg tiers, and pruned per tier, so range
+queries over weeks of data stay cheap on an SD card.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "history.db")
+
+# Seconds between batched writes
+FLUSH_INTERVAL = 10
+# Seconds between retention sweeps
+PRUNE_INTERVAL = 3600
+
+# Storage tiers: (table, bucket seconds, retention seconds)
+# Raw samples keep full resolution for two days; rollups cover longer ranges.
+RAW_RETENTION = 2 * 24 * 3600
+ROLLUP_TIERS = [
+    ("rollup_1m", 60, 30 * 24 * 3600),
+    ("rollup_1h", 3600, 365 * 24 * 3600),
+]
+
+# Most buckets returned by one query when no step is given
+MAX_POINTS = 500
+# Buckets read per query while iterating a range (see iter_buckets)
+PAGE_ROWS = 5000
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS series (
+        id INTEGER PRIMARY KEY,
+        device TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        UNIQUE (device, metric)
+    )""",
+    # WITHOUT ROWID: the (series, ts) primary key is the table's own B-tree,
+    # so a range scan walks one index in order
+    """CREATE TABLE IF NOT EXISTS samples (
+        series INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (series, ts)
+    ) WITHOUT ROWID""",
+] + [
+    f"""CREATE TABLE IF NOT EXISTS {table} (
+        series INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        min REAL NOT NULL,
+        max REAL NOT NULL,
+        sum REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (series, bucket)
+    ) WITHOUT ROWID"""
+    for table, _, _ in ROLLUP_TIERS
+]
+
+
+def to_number(value):
+    """Convert a board reading to a float, or None if it is not numeric"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip().upper()
+        if text in ("ON", "HIGH", "PRESSED"):
+            return 1.0
+        if text in ("OFF", "LOW", "RELEASED"):
+            return 0.0
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    return None
+
+
+def parse_time(value, default):
+    """Parse an epoch-seconds or ISO 8601 time (default when empty)"""
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+class HistoryStore:
+    def __init__(self, path=None, flush_interval=FLUSH_INTERVAL):
+        """Open (or create) the database and start the background writer"""
+        self.path = path or os.environ.get("HISTORY_DB", DEFAULT_DB_PATH)
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._series_ids = {}
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._run_writer, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        """Per-thread connection (sqlite3 connections are not shared between threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            # WAL + NORMAL only syncs at checkpoints: far fewer SD card writes
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+        return conn
+
+    def record(self, device, readings, ts=None):
+        """Buffer numeric readings {metric: value} for one device"""
+        ts = int(time.time() if ts is None else ts)
+        samples = []
+        for metric, value in readings.items():
+            number = to_number(value)
+            if number is not None:
+                samples.append((device, metric, ts, number))
+        if samples:
+            with self._buffer_lock:
+                self._buffer.extend(samples)
+
+    def _series_id(self, conn, device, metric, create=True, pending=None):
+        """Id of a series; ids found inside a transaction go to pending (cached once it commits)"""
+        key = (device, metric)
+        series_id = self._series_ids.get(key)
+        if series_id is None and pending is not None:
+            series_id = pending.get(key)
+        if series_id is None:
+            row = conn.execute(
+                "SELECT id FROM series WHERE device = ? AND metric = ?", key
+            ).fetchone()
+            if row is None:
+                if not create:
+                    return None
+                series_id = conn.execute(
+                    "INSERT INTO series (device, metric) VALUES (?, ?)", key
+                ).lastrowid
+            else:
+                series_id = row[0]
+            (self._series_ids if pending is None else pending)[key] = series_id
+        return series_id
+
+    def flush(self):
+        """Write buffered samples and their rollups in one transaction.
+
+        Raw samples are kept at one per series and second (the first one
+        recorded), and only those are rolled up, so every tier counts and
+        averages the same data however fast a board is polled or pushes.
+        If the transaction fails, the batch goes back in front of the buffer
+        for the next flush.
+        """
+        with self._buffer_lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+        new_ids = {}
+        try:
+            rows = self._write(batch, new_ids)
+        except sqlite3.Error:
+            with self._buffer_lock:
+                self._buffer[:0] = batch
+            raise
+        self._series_ids.update(new_ids)
+        return rows
+
+    def _write(self, batch, new_ids):
+        conn = self._connect()
+        with conn:
+            samples = {}
+            for device, metric, ts, value in batch:
+                samples.setdefault((self._series_id(conn, device, metric, pending=new_ids), ts), value)
+            self._drop_stored(conn, samples)
+            rows = [(series, ts, value) for (series, ts), value in samples.items()]
+            conn.executemany("INSERT INTO samples (series, ts, value) VALUES (?, ?, ?)", rows)
+            for table, width, _ in ROLLUP_TIERS:
+                conn.executemany(
+                    f"""INSERT INTO {table} (series, bucket, min, max, sum, count)
+                        VALUES (?, ?, ?, ?, ?, 1)
+                        ON CONFLICT (series, bucket) DO UPDATE SET
+                            min = MIN(min, excluded.min),
+                            max = MAX(max, excluded.max),
+                            sum = sum + excluded.sum,
+                            count = count + 1""",
+                    [(series, ts - ts % width, value, value, value) for series, ts, value in rows]
+                )
+        return len(rows)
+
+    @staticmethod
+    def _drop_stored(conn, samples):
+        """Remove {(series, ts): value} entries whose second an earlier flush already wrote"""
+        spans = {}
+        for series, ts in samples:
+            low, high = spans.get(series, (ts, ts))
+            spans[series] = (min(low, ts), max(high, ts))
+        for series, (low, high) in spans.items():
+            for (ts,) in conn.execute(
+                    "SELECT ts FROM samples WHERE series = ? AND ts BETWEEN ? AND ?", (series, low, high)):
+                samples.pop((series, ts), None)
+
+    def prune(self, now=None):
+        """Drop data older than each tier's retention"""
+        now = int(time.time() if now is None else now)
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM samples WHERE ts < ?", (now - RAW_RETENTION,))
+            for table, _, retention in ROLLUP_TIERS:
+                conn.execute(f"DELETE FROM {table} WHERE bucket < ?", (now - retention,))
+
+    def _run_writer(self):
+        last_prune = 0
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.time() - last_prune >= PRUNE_INTERVAL:
+                    self.prune()
+                    last_prune = time.time()
+            except sqlite3.Error as e:
+                log.warning("history write failed error=%s", e)
+
+    def close(self):
+        """Stop the writer and flush what is left"""
+        self._stop.set()
+        self._writer.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    @staticmethod
+    def plan(start, end, step, now=None):
+        """(table, step) used to read a range in buckets of about step seconds.
+
+        Only tiers whose retention still covers the start of the range are
+        used; of those, the coarsest one whose buckets fit the step.
+        """
+        now = time.time() if now is None else now
+        step = max(1, int(step))
+        tiers = [("samples", 1, RAW_RETENTION)] + ROLLUP_TIERS
+        covering = [tier for tier in tiers if start >= now - tier[2]] or tiers[-1:]
+        table, width, _ = ([tier for tier in covering if tier[1] <= step] or covering[:1])[-1]
+        # Buckets cannot be finer than the tier they come from
+        return table, -(-step // width) * width
+
+    @staticmethod
+    def finest(start, end, now=None):
+        """[(table, width, start, end)] covering a range with the finest data kept for each part.
+
+        Raw samples for the last two days, 1-minute rollups before that,
+        then hourly ones; parts meet on the coarser tier's bucket edge so
+        no sample is counted twice.
+        """
+        now = time.time() if now is None else now
+        tiers = [("samples", 1, RAW_RETENTION)] + ROLLUP_TIERS
+        parts = []
+        for (table, width, retention), coarser in zip(tiers, tiers[1:] + [None]):
+            if end <= start:
+                break
+            edge = start if coarser is None else max(start, -(-int(now - retention) // coarser[1]) * coarser[1])
+            if edge < end:
+                parts.append((table, width, edge, end))
+                end = edge
+        return parts[::-1]
+
+    def _bucket_sql(self, table, limit=""):
+        if table == "samples":
+            return f"""SELECT ts / :step * :step AS b, MIN(value), MAX(value), AVG(value), COUNT(*)
+                       FROM samples WHERE series = :series AND ts >= :start AND ts < :end
+                       GROUP BY b ORDER BY b {limit}"""
+        return f"""SELECT bucket / :step * :step AS b, MIN(min), MAX(max), SUM(sum) / SUM(count), SUM(count)
+                   FROM {table} WHERE series = :series AND bucket >= :start AND bucket < :end
+                   GROUP BY b ORDER BY b {limit}"""
+
+    def query(self, device, metric, start, end, step=None, now=None):
+        """Return min/max/avg buckets of one metric between start and end (see plan)"""
+        start, end = int(start), int(end)
+        if step is None:
+            step = max(1, -(-(end - start) // MAX_POINTS))
+        table, step = self.plan(start, end, step, now)
+
+        conn = self._connect()
+        series = self._series_id(conn, device, metric, create=False)
+        result = {"device": device, "metric": metric, "from": start, "to": end,
+                  "step": step, "tier": table, "t": [], "min": [], "max": [], "avg": [], "count": []}
+        if series is None:
+            return result
+
+        for bucket, low, high, mean, count in conn.execute(
+                self._bucket_sql(table), {"step": step, "series": series, "start": start, "end": end}):
+            result["t"].append(bucket)
+            result["min"].append(low)
+            result["max"].append(high)
+            result["avg"].append(round(mean, 3))
+            result["count"].append(count)
+        return result
+
+    def iter_buckets(self, device, metric, start, end, table, step, page_rows=PAGE_ROWS):
+        """Yield (bucket, min, max, avg, count) of one metric, page_rows buckets per query.
+
+        Each page is a separate short query continuing after the last
+        bucket, so a range of any length is read without holding a read
+        transaction (and the WAL checkpoint) open or keeping it in memory.
+        """
+        conn = self._connect()
+        series = self._series_id(conn, device, metric, create=False)
+        if series is None:
+            return
+        sql = self._bucket_sql(table, "LIMIT :limit")
+        start, end = int(start), int(end)
+        while start < end:
+            rows = conn.execute(sql, {"step": step, "series": series, "start": start,
+                                      "end": end, "limit": page_rows}).fetchall()
+            yield from rows
+            if len(rows) < page_rows:
+                return
+            start = rows[-1][0] + step
+
+    def series(self):
+        """Return every recorded (device, metric) pair"""
+        return self._connect().execute("SELECT device, metric FROM series ORDER BY device, metric").fetchall()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP Sessions for Arduino Devices
+One persistent keep-alive requests.Session per board, shared by the CLI
+client and the Flask server, with retry/backoff on connect failures and
+counters showing how often connections are reused.
+"""
+
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+# Separate connect/read timeouts: a dead board fails fast on connect,
+# a busy one still gets time to answer
+CONNECT_TIMEOUT = 2
+READ_TIMEOUT = 5
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# The ESP8266 lwIP stack only has a handful of sockets, keep pools small
+POOL_MAXSIZE = 2
+
+# Only connection failures are retried: the request never reached the
+# board, so retrying a toggle cannot apply it twice
+CONNECT_RETRIES = 1
+RETRY_BACKOFF = 0.1
+
+
+class _PoolStats:
+    def __init__(self):
+        """Initialize per-device connection counters"""
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _bump(self, key, name):
+        with self._lock:
+            counters = self._counters.setdefault(
+                key, {"requests": 0, "new_connections": 0, "reused_connections": 0}
+            )
+            counters[name] += 1
+
+    def checkout(self, key):
+        self._bump(key, "requests")
+
+    def new_connection(self, key):
+        self._bump(key, "new_connections")
+
+    def snapshot(self):
+        """Return the counters, deriving reuse from checkouts minus new connections"""
+        with self._lock:
+            result = {}
+            for key, counters in self._counters.items():
+                counters = dict(counters)
+                counters["reused_connections"] = max(0, counters["requests"] - counters["new_connections"])
+                result[key] = counters
+            return result
+
+
+def _counting_pool(base, stats):
+    """Build a urllib3 pool class that reports checkouts and new sockets"""
+    class CountingPool(base):
+        def _get_conn(self, timeout=None):
+            stats.checkout(f"{self.host}:{self.port}")
+            return super()._get_conn(timeout=timeout)
+
+        def _new_conn(self):
+            stats.new_connection(f"{self.host}:{self.port}")
+            return super()._new_conn()
+
+    # Keep urllib3's class name in error messages
+    CountingPool.__name__ = CountingPool.__qualname__ = base.__name__
+    return CountingPool
+
+
+class _DeviceAdapter(HTTPAdapter):
+    def __init__(self, stats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self._stats),
+            "https": _counting_pool(HTTPSConnectionPool, self._stats),
+        }
+
+
+class DeviceSessionPool:
+    def __init__(self, pool_maxsize=POOL_MAXSIZE, timeout=DEFAULT_TIMEOUT,
+                 connect_retries=CONNECT_RETRIES, backoff=RETRY_BACKOFF):
+        """Initialize an empty set of per-device sessions"""
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.retry = Retry(
+            total=connect_retries,
+            connect=connect_retries,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=backoff,
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        self._stats = _PoolStats()
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def session(self, url):
+        """Return the persistent session for the device serving this URL"""
+        key = urlsplit(url).netloc
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = requests.Session()
+                    adapter = _DeviceAdapter(
+                        self._stats,
+                        pool_connections=1,
+                        pool_maxsize=self.pool_maxsize,
+                        max_retries=self.retry,
+                        pool_block=True,
+                    )
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    session.headers["Connection"] = "keep-alive"
+                    self._sessions[key] = session
+        return session
+
+    def get(self, url, timeout=None, **kwargs):
+        """GET through the device's pooled session"""
+        return self.session(url).get(url, timeout=timeout or self.timeout, **kwargs)
+
+    def stats(self):
+        """Return connection reuse counters keyed by host:port"""
+        return self._stats.snapshot()
+
+    def close(self):
+        """Close every session and drop idle connections"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# Process-wide pool shared by ArduinoClient and web_server
+default_pool = DeviceSessionPool()
+
+
+def get(url, timeout=None, **kwargs):
+    """GET a device URL through the shared pool"""
+    return default_pool.get(url, timeout=timeout, **kwargs)
+
+
+def stats():
+    """Connection reuse counters of the shared pool"""
+    return default_pool.stats()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Logging Setup for the RPI5 Web Interface
+Leveled key=value log lines on stderr (journald adds the timestamps),
+with repeated messages rate-limited so a board that stays offline logs
+once a minute instead of once per poll.
+"""
+
+import logging
+import os
+import threading
+import time
+
+# Seconds during which repeats of the same message are suppressed
+RATE_LIMIT_INTERVAL = 60
+
+# Distinct messages remembered before expired ones are dropped
+MAX_TRACKED = 1000
+
+LOG_FORMAT = "%(levelname)s %(name)s: %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, interval=RATE_LIMIT_INTERVAL):
+        """Initialize the filter; repeats are identical messages from the same logger"""
+        super().__init__()
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    def filter(self, record):
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._seen.get(key, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._seen[key] = (last, suppressed + 1)
+                return False
+            self._seen[key] = (now, 0)
+            if len(self._seen) > MAX_TRACKED:
+                self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.interval}
+        if suppressed:
+            record.msg = f"{record.getMessage()} suppressed={suppressed}"
+            record.args = ()
+        return True
+
+
+def setup_logging():
+    """Configure the root logger once, level from LOG_LEVEL (default INFO)"""
+    root = logging.getLogger()
+    if any(isinstance(f, RateLimitFilter) for handler in root.handlers for f in handler.filters):
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(RateLimitFilter(int(os.environ.get("LOG_RATE_LIMIT", RATE_LIMIT_INTERVAL))))
+    root.addHandler(handler)
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    # Failed board calls are already reported once per poll by the server
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
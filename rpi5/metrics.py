@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Metrics for the RPI5 Web Interface
+Small in-process counters and latency histograms rendered in the
+Prometheus text format at /metrics. Recording is a dict update under a
+lock, cheap enough for every upstream call and every request.
+"""
+
+import bisect
+import threading
+import time
+
+import requests
+
+# Latency buckets in seconds: LAN round-trips to an ESP8266 are 5-100 ms,
+# timeouts end up in the top buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        """Initialize a counter with the given label names"""
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        """Add to the counter for these label values"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def combine(a, b):
+        return a + b
+
+    def lines(self, values):
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Initialize a histogram with fixed bucket bounds"""
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values = {}
+
+    def observe(self, value, *labels):
+        """Record one observation"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, *labels):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def values(self):
+        with self._lock:
+            return {labels: [list(entry[0]), entry[1], entry[2]] for labels, entry in self._values.items()}
+
+    @staticmethod
+    def combine(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def lines(self, values):
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}"
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Callback:
+    def __init__(self, name, help_text, labelnames, fn, kind="gauge", shared=False):
+        """Initialize a metric whose values are read from fn() at scrape time.
+
+        fn returns {label values tuple: value}. shared=True means every
+        process has its own part and the values are summed across workers.
+        """
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        self.shared = shared
+        self._fn = fn
+
+    def values(self):
+        return {tuple(labels): value for labels, value in self._fn().items()}
+
+    @staticmethod
+    def combine(a, b):
+        return a + b
+
+    lines = Counter.lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name, help_text, labelnames, fn, kind="gauge", shared=False):
+        return self._add(Callback(name, help_text, labelnames, fn, kind, shared))
+
+    def _shared(self, metric):
+        return not isinstance(metric, Callback) or metric.shared
+
+    def export(self):
+        """Values of every metric that is summed across processes (JSON-serializable)"""
+        return {
+            metric.name: [[list(labels), value] for labels, value in metric.values().items()]
+            for metric in self._metrics if self._shared(metric)
+        }
+
+    def render(self, exports=None):
+        """Prometheus text exposition.
+
+        exports are export() results of every worker (this one included);
+        their values are summed. Defaults to this process alone.
+        """
+        if exports is None:
+            exports = [self.export()]
+        output = []
+        for metric in self._metrics:
+            if self._shared(metric):
+                values = {}
+                for export in exports:
+                    for labels, value in export.get(metric.name, []):
+                        labels = tuple(labels)
+                        values[labels] = metric.combine(values[labels], value) if labels in values else value
+            else:
+                values = metric.values()
+            output.append(f"# HELP {metric.name} {metric.help}")
+            output.append(f"# TYPE {metric.name} {metric.kind}")
+            output.extend(metric.lines(values))
+        return "\n".join(output) + "\n"
+
+
+def error_reason(error):
+    """Short, bounded label for an upstream failure"""
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "connect"
+    if isinstance(error, ValueError):
+        return "invalid_response"
+    return "other"
+
+
+# Process-wide registry and the metrics recorded on the hot paths
+default_registry = MetricsRegistry()
+
+UPSTREAM_SECONDS = default_registry.histogram(
+    "arduino_upstream_request_seconds", "Latency of HTTP calls to the boards", ("device", "endpoint"))
+UPSTREAM_ERRORS = default_registry.counter(
+    "arduino_upstream_errors_total", "Failed HTTP calls to the boards", ("device", "endpoint", "reason"))
+POLL_SECONDS = default_registry.histogram(
+    "arduino_poll_duration_seconds", "Duration of a full status poll of one board", ("device",))
+HTTP_SECONDS = default_registry.histogram(
+    "arduino_http_request_seconds", "Latency of requests served by the web interface", ("route", "method", "status"))
+CACHE_READS = default_registry.counter(
+    "arduino_cache_reads_total", "Status reads answered from the state cache (hit) or not (miss)", ("result",))
+LOGIN_ATTEMPTS = default_registry.counter(
+    "arduino_login_attempts_total", "Login attempts by result (ok, invalid, limited)", ("result",))
+RULE_FIRINGS = default_registry.counter(
+    "arduino_rule_firings_total", "Automation rule firings by rule and result", ("rule", "result"))
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Poll Scheduler for the RPI5 Web Interface
+Polls every board at its own interval from a queue of due times served by
+a fixed number of worker threads (the global concurrency budget). A board
+that stops answering is retried with exponential backoff and jitter, and
+offline boards never get the last worker, so a dead board cannot delay
+polls of healthy ones. After a command or a state change a board is
+polled faster for a few seconds.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Polls running at the same time, all boards together
+MAX_CONCURRENT_POLLS = 4
+# Longest wait between polls of an offline board
+MAX_BACKOFF = 60
+# Poll interval while boosted, and how long a boost lasts
+BOOST_INTERVAL = 0.25
+BOOST_DURATION = 5
+
+
+class _Job:
+    def __init__(self, device):
+        self.device = device
+        self.failures = 0
+        self.boost_until = 0
+        self.due = 0
+        # Heap entry currently valid for this job; older entries are skipped
+        self.token = None
+        self.running = False
+        self.offline_slot = False
+        self.removed = False
+
+
+class PollScheduler:
+    def __init__(self, poll, max_concurrent=MAX_CONCURRENT_POLLS, max_backoff=MAX_BACKOFF):
+        """Initialize the scheduler; poll(device) returns True when the board answered"""
+        self._poll = poll
+        self.max_concurrent = max_concurrent
+        self.max_backoff = max_backoff
+        # Offline boards may use every worker but one
+        self.offline_slots = max(1, max_concurrent - 1)
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._healthy = []
+        self._offline = []
+        self._tokens = itertools.count()
+        self._offline_running = 0
+        self._threads = []
+
+    def start(self):
+        """Start the worker threads; safe to call more than once"""
+        with self._cond:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._work, name=f"poller-{i}", daemon=True)
+                for i in range(self.max_concurrent)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def set_devices(self, devices):
+        """Poll exactly these boards; new or changed ones are polled right away"""
+        wanted = {device.id: device for device in devices}
+        with self._cond:
+            for device_id, job in list(self._jobs.items()):
+                if device_id not in wanted or wanted[device_id].config != job.device.config:
+                    job.removed = True
+                    del self._jobs[device_id]
+            now = time.monotonic()
+            for device_id, device in wanted.items():
+                if device_id not in self._jobs:
+                    self._schedule(self._jobs.setdefault(device_id, _Job(device)), now)
+            self._cond.notify_all()
+
+    def boost(self, device_id, duration=BOOST_DURATION):
+        """Poll a board every BOOST_INTERVAL seconds for the next duration seconds"""
+        with self._cond:
+            job = self._jobs.get(device_id)
+            if job is None:
+                return
+            now = time.monotonic()
+            job.boost_until = max(job.boost_until, now + duration)
+            if not job.running and job.due > now + BOOST_INTERVAL:
+                self._schedule(job, now + BOOST_INTERVAL)
+                self._cond.notify()
+
+    def stats(self):
+        """Per-board failures in a row and seconds until the next poll"""
+        now = time.monotonic()
+        with self._cond:
+            return {
+                device_id: {"failures": job.failures, "next_poll": 0 if job.running else max(0.0, job.due - now)}
+                for device_id, job in self._jobs.items()
+            }
+
+    def _interval(self, job, now):
+        base = job.device.poll_interval
+        if now < job.boost_until:
+            return min(base, BOOST_INTERVAL)
+        if job.failures:
+            backoff = min(self.max_backoff, base * 2 ** job.failures)
+            # Jitter keeps boards that dropped off together from retrying in lockstep
+            return max(base, random.uniform(backoff / 2, backoff))
+        return base
+
+    def _schedule(self, job, due):
+        job.due = due
+        job.token = next(self._tokens)
+        heapq.heappush(self._offline if job.failures else self._healthy, (due, job.token, job))
+
+    def _top(self, heap):
+        while heap and (heap[0][2].token != heap[0][1] or heap[0][2].removed):
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _next_job(self):
+        """Wait until a job this worker may run is due (lock held)"""
+        while True:
+            heaps = [self._healthy]
+            if self._offline_running < self.offline_slots:
+                heaps.append(self._offline)
+            candidates = [(self._top(heap), heap) for heap in heaps]
+            candidates = [(entry, heap) for entry, heap in candidates if entry is not None]
+            timeout = None
+            if candidates:
+                (due, _, job), heap = min(candidates, key=lambda candidate: candidate[0][:2])
+                timeout = due - time.monotonic()
+                if timeout <= 0:
+                    heapq.heappop(heap)
+                    job.token = None
+                    job.running = True
+                    job.offline_slot = heap is self._offline
+                    if job.offline_slot:
+                        self._offline_running += 1
+                    return job
+            self._cond.wait(timeout)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+            try:
+                ok = bool(self._poll(job.device))
+            except Exception as e:
+                log.warning("poll crashed device=%s error=%s", job.device.id, e)
+                ok = False
+            with self._cond:
+                job.running = False
+                if job.offline_slot:
+                    self._offline_running -= 1
+                job.failures = 0 if ok else job.failures + 1
+                if not job.removed:
+                    now = time.monotonic()
+                    self._schedule(job, now + self._interval(job, now))
+                self._cond.notify_all()
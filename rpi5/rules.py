@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Automation Rules for the RPI5 Web Interface
+Rules from the "rules" section of devices.json run actions when a board
+reading crosses a limit, e.g. switch relay 1 on while the MH sensor reads
+above 700. They are indexed by (device, field) and evaluated from the
+state cache's change events, so an update only evaluates the rules that
+depend on a field that changed. Hysteresis keeps a rule from flapping
+around its limit and a cooldown limits how often it fires.
+"""
+
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Minimum seconds between two firings of a rule unless it sets "cooldown"
+DEFAULT_COOLDOWN = 10
+# Seconds the engine waits for a change event before checking cooled-down rules
+IDLE_CHECK = 1
+
+
+class RuleError(ValueError):
+    """Raised for a rule entry that cannot be used"""
+
+
+def _steps(name, steps):
+    if not isinstance(steps, list) or not all(
+            isinstance(step, dict) and step.get("device") and step.get("action") for step in steps):
+        raise RuleError(f"Rule '{name}': actions must be a list of {{\"device\", \"action\"}} steps")
+    return steps
+
+
+class Rule:
+    def __init__(self, name, config):
+        """Build a rule from its registry entry"""
+        self.name = name
+        self.config = config
+        try:
+            self.device = config["device"]
+            self.field = config["field"]
+        except KeyError as e:
+            raise RuleError(f"Rule '{name}' has no {e.args[0]}")
+        conditions = [key for key in ("above", "below", "equals") if key in config]
+        if len(conditions) != 1:
+            raise RuleError(f"Rule '{name}' needs exactly one of above, below or equals")
+        self.condition = conditions[0]
+        self.limit = config[self.condition]
+        try:
+            if self.condition != "equals":
+                self.limit = float(self.limit)
+            self.hysteresis = float(config.get("hysteresis", 0))
+            self.cooldown = float(config.get("cooldown", DEFAULT_COOLDOWN))
+        except (TypeError, ValueError):
+            raise RuleError(f"Rule '{name}' has a non-numeric limit, hysteresis or cooldown")
+        self.then = _steps(name, config.get("then", []))
+        self.otherwise = _steps(name, config.get("else", []))
+        if not self.then and not self.otherwise:
+            raise RuleError(f"Rule '{name}' has no actions")
+
+        # None until the first comparable reading
+        self.active = None
+        self.value = None
+        self.fired = 0
+        self.last_fired = None
+        self.last_error = None
+
+    def matches(self, value):
+        """Whether the condition holds for a reading; None if the reading cannot be compared.
+
+        An active rule only turns inactive once the reading is hysteresis
+        past the limit, e.g. above 700 with hysteresis 50 holds down to 650.
+        """
+        if self.condition == "equals":
+            return value == self.limit
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        margin = self.hysteresis if self.active else 0
+        if self.condition == "above":
+            return value > self.limit - margin
+        return value < self.limit + margin
+
+    def describe(self):
+        """Public description and state used by /api/rules"""
+        return {
+            "device": self.device,
+            "field": self.field,
+            "condition": {self.condition: self.limit, "hysteresis": self.hysteresis},
+            "cooldown": self.cooldown,
+            "active": self.active,
+            "value": self.value,
+            "fired": self.fired,
+            "last_fired": self.last_fired,
+            "last_error": self.last_error,
+        }
+
+
+class RuleEngine:
+    def __init__(self, cache, run_steps):
+        """Initialize an engine fed by a DeviceStateCache.
+
+        run_steps(rule, steps) sends a rule's actions and returns an error
+        message or None; it runs on the engine thread, one rule at a time.
+        """
+        self.cache = cache
+        self.run_steps = run_steps
+        self._lock = threading.Lock()
+        self._rules = {}
+        # (device, field) -> rules depending on it
+        self._index = {}
+        # Rules whose firing waits for their cooldown
+        self._pending = set()
+        self._resync = False
+        self._subscription = None
+        self._thread = None
+        self._stop = threading.Event()
+        # Bumped whenever a rule's state changes, so status can be republished
+        self.version = 0
+        self.evaluations = 0
+
+    def load(self, config):
+        """Replace the rules; a rule whose entry did not change keeps its state"""
+        rules = {}
+        for name, entry in (config or {}).items():
+            if not isinstance(entry, dict) or not entry.get("enabled", True):
+                continue
+            try:
+                rule = Rule(name, entry)
+            except RuleError as e:
+                log.warning("rule ignored error=%s", e)
+                continue
+            previous = self._rules.get(name)
+            rules[name] = previous if previous is not None and previous.config == rule.config else rule
+        index = {}
+        for rule in rules.values():
+            index.setdefault((rule.device, rule.field), []).append(rule)
+        with self._lock:
+            self._rules = rules
+            self._index = index
+            # New rules start from the current readings, on the engine thread
+            self._resync = True
+            self.version += 1
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._subscription = self.cache.subscribe()
+            self._thread = threading.Thread(target=self._run, name="rules", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+            self.cache.unsubscribe(self._subscription)
+
+    def _run(self):
+        while not self._stop.is_set():
+            event = self._subscription.get(timeout=IDLE_CHECK)
+            try:
+                if self._resync or self._subscription.lagged:
+                    # Events were dropped or the rules changed: start from the cache
+                    self._resync = False
+                    self._subscription.lagged = False
+                    self.evaluate_all()
+                elif event is not None and event["fields"]:
+                    self.evaluate(event["device"], event["fields"])
+                self._retry_pending()
+            except Exception as e:
+                log.warning("rule evaluation failed error=%s", e)
+
+    def evaluate(self, device_id, fields):
+        """Evaluate the rules that depend on fields which changed on one board"""
+        with self._lock:
+            index = self._index
+        for name, value in fields.items():
+            for rule in index.get((device_id, name), ()):
+                self._evaluate(rule, value)
+
+    def evaluate_all(self):
+        """Evaluate every rule against the cached readings"""
+        with self._lock:
+            rules = list(self._rules.values())
+        for rule in rules:
+            self._evaluate_cached(rule)
+
+    def _evaluate_cached(self, rule):
+        snapshot = self.cache.get(rule.device)
+        if snapshot is not None and snapshot["fresh"] and rule.field in snapshot["fields"]:
+            self._evaluate(rule, snapshot["fields"][rule.field])
+
+    def _retry_pending(self):
+        """Evaluate rules whose cooldown has run out since they were held back"""
+        now = time.time()
+        for rule in list(self._pending):
+            if now - rule.last_fired >= rule.cooldown:
+                self._pending.discard(rule)
+                self._evaluate_cached(rule)
+
+    def _evaluate(self, rule, value):
+        self.evaluations += 1
+        rule.value = value
+        active = rule.matches(value)
+        if active is None or active == rule.active:
+            self._pending.discard(rule)
+            return
+        self.version += 1
+        if rule.active is None and not active:
+            # First reading and the condition does not hold: nothing to undo
+            rule.active = False
+            return
+        steps = rule.then if active else rule.otherwise
+        now = time.time()
+        if steps and rule.last_fired is not None and now - rule.last_fired < rule.cooldown:
+            # Keep the old state; the rule fires when the cooldown is over if it still holds
+            self._pending.add(rule)
+            return
+        self._pending.discard(rule)
+        rule.active = active
+        if not steps:
+            return
+        rule.fired += 1
+        rule.last_fired = now
+        log.info("rule fired name=%s %s=%s actions=%s", rule.name, rule.field, value,
+                 ",".join(f"{step['device']}.{step['action']}" for step in steps))
+        rule.last_error = self.run_steps(rule, steps)
+        if rule.last_error:
+            log.warning("rule actions failed name=%s error=%s", rule.name, rule.last_error)
+
+    def status(self):
+        """State of every rule, by name"""
+        with self._lock:
+            rules = dict(self._rules)
+        return {name: rule.describe() for name, rule in rules.items()}
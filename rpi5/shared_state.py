@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Shared State Between Web Server Processes
+Under gunicorn several worker processes import the app. Only the worker
+holding the leader lock (an flock) polls the boards; it writes its state
+cache to a snapshot file in a RAM-backed runtime directory, and the other
+workers mirror that file into their own cache.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+
+
+def runtime_dir():
+    """Directory for the leader lock and state snapshot (created if needed)"""
+    path = os.environ.get("WEB_RUNTIME_DIR")
+    if not path:
+        # /dev/shm is RAM-backed: frequent snapshot writes never touch the SD card
+        base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        path = os.path.join(base, f"arduino-web-{os.getuid()}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class LeaderLock:
+    def __init__(self, path):
+        """Initialize a lock file; nothing is locked until try_acquire()"""
+        self.path = path
+        self._fd = None
+
+    @property
+    def is_leader(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        """Take the lock without blocking; returns True if this process holds it.
+
+        The kernel drops the lock when the holder exits, so a follower takes
+        over on its next attempt if the leader worker dies.
+        """
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        """Give up leadership"""
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class StateSnapshot:
+    def __init__(self, path):
+        """Initialize a snapshot file written by the leader and read by followers"""
+        self.path = path
+        self._mtime = None
+
+    def write(self, state):
+        """Replace the snapshot atomically so readers never see a partial file"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as snapshot_file:
+            json.dump(state, snapshot_file)
+        os.replace(tmp_path, self.path)
+
+    def read_if_changed(self):
+        """Return the snapshot if it changed since the last read, else None"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime == self._mtime:
+            return None
+        try:
+            with open(self.path) as snapshot_file:
+                state = json.load(snapshot_file)
+        except (OSError, ValueError):
+            return None
+        self._mtime = mtime
+        return state
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def worker_file(directory, prefix):
+    """Path of this process's per-worker file, e.g. metrics.<pid>.json"""
+    return os.path.join(directory, f"{prefix}.{os.getpid()}.json")
+
+
+def read_worker_files(directory, prefix):
+    """Load the per-worker files of every live process, removing stale ones"""
+    peers = []
+    for name in os.listdir(directory):
+        parts = name.split(".")
+        if len(parts) != 3 or parts[0] != prefix or parts[2] != "json" or not parts[1].isdigit():
+            continue
+        pid = int(parts[1])
+        path = os.path.join(directory, name)
+        if pid != os.getpid() and not _pid_alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as peer_file:
+                peers.append(json.load(peer_file))
+        except (OSError, ValueError):
+            continue
+    return peers
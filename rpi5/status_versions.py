@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Versioned Status Payloads for the RPI5 Web Interface
+A status payload's version is a hash of its content without the
+last_update timestamps, so the same board state has the same version in
+every worker and between polls that changed nothing. Clients revalidate
+with If-None-Match (304 when the version is unchanged) or ask for the
+fields that changed since a version they hold; recent payloads are kept
+per version to compute those deltas.
+"""
+
+import collections
+import hashlib
+import json
+import threading
+
+# Payloads kept for computing deltas
+MAX_VERSIONS = 256
+# Keys left out of the version: they change on every poll
+UNVERSIONED_KEYS = ("last_update",)
+
+
+def _without_timestamps(payload):
+    if not isinstance(payload, dict):
+        return payload
+    return {key: _without_timestamps(value) for key, value in payload.items() if key not in UNVERSIONED_KEYS}
+
+
+def state_version(payload):
+    """Version of a status payload (16 hex digits)"""
+    content = json.dumps(_without_timestamps(payload), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+def diff(old, new):
+    """(changed, removed) turning old into new.
+
+    Nested dicts are compared key by key: changed holds new or different
+    values, removed maps each dropped key to True (or, for a nested dict,
+    to the removals inside it).
+    """
+    changed = {}
+    removed = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            inner_changed, inner_removed = diff(previous, value)
+            if inner_changed:
+                changed[key] = inner_changed
+            if inner_removed:
+                removed[key] = inner_removed
+        elif key not in old or previous != value:
+            changed[key] = value
+    for key in old:
+        if key not in new:
+            removed[key] = True
+    return changed, removed
+
+
+class VersionHistory:
+    def __init__(self, max_versions=MAX_VERSIONS):
+        """Initialize an empty history of recently served payloads"""
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._payloads = collections.OrderedDict()
+
+    def remember(self, payload):
+        """Record a payload and return its version"""
+        version = state_version(payload)
+        with self._lock:
+            if version in self._payloads:
+                self._payloads.move_to_end(version)
+            else:
+                self._payloads[version] = payload
+                while len(self._payloads) > self.max_versions:
+                    self._payloads.popitem(last=False)
+        return version
+
+    def get(self, version):
+        """Payload recorded under a version, or None if it is unknown here"""
+        with self._lock:
+            return self._payloads.get(version)
+
+    def delta(self, since, payload, version):
+        """Delta document from version since to payload; the full payload if since is unknown"""
+        previous = self.get(since) if since else None
+        if previous is None:
+            return {"version": version, "full": True, "changed": payload, "removed": {}}
+        changed, removed = diff(previous, payload)
+        return {"version": version, "full": False, "changed": changed, "removed": removed}
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Push Telemetry Ingest for the RPI5 Web Interface
+Boards send their state as small UDP datagrams when something changes:
+the same JSON as GET /state plus the board id and a sequence number. The
+listener drains whatever has arrived, decodes it as one batch and hands
+the newest state of each board to a handler, which feeds the same state
+cache as the pollers.
+"""
+
+import json
+import logging
+import select
+import socket
+import threading
+import time
+
+from arduino_client import parse_state
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 5005
+# Largest datagram read; a board's state is ~150 bytes
+MAX_DATAGRAM = 2048
+# Datagrams decoded together before the handler is called
+MAX_BATCH = 256
+# Kernel receive buffer, so bursts are queued instead of dropped
+RECEIVE_BUFFER = 1024 * 1024
+# After this many seconds of silence a board's sequence numbers start over
+# (it probably rebooted)
+SEQUENCE_RESET_AFTER = 10
+
+
+def decode_datagram(data):
+    """(device id, sequence number or None, fields) of one telemetry datagram"""
+    message = json.loads(data)
+    if not isinstance(message, dict) or not isinstance(message.get("id"), str):
+        raise ValueError("Telemetry datagram without a board id")
+    device_id = message.pop("id")
+    seq = message.pop("seq", None)
+    return device_id, seq, parse_state(message)
+
+
+class TelemetryListener:
+    def __init__(self, handler, host="0.0.0.0", port=DEFAULT_PORT, max_batch=MAX_BATCH, source=None):
+        """Bind the UDP socket.
+
+        handler(batch) is called from the listener thread with a list of
+        (device_id, fields, received_at, address), one entry per board:
+        the fields of every datagram it sent in the batch, merged in order.
+        source(device_id) returns the host a board's datagrams must come
+        from (None for an unknown board); datagrams from anywhere else are
+        dropped before they count for ordering or merging.
+        """
+        self.handler = handler
+        self.source = source
+        self.max_batch = max_batch
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        # device id -> (last sequence number, time it arrived)
+        self._sequences = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.counts = {"decoded": 0, "invalid": 0, "rejected": 0, "stale": 0}
+        self.batches = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.sock.close()
+
+    def _receive_batch(self):
+        """Wait up to a second for datagrams, then take everything already queued"""
+        readable, _, _ = select.select([self.sock], [], [], 1)
+        batch = []
+        if not readable:
+            return batch
+        received = time.time()
+        while len(batch) < self.max_batch:
+            try:
+                data, address = self.sock.recvfrom(MAX_DATAGRAM)
+            except BlockingIOError:
+                break
+            batch.append((data, address))
+        return [(data, address, received) for data, address in batch]
+
+    def _in_order(self, device_id, seq, received):
+        """False for a datagram older than one already applied (UDP may reorder)"""
+        if seq is None:
+            return True
+        last = self._sequences.get(device_id)
+        if last is not None and seq <= last[0] and received - last[1] < SEQUENCE_RESET_AFTER:
+            return False
+        self._sequences[device_id] = (seq, received)
+        return True
+
+    def ingest(self, batch):
+        """Decode raw (data, address, received_at) datagrams and pass them to the handler"""
+        latest = {}
+        for data, address, received in batch:
+            try:
+                device_id, seq, fields = decode_datagram(data)
+            except ValueError as e:
+                self.counts["invalid"] += 1
+                log.warning("telemetry datagram rejected source=%s error=%s", address[0], e)
+                continue
+            if self.source is not None and address[0] != self.source(device_id):
+                # Only the board's own address may speak for it
+                self.counts["rejected"] += 1
+                log.warning("telemetry rejected device=%s source=%s", device_id, address[0])
+                continue
+            if not self._in_order(device_id, seq, received):
+                self.counts["stale"] += 1
+                continue
+            self.counts["decoded"] += 1
+            entry = latest.get(device_id)
+            if entry is None:
+                latest[device_id] = (device_id, fields, received, address)
+            else:
+                entry[1].update(fields)
+        self.batches += 1
+        if latest:
+            self.handler(list(latest.values()))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = self._receive_batch()
+                if batch:
+                    self.ingest(batch)
+            except OSError as e:
+                if self._stop.is_set():
+                    return
+                log.warning("telemetry receive failed error=%s", e)
+                time.sleep(1)
+            except Exception as e:
+                log.warning("telemetry handler failed error=%s", e)
@@ -0,0 +1,84 @@
+"""
+Tests for the asyncio client's connection pool
+
+    python3 -m pytest rpi5/tests
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+httpx = pytest.importorskip("httpx")
+
+from arduino_client import AsyncArduinoClient  # noqa: E402
+
+
+class SlowBoard(ThreadingHTTPServer):
+    """Loopback server that holds each request briefly and records peak concurrency"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SlowHandler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        time.sleep(0.1)
+        with server.lock:
+            server.active -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def board():
+    server = SlowBoard()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_pool_limits_follow_max_connections():
+    async def run():
+        async with AsyncArduinoClient(max_connections=3) as client:
+            return client.pool_limits
+
+    limits = asyncio.run(run())
+    assert limits.max_connections == 3
+    assert limits.max_keepalive_connections == 3
+
+
+def test_max_connections_caps_concurrent_requests(board):
+    url = f"http://127.0.0.1:{board.server_address[1]}/state"
+
+    async def run():
+        async with AsyncArduinoClient(max_connections=3) as client:
+            responses = await asyncio.gather(*(client.http.get(url) for _ in range(10)))
+        return [response.status_code for response in responses]
+
+    assert asyncio.run(run()) == [200] * 10
+    assert board.peak == 3
@@ -6,34 +6,154 @@ Run on RPI5: python3 rpi5/web_server.py
 Access from PC: http://<RPI5_IP>:5000
 """
 
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session
-import requests
+from flask import Flask, Response, g, render_template, jsonify, request, redirect, url_for, session
+import ipaddress
 import json
+import logging
 import threading
+import time
 from datetime import datetime
 import os
 
+from dotenv import load_dotenv
+
+import http_pool
+import metrics
+from assets import IMMUTABLE_MAX_AGE, AssetBundle
+from auth import (LOGIN_BURST, LOGIN_GLOBAL_BURST, LOGIN_GLOBAL_INTERVAL, LOGIN_INTERVAL,
+                  CachedSessionInterface, Credentials, RateLimiter, TokenStore, bearer_token, client_address)
+from arduino_client import parse_state
+from device_cache import DeviceStateCache, format_timestamp
+from device_registry import DeviceRegistry, RegistryError
+from fanout import fan_out, device_pool
+from federation import Federation, site_devices, site_status
+from health import CLOSED, HealthRegistry
+from camera_archive import CameraArchive, CameraRecorder, FLAG_MOTION
+from camera_proxy import BOUNDARY as CAMERA_BOUNDARY, CameraProxy, part_header
+from command_queue import CommandRouter, QueueFullError
+from export import DEFAULT_RANGE as EXPORT_DEFAULT_RANGE, FORMATS, ExportError, encoder, export_rows, filename, gzip_chunks, select_series
+from history import HistoryStore, parse_time
+from logutil import setup_logging
+from poll_scheduler import BOOST_DURATION, MAX_CONCURRENT_POLLS, PollScheduler
+from rules import RuleEngine
+from shared_state import LeaderLock, StateSnapshot, read_worker_files, runtime_dir, worker_file
+from status_versions import VersionHistory
+from telemetry import TelemetryListener
+
+# Optional overrides (DEVICES_FILE, DEVICE_<ID>_HOST, ...) from config.env
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config.env'))
+
+setup_logging()
+log = logging.getLogger("web_server")
+
 # Configure Flask to serve templates from parent directory
 app = Flask(__name__, template_folder='../templates', static_folder='../static')
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret-change-me")
+app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+# Verified session cookies are cached; require_login runs on every status poll
+app.session_interface = CachedSessionInterface()
+# Browsers and the ngrok edge may reuse static files for this many seconds;
+# after that they revalidate with If-None-Match / If-Modified-Since
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = int(os.environ.get("STATIC_MAX_AGE", 300))
+# Pages link the static files under fingerprinted names (/assets/script.<hash>.js,
+# see assets.py), precompressed at startup and cached by browsers for a year
+assets = AssetBundle(app.static_folder)
+
+# Single web user (hashed password from config.env) and API tokens for scripts
+credentials = Credentials.from_env()
+api_tokens = TokenStore.from_env()
+# Login attempts per client, and for all clients together so a flood over
+# the tunnel cannot keep the CPU busy hashing passwords
+login_limiter = RateLimiter(LOGIN_BURST, LOGIN_INTERVAL)
+login_global_limiter = RateLimiter(LOGIN_GLOBAL_BURST, LOGIN_GLOBAL_INTERVAL)
+# Reachable without logging in
+OPEN_ENDPOINTS = frozenset({'login', 'static', 'asset'})
 
-# Simple single-user auth
-VALID_USERNAME = "fcp"
-VALID_PASSWORD = "88888888"
+# Under gunicorn every worker process imports this module. Only the worker
+# holding the leader lock polls the boards; the others mirror the state
+# snapshot it writes (see shared_state.py).
+RUNTIME_DIR = runtime_dir()
+leader = LeaderLock(os.path.join(RUNTIME_DIR, "poller.lock"))
+state_snapshot = StateSnapshot(os.path.join(RUNTIME_DIR, "state.json"))
+SHARED_STATE_INTERVAL = 0.5
+# Seconds between writes of this worker's counters for /metrics aggregation
+METRICS_DUMP_INTERVAL = 5
 
-# Arduino configuration for renamed folders
-ARDUINO_1_IP = "192.168.0.37"  # Arduino 1 (D1 ESP8266)
-ARDUINO_3_IP = "192.168.0.161"  # Arduino 3 (NodeMCU ESP8266)
+# Boards are described in devices.json (see device_registry.py); the file
+# is re-read when it changes, so boards can be added without a restart.
+# Runtime overrides (/api/config) are shared by all workers.
+registry = DeviceRegistry(overrides_path=os.path.join(RUNTIME_DIR, "overrides.json"))
+REGISTRY_CHECK_INTERVAL = 2
 
-# Use distinct ports: Arduino 1 listens on 8080, Arduino 3 (NodeMCU) on the default HTTP port 80
-ARDUINO_1_PORT = 8080
-ARDUINO_3_PORT = 80
+# Device used by the legacy single-board endpoints (/api/led/*, /api/config)
+PRIMARY_DEVICE = "arduino1"
 
-ARDUINO_1_BASE_URL = f"http://{ARDUINO_1_IP}:{ARDUINO_1_PORT}"
-ARDUINO_3_BASE_URL = f"http://{ARDUINO_3_IP}:{ARDUINO_3_PORT}"
-# Legacy variable kept for the config endpoint (assumes Arduino 1)
-ARDUINO_PORT = ARDUINO_1_PORT
 REQUEST_TIMEOUT = 5
+# Boards are reached through pooled keep-alive sessions; connecting fails fast
+UPSTREAM_TIMEOUT = (http_pool.CONNECT_TIMEOUT, REQUEST_TIMEOUT)
+
+# Background polling feeds the state cache, and the read endpoints answer
+# from the cache. Data older than STATUS_TTL seconds is reported as an
+# error instead of being served.
+STATUS_TTL = 10
+# Polls running at once across all boards (see poll_scheduler.py)
+POLL_CONCURRENCY = int(os.environ.get("POLL_CONCURRENCY", MAX_CONCURRENT_POLLS))
+# Seconds between keep-alive comments on idle /api/stream connections
+STREAM_KEEPALIVE = 15
+
+# Status and sensor responses carry a weak ETag (see status_versions.py):
+# If-None-Match gets 304 while nothing changed, ?since=<version> returns
+# only the fields that changed since that version
+status_versions = VersionHistory()
+
+state_cache = DeviceStateCache(ttl=STATUS_TTL)
+
+# Latency, error rate and circuit breaker per board (see health.py): while
+# a board is unreachable its requests fail at once instead of waiting out
+# REQUEST_TIMEOUT. Followers adopt the leader's breakers from health.json.
+health = HealthRegistry()
+health_snapshot = StateSnapshot(os.path.join(RUNTIME_DIR, "health.json"))
+# Health last read from the leader's snapshot (followers)
+health_status = {}
+
+# Boards of other gateways listed under "sites" in devices.json (see
+# federation.py): the leader follows each site's /api/stream and followers
+# read sites.json. /api/dashboard and /api/stream stay local, which is what
+# the sites themselves serve, so gateways can follow each other.
+federation = Federation()
+sites_snapshot = StateSnapshot(os.path.join(RUNTIME_DIR, "sites.json"))
+# Sites last read from the leader's snapshot (followers)
+sites_state = {}
+
+# Concurrent polls of a board share one round of requests; commands to a
+# board are sent one at a time, and repeated on/off commands are collapsed
+commands = CommandRouter()
+
+# Numeric readings listed under "metrics" in devices.json are appended to
+# an on-disk history (HISTORY_DB, default rpi5/data/history.db)
+history = HistoryStore()
+# Range returned by /api/history when no ?from= is given
+HISTORY_DEFAULT_RANGE = 24 * 3600
+
+# One relay per camera board: a single upstream MJPEG connection shared by
+# every viewer of /api/camera/stream (see camera_proxy.py)
+camera_proxies = {}
+camera_lock = threading.Lock()
+# Cameras whose frames the leader records (CAMERA_RECORD=arduino2,...) into
+# rolling segment files under CAMERA_ARCHIVE_DIR (see camera_archive.py)
+CAMERA_RECORD = [name.strip() for name in os.environ.get("CAMERA_RECORD", "").split(",") if name.strip()]
+CAMERA_ARCHIVE_DIR = os.environ.get("CAMERA_ARCHIVE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "camera")
+CAMERA_ARCHIVE_MAX_BYTES = int(os.environ.get("CAMERA_ARCHIVE_MAX_MB", 4096)) * 1024 * 1024
+camera_recorders = {}
+# Longest pause (recorded seconds) between frames during playback
+PLAYBACK_MAX_GAP = 1
+
+# Boards may also push their state as UDP datagrams (see telemetry.py);
+# the leader listens on TELEMETRY_PORT when it is set
+TELEMETRY_PORT = int(os.environ.get("TELEMETRY_PORT") or 0)
+TELEMETRY_BIND = os.environ.get("TELEMETRY_BIND", "0.0.0.0")
+telemetry = None
 
 # Global status
 current_status = {
@@ -44,148 +164,663 @@ current_status = {
     "last_update": None
 }
 
-def get_arduino_status():
-    """Fetch status from Arduino"""
-    global current_status
+def device_get(device, path):
+    """GET a path on a board through the pool, recording latency, errors and health"""
+    endpoint = path.split("?", 1)[0]
+    start = time.perf_counter()
     try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/status",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            data = response.json()
-            current_status.update({
-                "led": data.get("led", "OFF"),
-                "builtin_led": data.get("builtin_led", "OFF"),
-                "ip": data.get("ip", "Unknown"),
-                "connected": data.get("builtin_led", "OFF") == "ON",  # Online if Built-in LED is ON
-                "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-            print("Successfully fetched status from Arduino 1:", current_status)
-            return True
-        else:
-            current_status["connected"] = False
-            print(f"Failed to fetch status from Arduino 1: HTTP {response.status_code}")
-            return False
+        response = http_pool.get(device.url(path), timeout=UPSTREAM_TIMEOUT)
     except Exception as e:
-        current_status["connected"] = False
-        print(f"Error fetching status from Arduino 1: {e}")
+        metrics.UPSTREAM_ERRORS.inc(device.id, endpoint, metrics.error_reason(e))
+        health.get(device.id).record_failure(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.UPSTREAM_SECONDS.observe(elapsed, device.id, endpoint)
+    if response.status_code != 200:
+        metrics.UPSTREAM_ERRORS.inc(device.id, endpoint, "http")
+    # Any reply means the board is reachable; 5xx still counts as an error
+    health.get(device.id).record_success(
+        elapsed, f"HTTP {response.status_code}" if response.status_code >= 500 else None)
+    return response
+
+def unreachable(device_id):
+    """Error message for a request refused because the board's breaker is open"""
+    device_health = health.get(device_id)
+    return (f"Device '{device_id}' is unreachable, retrying in {device_health.retry_in():.0f}s"
+            + (f" (last error: {device_health.last_error})" if device_health.last_error else ""))
+
+def fetch_json(device, path):
+    """GET a board endpoint and decode its JSON body, raising on HTTP errors"""
+    response = device_get(device, path)
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code} from {device.url(path)}")
+    try:
+        return response.json()
+    except ValueError:
+        metrics.UPSTREAM_ERRORS.inc(device.id, path.split("?", 1)[0], "invalid_response")
+        raise
+
+def poll_device(device, probe=False):
+    """Poll a board's status endpoints concurrently and refresh the state cache.
+
+    The first endpoint decides whether the board is reachable; the others
+    (e.g. MH sensor readings) are kept whenever they answer. Fallback
+    endpoints are only fetched for fields the regular ones did not return.
+    While the board's breaker is open only probes (scheduled polls) are sent.
+    """
+    if not device.poll:
         return False
+    if not health.get(device.id).allow(probe):
+        return False
+
+    def timed_poll():
+        with metrics.POLL_SECONDS.time(device.id):
+            return _poll_device(device)
+
+    # The poller, ?refresh=1 callers and /api/config may ask at the same time
+    return commands.read(device.id, device.base_url, timed_poll)
+
+def read_state(device):
+    """Read a board through its combined /state endpoint in one request.
+
+    Returns (fields, error), or None when the board's firmware has no such
+    endpoint; it is then polled through its legacy endpoints.
+    """
+    try:
+        response = device_get(device, device.state_path)
+    except Exception as e:
+        return {}, str(e)
+    if response.status_code == 404:
+        device.state_supported = False
+        log.info("no state endpoint device=%s path=%s, using poll endpoints", device.id, device.state_path)
+        return None
+    if response.status_code != 200:
+        return {}, f"HTTP {response.status_code} from {device.url(device.state_path)}"
+    try:
+        fields = parse_state(response.json())
+    except ValueError as e:
+        metrics.UPSTREAM_ERRORS.inc(device.id, device.state_path, "invalid_response")
+        return {}, str(e)
+    device.state_supported = True
+    fields.setdefault("ip", device.host)
+    for endpoint in device.poll:
+        for name, value in endpoint["defaults"].items():
+            fields.setdefault(name, value)
+    return fields, None
+
+def read_endpoints(device):
+    """Read a board through its "poll" endpoints; returns (fields, error of the first one)"""
+    regular = [endpoint for endpoint in device.poll if not endpoint["fallback"]]
+    results = fan_out(
+        {endpoint["path"]: (lambda path=endpoint["path"]: fetch_json(device, path)) for endpoint in regular},
+        timeout=REQUEST_TIMEOUT
+    )
+
+    fields = {}
+    for endpoint in regular:
+        data, error = results[endpoint["path"]]
+        if data is not None:
+            fields.update(device.normalize(endpoint, data))
+        elif endpoint is not regular[0]:
+            log.warning("read failed device=%s endpoint=%s error=%s", device.id, endpoint["path"], error)
+
+    primary_error = results[regular[0]["path"]][1]
+    if primary_error is None:
+        fields.setdefault("ip", device.host)
+        for endpoint in device.poll:
+            if endpoint["fallback"] and any(name not in fields for name in endpoint["fields"]):
+                try:
+                    fields.update(device.normalize(endpoint, fetch_json(device, endpoint["path"])))
+                except Exception as fallback_err:
+                    log.warning("read failed device=%s endpoint=%s error=%s", device.id, endpoint["path"], fallback_err)
+    return fields, primary_error
+
+def _poll_device(device):
+    started = time.time()
+    result = None
+    if device.state_path and device.state_supported is not False:
+        result = read_state(device)
+    fields, primary_error = result if result is not None else read_endpoints(device)
+
+    previous = state_cache.get(device.id)
+    # Keep whatever answered; per-field timestamps let readers tell the rest is stale
+    if fields:
+        # Stamped with the start time, so a command applied meanwhile wins
+        changed = state_cache.update(device.id, fields, now=started, success=primary_error is None)
+        # A switch or button changed on the board itself: look again soon
+        if previous and any(name not in device.metrics for name in changed):
+            poll_scheduler.boost(device.id)
+        if leader.is_leader:
+            history.record(device.id, {name: fields[name] for name in device.metrics if name in fields})
+    if primary_error:
+        state_cache.mark_error(device.id, primary_error)
+        log.warning("poll failed device=%s error=%s", device.id, primary_error)
+    elif previous and previous["error"]:
+        log.info("poll recovered device=%s", device.id)
+    if device.id == PRIMARY_DEVICE:
+        update_current_status(primary_error is None)
+    return primary_error is None
 
-def continuous_status_update():
-    """Background thread to continuously update status"""
+# Leader only: polls every board at its own poll_interval, backs off from
+# offline ones and polls faster for a few seconds after a command. Its polls
+# are also the probes that close an open breaker.
+poll_scheduler = PollScheduler(lambda device: poll_device(device, probe=True), max_concurrent=POLL_CONCURRENCY)
+
+def update_current_status(ok):
+    """Mirror the primary board into the legacy current_status dict"""
+    global current_status
+    if not ok:
+        current_status["connected"] = False
+        return
+    fields = state_cache.get(PRIMARY_DEVICE)["fields"]
+    current_status.update({
+        "led": fields.get("led", "OFF"),
+        "builtin_led": fields.get("builtin_led", "OFF"),
+        "ip": fields.get("ip", "Unknown"),
+        "connected": health.get(PRIMARY_DEVICE).state == CLOSED,
+        "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    })
+
+def get_arduino_status():
+    """Poll the primary board (Arduino 1) now"""
+    device = registry.get(PRIMARY_DEVICE)
+    return poll_device(device) if device else False
+
+def sync_pollers():
+    """Point the poll scheduler at the registry's polled boards (leader only)"""
+    if not leader.is_leader:
+        return
+    poll_scheduler.set_devices([device for device in registry.all() if device.poll])
+    poll_scheduler.start()
+    start_telemetry()
+    sync_recorders()
+    rules.load(registry.section("rules", {}))
+    rules.start()
+    federation.load(registry.section("sites", {}))
+
+def start_telemetry():
+    """Listen for pushed board states (leader only, once)"""
+    global telemetry
+    if telemetry is not None or not TELEMETRY_PORT:
+        return
+    try:
+        telemetry = TelemetryListener(
+            ingest_telemetry, TELEMETRY_BIND, TELEMETRY_PORT, source=telemetry_source).start()
+    except OSError as e:
+        log.warning("telemetry listener not started port=%d error=%s", TELEMETRY_PORT, e)
+        return
+    log.info("telemetry listening address=%s:%d", *telemetry.address)
+
+def telemetry_source(device_id):
+    """Address a board's telemetry must come from (None if the board is unknown)"""
+    device = registry.get(device_id)
+    return None if device is None else device.host
+
+def ingest_telemetry(batch):
+    """Apply a batch of pushed board states to the state cache, as a poll would"""
+    for device_id, fields, received, address in batch:
+        device = registry.get(device_id)
+        if device is None:
+            # Removed from the registry since the listener checked its source
+            continue
+        state_cache.update(device_id, fields, now=received)
+        history.record(device_id, {name: fields[name] for name in device.metrics if name in fields}, received)
+        if device_id == PRIMARY_DEVICE:
+            update_current_status(True)
+
+def sync_recorders():
+    """Start or stop camera recorders so they match CAMERA_RECORD and the registry (leader only)"""
+    with camera_lock:
+        recorders = dict(camera_recorders)
+    wanted = {}
+    for device_id in CAMERA_RECORD:
+        proxy = camera_proxy(camera_device(device_id))
+        if proxy is not None:
+            wanted[device_id] = proxy
+    for device_id, recorder in recorders.items():
+        if wanted.get(device_id) is not recorder.proxy:
+            recorder.stop()
+            del recorders[device_id]
+    for device_id, proxy in wanted.items():
+        if device_id not in recorders:
+            recorder = recorders[device_id] = CameraRecorder(proxy, camera_archive(device_id))
+            recorder.start()
+            log.info("recording camera=%s dir=%s", device_id, recorder.archive.directory)
+    with camera_lock:
+        camera_recorders.clear()
+        camera_recorders.update(recorders)
+
+def mirror_snapshot():
+    """Follower: copy the leader's latest state snapshot into the local cache"""
+    state = state_snapshot.read_if_changed()
+    if state is None:
+        return
+    for device_id, device_state in state.items():
+        state_cache.merge(device_id, device_state)
+    if PRIMARY_DEVICE in state:
+        update_current_status(state_cache.is_fresh(PRIMARY_DEVICE))
+
+def mirror_health():
+    """Follower: adopt the leader's breakers, which its polls keep probing"""
+    global health_status
+    state = health_snapshot.read_if_changed()
+    if state is not None:
+        health_status = state
+        health.follow(state)
+
+def mirror_sites():
+    """Follower: read the leader's copy of the other sites"""
+    global sites_state
+    state = sites_snapshot.read_if_changed()
+    if state is not None:
+        sites_state = state
+
+def federated_sites():
+    """{site: exported state} of the sites followed by the leader"""
+    return federation.export() if leader.is_leader else sites_state
+
+def background_loop():
+    """Background thread: leader takeover, devices.json hot-reload and state sharing"""
+    last_registry_check = time.time()
+    last_metrics_dump = 0
+    published_version = None
+    published_rules = None
+    published_sites = None
     while True:
-        get_arduino_status()
-        import time
-        time.sleep(1)  # Update every 1 second
+        time.sleep(SHARED_STATE_INTERVAL)
+        if not leader.is_leader and leader.try_acquire():
+            log.info("leader takeover pid=%d", os.getpid())
+            sync_pollers()
 
-# Start background thread
-status_thread = threading.Thread(target=continuous_status_update, daemon=True)
-status_thread.start()
+        if time.time() - last_registry_check >= REGISTRY_CHECK_INTERVAL:
+            last_registry_check = time.time()
+            try:
+                if registry.reload_if_changed():
+                    log.info("registry reloaded devices=%s", ",".join(registry.ids()))
+                    sync_pollers()
+            except Exception as e:
+                # Keep the loop alive: leader takeover and state sharing depend on it
+                log.warning("registry reload failed error=%s", e)
 
+        try:
+            if leader.is_leader:
+                boost_after_follower_commands()
+                version = state_cache.version
+                if version != published_version:
+                    state_snapshot.write(state_cache.export())
+                    published_version = version
+                if rules.version != published_rules:
+                    published_rules = rules.version
+                    rules_snapshot.write(rules.status())
+                health_snapshot.write(health.export())
+                if federation.version != published_sites:
+                    published_sites = federation.version
+                    sites_snapshot.write(federation.export())
+            else:
+                mirror_snapshot()
+                mirror_health()
+                mirror_sites()
+            if time.time() - last_metrics_dump >= METRICS_DUMP_INTERVAL:
+                last_metrics_dump = time.time()
+                dump_metrics()
+        except OSError as e:
+            log.warning("shared state write failed error=%s", e)
+        except Exception as e:
+            log.warning("background loop step failed error=%s", e)
 
-@app.before_request
-def require_login():
-    """Redirect to login page if not authenticated."""
-    # Allow login page, static assets, and health checks before auth
-    open_endpoints = {
-        'login', 'static'
+background_thread = None
+background_lock = threading.Lock()
+
+def start_background():
+    """Start polling (leader) or mirroring (followers); safe to call more than once.
+
+    Called by __main__ and wsgi.py rather than at import, so importing the
+    module (e.g. from the gunicorn master) does not start any threads.
+    """
+    global background_thread
+    with background_lock:
+        if background_thread is None:
+            if leader.try_acquire():
+                sync_pollers()
+            background_thread = threading.Thread(target=background_loop, name="background", daemon=True)
+            background_thread.start()
+    return background_thread
+
+
+def refresh_devices(device_ids):
+    """Poll the given devices in parallel, bounded by one request timeout.
+
+    Returns {device: error or None}; each poller writes into the state cache
+    itself, so results from boards that answered are available even when
+    another board times out.
+    """
+    devices = [registry.get(device_id) for device_id in device_ids]
+    results = fan_out(
+        {device.id: (lambda device=device: poll_device(device)) for device in devices if device},
+        timeout=REQUEST_TIMEOUT,
+        executor=device_pool
+    )
+    return {device_id: error for device_id, (_, error) in results.items()}
+
+def refresh_requested():
+    """True when the client asked to bypass the cache with ?refresh=1"""
+    return request.args.get("refresh", "").lower() in ("1", "true", "yes")
+
+def cached_status(device, fields=None):
+    """Return (payload, error) for a device from the state cache.
+
+    Only fields refreshed within the TTL are returned; if any requested
+    field is missing or stale the call reports an error instead.
+    """
+    snapshot = state_cache.get(device)
+    if snapshot is None:
+        metrics.CACHE_READS.inc("miss")
+        return None, "No data received from device yet"
+    now = time.time()
+    names = fields if fields is not None else list(snapshot["fields"])
+    payload = {}
+    for name in names:
+        ts = snapshot["field_ts"].get(name)
+        if ts is None or now - ts > state_cache.ttl:
+            metrics.CACHE_READS.inc("miss")
+            return None, snapshot["error"] or f"No recent value for '{name}'"
+        payload[name] = snapshot["fields"][name]
+    if not snapshot["fresh"]:
+        metrics.CACHE_READS.inc("miss")
+        return None, snapshot["error"] or "Device data is stale"
+    metrics.CACHE_READS.inc("hit")
+    payload["last_update"] = format_timestamp(snapshot["last_success"])
+    return payload, None
+
+def versioned_json(payload):
+    """JSON response for a status payload with its version as a weak ETag.
+
+    304 when the client's If-None-Match holds the current version; with
+    ?since=<version> the body is a delta document instead of the payload.
+    """
+    version = status_versions.remember(payload)
+    if request.if_none_match.contains_weak(version):
+        response = Response(status=304)
+    else:
+        since = request.args.get('since')
+        response = jsonify(payload if since is None else status_versions.delta(since, payload, version))
+    response.set_etag(version, weak=True)
+    # Browsers and the ngrok edge may keep it but must revalidate each time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def device_status(device_id):
+    """Cached status of a board: every field refreshed within the TTL"""
+    snapshot = state_cache.get(device_id)
+    if snapshot is None or not snapshot["fresh"]:
+        metrics.CACHE_READS.inc("miss")
+        if snapshot is None:
+            return {"error": "No data received from device yet"}
+        payload = {"error": snapshot["error"] or "Device data is stale"}
+        if snapshot["fields"]:
+            # Served at once with the error, e.g. while the breaker is open
+            payload["last_known"] = dict(snapshot["fields"], last_update=format_timestamp(snapshot["last_success"]))
+        return payload
+    metrics.CACHE_READS.inc("hit")
+    now = time.time()
+    payload = {
+        name: value for name, value in snapshot["fields"].items()
+        if now - snapshot["field_ts"][name] <= state_cache.ttl
     }
-    if request.endpoint in open_endpoints or request.path.startswith('/static/'):
-        return None
-    if not session.get('logged_in'):
-        return redirect(url_for('login', next=request.path))
-    return None
+    payload["last_update"] = format_timestamp(snapshot["last_success"])
+    return payload
 
-def get_arduino1_status():
-    """Fetch status from Arduino 1 (D1)"""
+def run_action(device, action):
+    """Send a named action to a board through its command queue.
+
+    Returns (payload, error); payload is the board's JSON reply, or its
+    text for boards that answer in plain text. Callers sending the same
+    idempotent action while it is queued or in flight share one request.
+    """
+    spec = device.actions.get(action)
+    if spec is None:
+        return None, f"Device '{device.id}' has no action '{action}'"
+    if not health.get(device.id).allow():
+        return None, unreachable(device.id)
     try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/status",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                "led": data.get("led", "OFF"),
-                "builtin_led": data.get("builtin_led", "OFF"),
-                "temperature": data.get("temperature", "N/A"),
-                "humidity": data.get("humidity", "N/A"),
-                "ip": ARDUINO_1_IP,
-                "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-        else:
-            return {
-                "error": f"Failed to fetch status: HTTP {response.status_code}"
-            }
-    except Exception as e:
-        return {
-            "error": str(e)
-        }
+        return commands.command(device.id, action, lambda: send_action(device, action), spec["idempotent"])
+    except QueueFullError as e:
+        return None, f"Device '{device.id}' is busy: {e}"
 
-def get_arduino3_status():
-    """Fetch status from Arduino 3 (NodeMCU)"""
+def send_action(device, action):
+    """Call the board and apply the action's effect to the cached state.
+
+    The new field values come from the action's registry spec and the
+    board's reply, so the UI updates without another status round trip.
+    """
     try:
-        response = requests.get(
-            f"{ARDUINO_3_BASE_URL}/status",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            data = response.json()
-            # Normalize keys coming from NodeMCU sketch
-            return {
-                "builtin_led": data.get("builtin_led", "OFF"),
-                "relay_channel_1": data.get("relay1", data.get("relay_channel_1", "OFF")),
-                "relay_channel_2": data.get("relay2", data.get("relay_channel_2", "OFF")),
-                "ip": ARDUINO_3_IP,
-                "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-        else:
-            return {
-                "error": f"Failed to fetch status: HTTP {response.status_code}"
-            }
+        response = device_get(device, device.actions[action]["path"])
     except Exception as e:
-        return {
-            "error": str(e)
-        }
+        return None, str(e)
+    if response.status_code != 200:
+        return None, f"HTTP {response.status_code}"
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = response.text
+    snapshot = state_cache.get(device.id)
+    fields = device.action_effect(action, payload, snapshot["fields"] if snapshot else {})
+    if fields:
+        state_cache.update(device.id, fields)
+        if device.id == PRIMARY_DEVICE:
+            update_current_status(True)
+    note_command(device.id)
+    return payload, None
+
+def run_batch(device, actions):
+    """Run several actions on one board, in order, as a single queued command.
 
-def get_nodemcu_status():
-    """Fetch the status of Arduino 3 (NodeMCU)."""
+    Returns (results, error) with one {"action", "result" or "error"} per
+    action. No other command to the board runs in between, and when the
+    actions can be combined (see Device.set_query) they take one request.
+    """
+    for action in actions:
+        if action not in device.actions:
+            return None, f"Device '{device.id}' has no action '{action}'"
+    if not health.get(device.id).allow():
+        return None, unreachable(device.id)
+    idempotent = all(device.actions[action]["idempotent"] for action in actions)
     try:
-        response = requests.get(f"{ARDUINO_3_BASE_URL}/status", timeout=5)
-        if response.status_code == 200:
-            return response.json()
+        results = commands.command(device.id, ("batch",) + tuple(actions),
+                                   lambda: send_batch(device, actions), idempotent)
+    except QueueFullError as e:
+        return None, f"Device '{device.id}' is busy: {e}"
+    return results, None
+
+def send_batch(device, actions):
+    """Send a board's batch through its set endpoint, or one action at a time.
+
+    Sequential actions stop at the first failure: the rest are reported as
+    not sent, so a scene never runs its later steps out of order.
+    """
+    path = device.set_query(actions)
+    if path is not None:
+        results = send_set(device, actions, path)
+        if results is not None:
+            return results
+    results = []
+    failed = None
+    for action in actions:
+        if failed:
+            results.append({"action": action, "error": f"Not sent: {failed} failed"})
+            continue
+        payload, error = send_action(device, action)
+        if error:
+            failed = action
+            results.append({"action": action, "error": error})
         else:
-            return {"error": "Failed to fetch NodeMCU status"}
-    except requests.exceptions.RequestException as e:
-        return {"error": str(e)}
+            results.append({"action": action, "result": payload})
+    return results
+
+def send_set(device, actions, path):
+    """Apply several actions with one request to the board's set endpoint.
+
+    The board answers with its new state, which replaces the cached fields.
+    Returns None when the firmware has no such endpoint.
+    """
+    def failed(error):
+        return [{"action": action, "error": error} for action in actions]
 
-@app.route('/api/arduino1/led/toggle', methods=['POST'])
-def toggle_arduino1_led():
-    """Toggle Arduino 1 built-in LED"""
     try:
-        print(f"[DEBUG] Attempting to toggle built-in LED on {ARDUINO_1_BASE_URL}/builtin/toggle")
-        response = requests.get(f"{ARDUINO_1_BASE_URL}/builtin/toggle", timeout=REQUEST_TIMEOUT)
-        print(f"[DEBUG] Arduino response status: {response.status_code}")
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            print(f"[ERROR] Arduino returned error: {response.status_code}")
-            return jsonify({"error": "Failed to toggle built-in LED"}), 500
+        response = device_get(device, path)
     except Exception as e:
-        print(f"[ERROR] Exception while toggling built-in LED: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        return failed(str(e))
+    if response.status_code == 404:
+        device.set_supported = False
+        log.info("no set endpoint device=%s path=%s, sending actions one by one", device.id, device.set_path)
+        return None
+    if response.status_code != 200:
+        return failed(f"HTTP {response.status_code}")
+    try:
+        fields = parse_state(response.json())
+    except ValueError as e:
+        metrics.UPSTREAM_ERRORS.inc(device.id, device.set_path, "invalid_response")
+        return failed(str(e))
+    device.set_supported = True
+    state_cache.update(device.id, fields)
+    if device.id == PRIMARY_DEVICE:
+        update_current_status(True)
+    note_command(device.id)
+    return [
+        {"action": action, "result": {name: fields.get(name) for name in device.actions[action]["sets"]}}
+        for action in actions
+    ]
+
+def run_groups(groups):
+    """Run {device id: [actions]} with the boards in parallel.
+
+    Returns (status, {device id: {"status", "actions", "error"}}), status
+    being "success", "partial" or "error".
+    """
+    results = fan_out(
+        {device_id: (lambda device_id=device_id, actions=actions: run_batch(registry.get(device_id), actions))
+         for device_id, actions in groups.items()},
+        # Boards without a set endpoint get one request per action
+        timeout=REQUEST_TIMEOUT * max(len(actions) for actions in groups.values()),
+        executor=device_pool
+    )
+    devices = {}
+    for device_id, (outcome, error) in results.items():
+        action_results, error = outcome if error is None else (None, error)
+        if error is None and any("error" in result for result in action_results):
+            error = next(result["error"] for result in action_results if "error" in result)
+        devices[device_id] = {"status": "error" if error else "success", "actions": action_results or []}
+        if error:
+            devices[device_id]["error"] = error
+    failed = sum(1 for device in devices.values() if device["status"] == "error")
+    return "success" if not failed else "error" if failed == len(devices) else "partial", devices
+
+def run_rule_steps(rule, steps):
+    """Send a rule's actions as one batch; returns an error message or None"""
+    groups, problem = parse_batch(steps)
+    if problem:
+        metrics.RULE_FIRINGS.inc(rule.name, "error")
+        return problem[0]
+    status, devices = run_groups(groups)
+    metrics.RULE_FIRINGS.inc(rule.name, "ok" if status == "success" else "error")
+    errors = [f"{device_id}: {result['error']}" for device_id, result in devices.items() if "error" in result]
+    return "; ".join(errors) or None
+
+# Automation rules from the "rules" section of devices.json (see rules.py).
+# The leader evaluates them on every state change; their actions run as
+# batches, whose replies update the cache without another poll.
+rules = RuleEngine(state_cache, run_rule_steps)
+rules_snapshot = StateSnapshot(os.path.join(RUNTIME_DIR, "rules.json"))
+# Rule states last read from the leader's snapshot (followers)
+rules_status = {}
+
+# Time of the last command this worker sent to each board
+command_times = {}
+
+def note_command(device_id):
+    """Have the leader's scheduler poll a board faster after a command"""
+    command_times[device_id] = time.time()
+    if leader.is_leader:
+        poll_scheduler.boost(device_id)
+    else:
+        StateSnapshot(worker_file(RUNTIME_DIR, "commands")).write(command_times)
+
+boosted_commands = {}
+
+def boost_after_follower_commands():
+    """Leader: boost boards that other workers sent commands to"""
+    for times in read_worker_files(RUNTIME_DIR, "commands"):
+        for device_id, ts in times.items():
+            if ts > boosted_commands.get(device_id, 0):
+                boosted_commands[device_id] = ts
+                if time.time() - ts < BOOST_DURATION:
+                    poll_scheduler.boost(device_id)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Observe the latency of every route (streamed bodies: time to first byte)"""
+    start = g.get("request_start")
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - start, route, request.method, response.status_code)
+    return response
+
+def is_local_request():
+    """True for requests made on the Pi itself, not relayed through ngrok"""
+    if request.headers.get('X-Forwarded-For'):
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+@app.before_request
+def require_login():
+    """Redirect to login page if not authenticated; API tokens are accepted instead of a session."""
+    if request.endpoint in OPEN_ENDPOINTS or session.get('logged_in'):
+        return None
+    # Scripts send "Authorization: Bearer <token>" instead of logging in
+    token = bearer_token(request.headers.get('Authorization'))
+    if token:
+        client = api_tokens.lookup(token)
+        if client is None:
+            return jsonify({"status": "error", "message": "Invalid API token"}), 401
+        g.api_client = client
+        return None
+    # A local Prometheus scraper does not log in
+    if request.endpoint == 'metrics_endpoint' and is_local_request():
+        return None
+    return redirect(url_for('login', next=request.path))
 
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """Simple login page for single user."""
     if request.method == 'POST':
+        allowed, retry_after = login_limiter.allow(client_address(request))
+        if allowed:
+            allowed, retry_after = login_global_limiter.allow(None)
+        if not allowed:
+            metrics.LOGIN_ATTEMPTS.inc("limited")
+            log.warning("login throttled client=%s", client_address(request))
+            response = app.make_response(
+                (render_template('login.html', error='Too many attempts, try again shortly'), 429))
+            response.headers['Retry-After'] = str(max(1, round(retry_after)))
+            return response
         username = request.form.get('username', '')
         password = request.form.get('password', '')
-        if username == VALID_USERNAME and password == VALID_PASSWORD:
+        if credentials.check(username, password):
+            metrics.LOGIN_ATTEMPTS.inc("ok")
             session['logged_in'] = True
             return redirect(request.args.get('next') or url_for('index'))
+        metrics.LOGIN_ATTEMPTS.inc("invalid")
+        log.info("login failed client=%s", client_address(request))
         return render_template('login.html', error='Invalid credentials')
     return render_template('login.html', error=None)
 
@@ -195,363 +830,320 @@ def logout():
     session.pop('logged_in', None)
     return redirect(url_for('login'))
 
-@app.route('/api/arduino3/led/toggle', methods=['POST'])
-def toggle_arduino3_led():
-    """Toggle Arduino 3 LED"""
-    try:
-        response = requests.get(f"{ARDUINO_3_BASE_URL}/builtin/toggle", timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            return jsonify({"error": "Failed to toggle LED"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
 @app.route('/')
 def index():
-    """Serve main page"""
-    return render_template('index.html')
+    """Serve main page, rendered with the cached state so it needs no API call to show it"""
+    return render_template('index.html', dashboard=dashboard_state(), sites=bool(federated_sites()))
 
-@app.route('/api/arduino1/status', methods=['GET'])
-def arduino1_status():
-    """Fetch Arduino 1 status"""
+@app.template_global()
+def asset_url(name):
+    """URL of a static file under its fingerprinted name"""
+    fingerprinted = assets.url_name(name)
+    if fingerprinted == name:
+        return url_for('static', filename=name)
+    return url_for('asset', name=fingerprinted)
+
+@app.route('/assets/<path:name>', methods=['GET'])
+def asset(name):
+    """Fingerprinted static file: precompressed, immutable, cacheable for a year"""
+    found = assets.get(name)
+    if found is None:
+        return jsonify({"error": f"Unknown asset '{name}'"}), 404
+    encoding, body = found.body(request.accept_encodings)
+    response = Response(body, mimetype=found.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    response.set_etag(f"{found.digest}-{encoding or 'identity'}")
+    return response.make_conditional(request)
+
+@app.route('/api/devices', methods=['GET'])
+def api_devices():
+    """API endpoint: list registered devices"""
+    return jsonify([device.describe() for device in registry.all()])
+
+@app.route('/api/devices/reload', methods=['POST'])
+def api_devices_reload():
+    """API endpoint: re-read the device registry now"""
     try:
-        response = requests.get(f"{ARDUINO_1_BASE_URL}/status", timeout=REQUEST_TIMEOUT)
-        if response.status_code != 200:
-            return jsonify({"error": "Failed to fetch status"}), 500
+        registry.reload()
+    except RegistryError as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    sync_pollers()
+    return jsonify({"status": "success", "devices": registry.ids()})
 
-        status_payload = response.json()
+@app.route('/api/devices/<device_id>/status', methods=['GET'])
+def api_device_status(device_id):
+    """API endpoint: cached status of any registered device"""
+    if registry.get(device_id) is None:
+        return jsonify({"error": f"Unknown device '{device_id}'"}), 404
+    if refresh_requested():
+        refresh_devices([device_id])
+    status_payload = device_status(device_id)
+    if "error" in status_payload:
+        return jsonify(dict(status_payload, connected=False, health=health.get(device_id).status())), 500
+    return versioned_json(status_payload)
 
-        # Fill in temperature/humidity by calling the dedicated sensor endpoint when missing
-        if "temperature" not in status_payload or "humidity" not in status_payload:
-            try:
-                sensor_resp = requests.get(f"{ARDUINO_1_BASE_URL}/sensor", timeout=REQUEST_TIMEOUT)
-                if sensor_resp.status_code == 200:
-                    sensor_data = sensor_resp.json()
-                    status_payload["temperature"] = sensor_data.get("temperature", "-")
-                    status_payload["humidity"] = sensor_data.get("humidity", "-")
-            except Exception as sensor_err:
-                print(f"[WARN] Failed to augment Arduino1 status with sensor data: {sensor_err}")
-
-        return jsonify(status_payload)
-    except Exception as e:
-        return jsonify({"error": str(e), "connected": False}), 500
+@app.route('/api/devices/<device_id>/<action>', methods=['POST'])
+def api_device_action(device_id, action):
+    """API endpoint: run a named action on any registered device"""
+    device = registry.get(device_id)
+    if device is None:
+        return jsonify({"error": f"Unknown device '{device_id}'"}), 404
+    if action not in device.actions:
+        return jsonify({"error": f"Device '{device_id}' has no action '{action}'"}), 404
+    payload, error = run_action(device, action)
+    if error:
+        return jsonify({"status": "error", "message": error}), 500
+    return jsonify({"status": "success", "device": device_id, "action": action, "result": payload})
+
+def parse_batch(steps):
+    """Group [{"device", "action"}, ...] by device, keeping their order.
+
+    Returns ({device id: [actions]}, None) or (None, (message, HTTP status)).
+    """
+    if not isinstance(steps, list) or not steps:
+        return None, ("Expected a non-empty list of {\"device\", \"action\"} steps", 400)
+    groups = {}
+    for step in steps:
+        if not isinstance(step, dict) or not step.get("device") or not step.get("action"):
+            return None, (f"Invalid step {json.dumps(step)[:80]}: needs \"device\" and \"action\"", 400)
+        device = registry.get(step["device"])
+        if device is None:
+            return None, (f"Unknown device '{step['device']}'", 404)
+        if step["action"] not in device.actions:
+            return None, (f"Device '{device.id}' has no action '{step['action']}'", 404)
+        groups.setdefault(device.id, []).append(step["action"])
+    return groups, None
+
+def batch_response(groups, **extra):
+    """Run a batch and answer with its combined result"""
+    status, devices = run_groups(groups)
+    return jsonify({"status": status, **extra, "devices": devices}), 500 if status == "error" else 200
+
+@app.route('/api/devices/batch', methods=['POST'])
+def api_devices_batch():
+    """API endpoint: run actions on several boards at once.
+
+    Body: {"actions": [{"device": "arduino3", "action": "relay1_on"}, ...]}.
+    Each board gets its actions in order (one request when they can be
+    combined); different boards run in parallel.
+    """
+    data = request.get_json(silent=True) or {}
+    groups, problem = parse_batch(data.get("actions"))
+    if problem:
+        return jsonify({"status": "error", "message": problem[0]}), problem[1]
+    return batch_response(groups)
+
+@app.route('/api/scenes', methods=['GET'])
+def api_scenes():
+    """API endpoint: named scenes from devices.json"""
+    return jsonify(registry.section("scenes", {}))
+
+@app.route('/api/scenes/<name>', methods=['POST'])
+def api_run_scene(name):
+    """API endpoint: run a named scene as one batch"""
+    try:
+        steps = registry.scene(name)
+    except RegistryError as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    if steps is None:
+        return jsonify({"status": "error", "message": f"Unknown scene '{name}'"}), 404
+    groups, problem = parse_batch(steps)
+    if problem:
+        return jsonify({"status": "error", "message": f"Scene '{name}': {problem[0]}"}), 500
+    return batch_response(groups, scene=name)
+
+@app.route('/api/health', methods=['GET'])
+def api_health():
+    """API endpoint: latency, error rate and breaker state of every board (as seen by the leader)"""
+    return jsonify(health.export() if leader.is_leader else health_status)
+
+@app.route('/api/rules', methods=['GET'])
+def api_rules():
+    """API endpoint: automation rules and their state (evaluated by the leader)"""
+    global rules_status
+    if leader.is_leader:
+        return jsonify(rules.status())
+    state = rules_snapshot.read_if_changed()
+    if state is not None:
+        rules_status = state
+    return jsonify(rules_status)
+
+# Legacy per-board command routes, kept for the existing front ends and
+# scripts. Each maps onto a registry action; the reply style matches what
+# the route always returned:
+#   raw    - the board's JSON reply, {"error": message} on failure
+#   action - {"status": "success", "action": message}
+LEGACY_COMMAND_ROUTES = [
+    ('/api/arduino1/led/toggle', 'toggle_arduino1_led', 'arduino1', 'builtin_toggle', 'raw', 'Failed to toggle built-in LED'),
+    ('/api/arduino3/led/toggle', 'toggle_arduino3_led', 'arduino3', 'builtin_toggle', 'raw', 'Failed to toggle LED'),
+    ('/api/arduino3/relay1/on', 'arduino3_relay1_on', 'arduino3', 'relay1_on', 'raw', 'Failed to turn Relay 1 ON'),
+    ('/api/arduino3/relay1/off', 'arduino3_relay1_off', 'arduino3', 'relay1_off', 'raw', 'Failed to turn Relay 1 OFF'),
+    ('/api/arduino3/relay2/on', 'arduino3_relay2_on', 'arduino3', 'relay2_on', 'raw', 'Failed to turn Relay 2 ON'),
+    ('/api/arduino3/relay2/off', 'arduino3_relay2_off', 'arduino3', 'relay2_off', 'raw', 'Failed to turn Relay 2 OFF'),
+    ('/api/led/on', 'api_led_on', PRIMARY_DEVICE, 'led_on', 'action', 'LED turned ON'),
+    ('/api/led/off', 'api_led_off', PRIMARY_DEVICE, 'led_off', 'action', 'LED turned OFF'),
+    ('/api/led/toggle', 'api_led_toggle', PRIMARY_DEVICE, 'led_toggle', 'action', 'LED toggled'),
+    ('/api/builtin/on', 'api_builtin_on', PRIMARY_DEVICE, 'builtin_on', 'action', 'Built-in LED turned ON'),
+    ('/api/builtin/off', 'api_builtin_off', PRIMARY_DEVICE, 'builtin_off', 'action', 'Built-in LED turned OFF'),
+    ('/api/builtin/toggle', 'api_builtin_toggle', PRIMARY_DEVICE, 'builtin_toggle', 'action', 'Built-in LED toggled'),
+]
+
+def legacy_command(device_id, action, style, message):
+    """Run a registry action and format the reply like the legacy route did"""
+    device = registry.get(device_id)
+    if device is None:
+        payload, error = None, f"Unknown device '{device_id}'"
+    else:
+        payload, error = run_action(device, action)
+    if style == 'action':
+        if error:
+            return jsonify({"status": "error", "message": error}), 500
+        return jsonify({"status": "success", "action": message})
+    if error:
+        return jsonify({"error": f"{message}: {error}"}), 500
+    return jsonify(payload)
+
+for _rule, _endpoint, _device_id, _action, _style, _message in LEGACY_COMMAND_ROUTES:
+    app.add_url_rule(
+        _rule, _endpoint, methods=['POST'],
+        view_func=lambda d=_device_id, a=_action, s=_style, m=_message: legacy_command(d, a, s, m)
+    )
+
+@app.route('/api/nodemcu/toggle/<int:channel>', methods=['POST'])
+def toggle_channel(channel):
+    """API endpoint: Toggle a specific channel on NodeMCU"""
+    if channel not in [1, 2]:
+        return jsonify({"error": "Invalid channel"}), 400
+    device = registry.get('arduino3')
+    if device is None:
+        return jsonify({"error": "Unknown device 'arduino3'"}), 404
+    payload, error = run_action(device, f"channel{channel}_toggle")
+    if error:
+        return jsonify({"error": f"Failed to toggle channel: {error}"}), 500
+    return payload if isinstance(payload, str) else jsonify(payload), 200  # Return plain text response
+
+@app.route('/api/arduino1/status', methods=['GET'])
+def arduino1_status():
+    """Fetch Arduino 1 status"""
+    return api_device_status('arduino1')
 
 @app.route('/api/arduino3/status', methods=['GET'])
 def arduino3_status():
     """Fetch Arduino 3 status"""
-    try:
-        response = requests.get(f"{ARDUINO_3_BASE_URL}/status", timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            data = response.json()
-            return jsonify({
-                "builtin_led": data.get("builtin_led", "OFF"),
-                "relay_channel_1": data.get("relay1", data.get("relay_channel_1", "OFF")),
-                "relay_channel_2": data.get("relay2", data.get("relay_channel_2", "OFF")),
-                "ip": ARDUINO_3_IP,
-                "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-        else:
-            return jsonify({"error": "Failed to fetch status"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e), "connected": False}), 500
+    return api_device_status('arduino3')
 
 @app.route('/api/nodemcu/status', methods=['GET'])
 def nodemcu_status():
     """Fetch Arduino 3 status for legacy frontend endpoint."""
-    try:
-        response = requests.get(f"{ARDUINO_3_BASE_URL}/status", timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            data = response.json()
-            return jsonify({
-                "builtin_led": data.get("builtin_led", "OFF"),
-                "relay_channel_1": data.get("relay1", data.get("relay_channel_1", "OFF")),
-                "relay_channel_2": data.get("relay2", data.get("relay_channel_2", "OFF")),
-                "ip": ARDUINO_3_IP,
-                "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-        return jsonify({"error": "Failed to fetch status"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e), "connected": False}), 500
+    return api_device_status('arduino3')
 
 @app.route('/api/arduino3/mh', methods=['GET'])
 def arduino3_mh():
     """Fetch MH sensor data from Arduino 3"""
-    try:
-        digital_response = requests.get(f"{ARDUINO_3_BASE_URL}/mh/digital", timeout=REQUEST_TIMEOUT)
-        analog_response = requests.get(f"{ARDUINO_3_BASE_URL}/mh/analog", timeout=REQUEST_TIMEOUT)
-
-        if digital_response.status_code == 200 and analog_response.status_code == 200:
-            digital_data = digital_response.json()
-            analog_data = analog_response.json()
-            return jsonify({
-                "digital": digital_data.get("digital", "N/A"),
-                "analog": analog_data.get("analog", "N/A")
-            })
-
-        return jsonify({"error": "Failed to fetch MH sensor"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/arduino3/relay1/on', methods=['POST'])
-def arduino3_relay1_on():
-    try:
-        response = requests.get(f"{ARDUINO_3_BASE_URL}/relay1/on", timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            return jsonify(response.json())
-        return jsonify({"error": "Failed to turn Relay 1 ON"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/arduino3/relay1/off', methods=['POST'])
-def arduino3_relay1_off():
-    try:
-        response = requests.get(f"{ARDUINO_3_BASE_URL}/relay1/off", timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            return jsonify(response.json())
-        return jsonify({"error": "Failed to turn Relay 1 OFF"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/arduino3/relay2/on', methods=['POST'])
-def arduino3_relay2_on():
-    try:
-        response = requests.get(f"{ARDUINO_3_BASE_URL}/relay2/on", timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            return jsonify(response.json())
-        return jsonify({"error": "Failed to turn Relay 2 ON"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/arduino3/relay2/off', methods=['POST'])
-def arduino3_relay2_off():
-    try:
-        response = requests.get(f"{ARDUINO_3_BASE_URL}/relay2/off", timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            return jsonify(response.json())
-        return jsonify({"error": "Failed to turn Relay 2 OFF"}), 500
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    if refresh_requested():
+        refresh_devices(["arduino3"])
+    payload, error = cached_status("arduino3", ["mh_digital", "mh_analog"])
+    if error:
+        return jsonify({"error": error}), 500
+    return versioned_json({
+        "digital": payload["mh_digital"],
+        "analog": payload["mh_analog"]
+    })
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """Fetch the status of both Arduino 1 and Arduino 3."""
-    try:
-        # Fetch Arduino 1 status
-        arduino1_status = requests.get(f"{ARDUINO_1_BASE_URL}/status", timeout=REQUEST_TIMEOUT).json()
-    except Exception as e:
-        arduino1_status = {"error": str(e)}
+    """Fetch the status of every registered board (Arduino 1 and Arduino 3).
 
-    try:
-        # Fetch Arduino 3 status
-        raw_arduino3 = requests.get(f"{ARDUINO_3_BASE_URL}/status", timeout=REQUEST_TIMEOUT).json()
-        arduino3_status = {
-            "builtin_led": raw_arduino3.get("builtin_led", "OFF"),
-            "relay_channel_1": raw_arduino3.get("relay1", raw_arduino3.get("relay_channel_1", "OFF")),
-            "relay_channel_2": raw_arduino3.get("relay2", raw_arduino3.get("relay_channel_2", "OFF")),
-            "ip": ARDUINO_3_IP,
-            "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-    except Exception as e:
-        arduino3_status = {"error": str(e)}
+    Served from the state cache; with ?refresh=1 the boards are polled in
+    parallel first and each device reports its own result or error. Boards
+    of other sites follow as "<site>/<device>" (not refreshed, marked stale
+    when their site went quiet); ?local=1 leaves them out.
+    """
+    device_ids = [device.id for device in registry.all() if device.poll]
+    errors = refresh_devices(device_ids) if refresh_requested() else {}
+    statuses = {}
+    for device_id in device_ids:
+        statuses[device_id] = device_status(device_id)
+        if errors.get(device_id):
+            statuses[device_id].setdefault("error", errors[device_id])
+        if "error" in statuses[device_id]:
+            statuses[device_id]["health"] = health.get(device_id).status()
+    if not request.args.get('local'):
+        now = time.time()
+        for name, state in federated_sites().items():
+            statuses.update(site_devices(name, state, now))
+    return versioned_json(statuses)
 
-    # Combine statuses
+@app.route('/api/sites', methods=['GET'])
+def api_sites():
+    """API endpoint: followed sites, their connection, staleness and boards"""
+    now = time.time()
     return jsonify({
-        "arduino1": arduino1_status,
-        "arduino3": arduino3_status
+        name: dict(site_status(state, now), boards=site_devices(name, state, now))
+        for name, state in federated_sites().items()
     })
 
 @app.route('/api/config', methods=['GET'])
 def api_config():
     """API endpoint: get configuration"""
+    device = registry.get(PRIMARY_DEVICE)
     return jsonify({
-        "arduino_ip": ARDUINO_IP,
-        "arduino_port": ARDUINO_PORT,
+        "arduino_ip": device.host if device else None,
+        "arduino_port": device.port if device else None,
         "request_timeout": REQUEST_TIMEOUT
     })
 
 @app.route('/api/config', methods=['POST'])
 def api_set_config():
-    """API endpoint: set Arduino IP"""
-    global ARDUINO_IP, ARDUINO_BASE_URL
-    data = request.get_json()
-    
-    if 'ip' in data:
-        ARDUINO_IP = data['ip']
-        ARDUINO_BASE_URL = f"http://{ARDUINO_IP}:{ARDUINO_PORT}"
+    """API endpoint: set a board's IP (the primary board unless 'device' is given)"""
+    data = request.get_json(silent=True) or {}
+    device_id = data.get('device', PRIMARY_DEVICE)
+
+    if 'ip' in data and registry.get(device_id) is not None:
+        registry.override(device_id, host=data['ip'])
+        sync_pollers()
         # Try to connect immediately
-        get_arduino_status()
+        connected = poll_device(registry.get(device_id))
         return jsonify({
             "status": "success",
-            "message": f"Arduino IP updated to {ARDUINO_IP}",
-            "connected": current_status["connected"]
+            "message": f"{device_id} IP updated to {data['ip']}",
+            "connected": connected
         })
-    
-    return jsonify({"status": "error", "message": "Invalid configuration"}), 400
-
-@app.route('/api/led/on', methods=['POST'])
-def api_led_on():
-    """API endpoint: turn LED on"""
-    try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/led/on",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            get_arduino_status()
-            return jsonify({"status": "success", "action": "LED turned ON"})
-        else:
-            return jsonify({"status": "error", "message": "Arduino returned error"}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
-
-@app.route('/api/led/off', methods=['POST'])
-def api_led_off():
-    """API endpoint: turn LED off"""
-    try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/led/off",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            get_arduino_status()
-            return jsonify({"status": "success", "action": "LED turned OFF"})
-        else:
-            return jsonify({"status": "error", "message": "Arduino returned error"}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
-
-@app.route('/api/led/toggle', methods=['POST'])
-def api_led_toggle():
-    """API endpoint: toggle LED"""
-    try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/led/toggle",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            get_arduino_status()
-            return jsonify({"status": "success", "action": "LED toggled"})
-        else:
-            return jsonify({"status": "error", "message": "Arduino returned error"}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
 
-@app.route('/api/builtin/on', methods=['POST'])
-def api_builtin_on():
-    """API endpoint: turn built-in LED on"""
-    try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/builtin/on",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            get_arduino_status()
-            return jsonify({"status": "success", "action": "Built-in LED turned ON"})
-        else:
-            return jsonify({"status": "error", "message": "Arduino returned error"}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
-
-@app.route('/api/builtin/off', methods=['POST'])
-def api_builtin_off():
-    """API endpoint: turn built-in LED off"""
-    try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/builtin/off",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            get_arduino_status()
-            return jsonify({"status": "success", "action": "Built-in LED turned OFF"})
-        else:
-            return jsonify({"status": "error", "message": "Arduino returned error"}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
-
-@app.route('/api/builtin/toggle', methods=['POST'])
-def api_builtin_toggle():
-    """API endpoint: toggle built-in LED"""
-    try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/builtin/toggle",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            get_arduino_status()
-            return jsonify({"status": "success", "action": "Built-in LED toggled"})
-        else:
-            return jsonify({"status": "error", "message": "Arduino returned error"}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({"status": "error", "message": "Invalid configuration"}), 400
 
 @app.route('/api/sensor', methods=['GET'])
 def api_sensor():
     """API endpoint: get temperature and humidity from Arduino"""
-    try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/sensor",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            return jsonify(response.json())
-        else:
-            return jsonify({"status": "error", "message": "Arduino returned error"}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    payload, error = cached_status(PRIMARY_DEVICE, ["temperature", "humidity"])
+    if error:
+        return jsonify({"status": "error", "message": error}), 500
+    return versioned_json({"temperature": payload["temperature"], "humidity": payload["humidity"]})
 
 @app.route('/api/temperature', methods=['GET'])
 def api_temperature():
     """API endpoint: get temperature from Arduino"""
-    try:
-        response = requests.get(
-            f"{ARDUINO_1_BASE_URL}/sensor",
-            timeout=REQUEST_TIMEOUT
-        )
-        if response.status_code == 200:
-            data = response.json()
-            return jsonify({"temperature": data.get("temperature", "N/A")})
-        else:
-            return jsonify({"status": "error", "message": "Arduino returned error"}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    payload, error = cached_status(PRIMARY_DEVICE, ["temperature"])
+    if error:
+        return jsonify({"status": "error", "message": error}), 500
+    return versioned_json({"temperature": payload["temperature"]})
 
 @app.route('/api/d1/status', methods=['GET'])
 def d1_status():
     """API endpoint: Get status from Arduino D1"""
-    try:
-        response = requests.get(f"{ARDUINO_1_BASE_URL}/status", timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            return response.json(), 200
-        else:
-            return jsonify({"error": "Failed to fetch status from Arduino D1"}), response.status_code
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-
-@app.route('/api/nodemcu/status', methods=['GET'])
-def api_nodemcu_status():
-    """API endpoint to get NodeMCU status"""
-    return get_nodemcu_status()
-
-@app.route('/api/nodemcu/toggle/<int:channel>', methods=['POST'])
-def toggle_channel(channel):
-    """API endpoint: Toggle a specific channel on NodeMCU"""
-    if channel not in [1, 2]:
-        return jsonify({"error": "Invalid channel"}), 400
-    try:
-        response = requests.get(f"{ARDUINO_BASE_URL}/toggleChannel{channel}", timeout=REQUEST_TIMEOUT)
-        if response.status_code == 200:
-            return response.text, 200  # Return plain text response
-        else:
-            return jsonify({"error": "Failed to toggle channel"}), response.status_code
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    status_payload = device_status('arduino1')
+    if "error" in status_payload:
+        return jsonify({"error": status_payload["error"]}), 500
+    return versioned_json(status_payload)
 
 @app.route('/api/arduino3/sensor', methods=['GET'])
 def get_arduino3_sensor():
     """Fetch sensor data from Arduino 3"""
     try:
-        response = requests.get(f"{ARDUINO_3_BASE_URL}/sensor", timeout=REQUEST_TIMEOUT)
+        response = device_get(registry.get('arduino3'), '/sensor')
         if response.status_code == 200:
             return jsonify(response.json())
         else:
@@ -559,6 +1151,319 @@ def get_arduino3_sensor():
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def device_snapshot(device):
+    """Full cached state of one device in the shape used by /api/stream"""
+    snapshot = state_cache.get(device)
+    if snapshot is None:
+        return {"fields": {}, "error": "No data received from device yet", "last_update": None}
+    error = snapshot["error"] or (None if snapshot["fresh"] else "Device data is stale")
+    return {
+        "fields": snapshot["fields"],
+        "error": error,
+        "last_update": format_timestamp(snapshot["last_success"])
+    }
+
+def dashboard_state():
+    """Every polled board's cached state: the /api/stream snapshot, /api/dashboard and the first page"""
+    return {device.id: device_snapshot(device.id) for device in registry.all() if device.poll}
+
+@app.route('/api/dashboard', methods=['GET'])
+def api_dashboard():
+    """API endpoint: the state of every board in one response"""
+    return versioned_json(dashboard_state())
+
+def sse_event(event, data):
+    """Encode one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/stream', methods=['GET'])
+def api_stream():
+    """Push channel: a full snapshot on connect, then state deltas from the pollers"""
+    def events():
+        subscription = state_cache.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            yield sse_event("snapshot", dashboard_state())
+            while True:
+                event = subscription.get(timeout=STREAM_KEEPALIVE)
+                if subscription.lagged:
+                    # This client fell behind; drop the backlog and resynchronize
+                    while subscription.get(timeout=0) is not None:
+                        pass
+                    subscription.lagged = False
+                    yield sse_event("snapshot", dashboard_state())
+                elif event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield sse_event("delta", {
+                        "device": event["device"],
+                        "fields": event["fields"],
+                        "error": event["error"],
+                        "last_update": format_timestamp(event["ts"])
+                    })
+        finally:
+            state_cache.unsubscribe(subscription)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route('/api/history/<device_id>/<metric>', methods=['GET'])
+def api_history(device_id, metric):
+    """API endpoint: min/max/avg buckets of a recorded metric"""
+    device = registry.get(device_id)
+    if device is None:
+        return jsonify({"error": f"Unknown device '{device_id}'"}), 404
+    if metric not in device.metrics:
+        return jsonify({"error": f"Device '{device_id}' does not record '{metric}'"}), 404
+    try:
+        end = parse_time(request.args.get('to'), time.time())
+        start = parse_time(request.args.get('from'), end - HISTORY_DEFAULT_RANGE)
+        step = request.args.get('step', type=int)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid time range: {e}"}), 400
+    if start >= end:
+        return jsonify({"error": "'from' must be before 'to'"}), 400
+    return jsonify(history.query(device_id, metric, start, end, step))
+
+@app.route('/api/export', methods=['GET'])
+def api_export():
+    """API endpoint: stream recorded history as CSV, NDJSON or Parquet (see export.py)"""
+    device = request.args.get('device') or None
+    metric = request.args.get('metric') or None
+    fmt = request.args.get('format', 'csv')
+    try:
+        encode = encoder(fmt)
+        end = parse_time(request.args.get('to'), time.time())
+        start = parse_time(request.args.get('from'), end - EXPORT_DEFAULT_RANGE)
+        step = request.args.get('step', type=int)
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError as e:
+        return jsonify({"error": f"Invalid time range: {e}"}), 400
+    if start >= end:
+        return jsonify({"error": "'from' must be before 'to'"}), 400
+    series = select_series(history, device, metric)
+    if not series:
+        return jsonify({"error": "No recorded series matches"}), 404
+
+    chunks = encode(export_rows(history, series, start, end, step))
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename(fmt, device, metric)}"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding',
+    }
+    # Parquet pages are compressed already
+    if fmt != 'parquet' and 'gzip' in request.accept_encodings:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    log.info("export started client=%s format=%s series=%d from=%d to=%d",
+             g.get('api_client', 'browser'), fmt, len(series), start, end)
+    return Response(chunks, mimetype=FORMATS[fmt][0], headers=headers)
+
+def camera_device(device_id=None):
+    """Camera board with this id (the first one in the registry by default), or None"""
+    if device_id:
+        device = registry.get(device_id)
+    else:
+        device = next((device for device in registry.all() if device.camera), None)
+    if device is None or not device.camera or "stream" not in device.camera:
+        return None
+    return device
+
+def camera_proxy(device):
+    """Relay for a camera board, or None"""
+    if device is None:
+        return None
+    url = device.url(device.camera["stream"])
+    with camera_lock:
+        proxy = camera_proxies.get(device.id)
+        if proxy is None or proxy.url != url:
+            proxy = camera_proxies[device.id] = CameraProxy(device.id, url, RUNTIME_DIR)
+        return proxy
+
+def camera_archive(device_id):
+    """Recorded frames of one camera (readable from any worker)"""
+    return CameraArchive(os.path.join(CAMERA_ARCHIVE_DIR, device_id), max_bytes=CAMERA_ARCHIVE_MAX_BYTES)
+
+@app.route('/api/camera/stream', methods=['GET'])
+def api_camera_stream():
+    """MJPEG stream relayed from the camera board (?device= picks the camera)"""
+    proxy = camera_proxy(camera_device(request.args.get('device')))
+    if proxy is None:
+        return jsonify({"error": "No camera configured"}), 404
+    return Response(proxy.stream(), mimetype=f"multipart/x-mixed-replace; boundary={CAMERA_BOUNDARY}", headers={
+        "Cache-Control": "no-cache, private",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route('/api/camera/snapshot', methods=['GET'])
+def api_camera_snapshot():
+    """Latest buffered camera frame as a JPEG"""
+    proxy = camera_proxy(camera_device(request.args.get('device')))
+    if proxy is None:
+        return jsonify({"error": "No camera configured"}), 404
+    frame = proxy.snapshot()
+    if frame is None:
+        return jsonify({"error": proxy.error or "No frame received from camera yet"}), 503
+    return Response(frame.data, mimetype="image/jpeg", headers={
+        "Cache-Control": "no-store, private",
+        "X-Frame-Timestamp": f"{frame.ts:.3f}"
+    })
+
+@app.route('/api/camera/status', methods=['GET'])
+def api_camera_status():
+    """API endpoint: relay state of each camera used by this worker"""
+    with camera_lock:
+        proxies = list(camera_proxies.values())
+    return jsonify({proxy.name: proxy.stats() for proxy in proxies})
+
+@app.route('/api/camera/recordings', methods=['GET'])
+def api_camera_recordings():
+    """API endpoint: recorded segments of a camera"""
+    device = camera_device(request.args.get('device'))
+    if device is None:
+        return jsonify({"error": "No camera configured"}), 404
+    return jsonify({"camera": device.id, "segments": camera_archive(device.id).segments()})
+
+@app.route('/api/camera/recordings/frame', methods=['GET'])
+def api_camera_recorded_frame():
+    """Recorded JPEG at or just before ?t= (epoch seconds or ISO date)"""
+    device = camera_device(request.args.get('device'))
+    if device is None:
+        return jsonify({"error": "No camera configured"}), 404
+    try:
+        ts = parse_time(request.args.get('t'), time.time())
+    except ValueError as e:
+        return jsonify({"error": f"Invalid time: {e}"}), 400
+    frame = camera_archive(device.id).frame_at(ts)
+    if frame is None:
+        return jsonify({"error": "No recording at that time"}), 404
+    frame_ts, data, flags = frame
+    return Response(data, mimetype="image/jpeg", headers={
+        "Cache-Control": "private, max-age=3600",
+        "X-Frame-Timestamp": f"{frame_ts:.3f}",
+        "X-Frame-Motion": "1" if flags & FLAG_MOTION else "0"
+    })
+
+@app.route('/api/camera/playback', methods=['GET'])
+def api_camera_playback():
+    """Recorded frames between ?from= and ?to= as an MJPEG stream, paced at ?speed="""
+    device = camera_device(request.args.get('device'))
+    if device is None:
+        return jsonify({"error": "No camera configured"}), 404
+    try:
+        start = parse_time(request.args.get('from'), None)
+        end = parse_time(request.args.get('to'), time.time())
+        speed = request.args.get('speed', 1.0, type=float)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid time range: {e}"}), 400
+    if start is None or start >= end or speed <= 0:
+        return jsonify({"error": "'from' is required and must be before 'to'; speed must be positive"}), 400
+    archive = camera_archive(device.id)
+
+    def frames():
+        due = time.monotonic()
+        previous = None
+        for frame_ts, data, _ in archive.frames(start, end):
+            if previous is not None:
+                # Stretches without recording are skipped instead of waited out
+                due += min(frame_ts - previous, PLAYBACK_MAX_GAP) / speed
+            previous = frame_ts
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            yield part_header(len(data))
+            yield data
+            yield b"\r\n"
+
+    return Response(frames(), mimetype=f"multipart/x-mixed-replace; boundary={CAMERA_BOUNDARY}", headers={
+        "Cache-Control": "no-cache, private",
+        "X-Accel-Buffering": "no"
+    })
+
+def poll_lag():
+    """Seconds since each board's last successful poll"""
+    now = time.time()
+    lag = {}
+    for device_id in state_cache.devices():
+        snapshot = state_cache.get(device_id, now)
+        if snapshot and snapshot["last_success"]:
+            lag[(device_id,)] = now - snapshot["last_success"]
+    return lag
+
+def connection_counts():
+    counts = {}
+    for host, counters in http_pool.stats().items():
+        counts[(host, "new")] = counters["new_connections"]
+        counts[(host, "reused")] = counters["reused_connections"]
+    return counts
+
+metrics.default_registry.callback(
+    "arduino_poll_lag_seconds", "Seconds since the last successful poll of a board", ("device",), poll_lag)
+metrics.default_registry.callback(
+    "arduino_poll_failures", "Failed polls in a row per board (drives the poll backoff)", ("device",),
+    lambda: {(device_id,): job["failures"] for device_id, job in poll_scheduler.stats().items()}, shared=True)
+metrics.default_registry.callback(
+    "arduino_breaker_open", "1 while a board's circuit breaker is open or half-open", ("device",),
+    lambda: {(device_id,): int(state["breaker"] != CLOSED) for device_id, state in health.export().items()})
+metrics.default_registry.callback(
+    "arduino_breaker_rejected_total", "Requests refused at once because a board's breaker was open", ("device",),
+    lambda: {(device_id,): state["rejected"] for device_id, state in health.export().items()},
+    kind="counter", shared=True)
+metrics.default_registry.callback(
+    "arduino_stream_clients", "Open /api/stream connections", (),
+    lambda: {(): state_cache.subscriber_count()}, shared=True)
+metrics.default_registry.callback(
+    "arduino_upstream_connections_total", "Keep-alive connections opened (new) or reused per board",
+    ("host", "kind"), connection_counts, kind="counter", shared=True)
+
+def camera_counts(attribute):
+    with camera_lock:
+        proxies = list(camera_proxies.values())
+    return {(proxy.name,): getattr(proxy, attribute) for proxy in proxies}
+
+metrics.default_registry.callback(
+    "arduino_camera_frames_total", "Frames received by the camera relay", ("camera",),
+    lambda: camera_counts("frames_received"), kind="counter", shared=True)
+metrics.default_registry.callback(
+    "arduino_camera_viewers", "Open camera streams (relays to other workers included)", ("camera",),
+    lambda: camera_counts("viewers"), shared=True)
+
+def dump_metrics():
+    """Write this worker's counters where the other workers can sum them"""
+    StateSnapshot(worker_file(RUNTIME_DIR, "metrics")).write(metrics.default_registry.export())
+
+metrics.default_registry.callback(
+    "arduino_coalesced_total", "Reads and commands served by joining an identical in-flight one",
+    ("kind",), lambda: {(kind,): count for kind, count in commands.stats().items()}, kind="counter", shared=True)
+
+def telemetry_counts():
+    if telemetry is None:
+        return {}
+    return {(result,): count for result, count in telemetry.counts.items()}
+
+metrics.default_registry.callback(
+    "arduino_telemetry_datagrams_total", "Pushed telemetry datagrams by outcome", ("result",),
+    telemetry_counts, kind="counter", shared=True)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics, summed over all server processes.
+
+    Every worker's part comes from its last dump (at most METRICS_DUMP_INTERVAL
+    old), so counters never go backwards whichever worker answers the scrape.
+    """
+    dump_metrics()
+    exports = read_worker_files(RUNTIME_DIR, "metrics")
+    return Response(metrics.default_registry.render(exports), mimetype=metrics.CONTENT_TYPE)
+
+@app.route('/api/connections', methods=['GET'])
+def api_connections():
+    """API endpoint: connection reuse counters per device"""
+    return jsonify(http_pool.stats())
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
@@ -570,20 +1475,24 @@ def internal_error(error):
     return jsonify({"error": "Internal server error"}), 500
 
 if __name__ == '__main__':
+    primary = registry.get(PRIMARY_DEVICE)
     print(f"\n{'='*50}")
     print(f"RPI5 Web Interface - Arduino D1 Control")
     print(f"{'='*50}")
-    print(f"Arduino IP configured as: {ARDUINO_1_IP}:{ARDUINO_PORT}")
+    for device in registry.all():
+        print(f"{device.name} configured at: {device.host}:{device.port}")
     print(f"Web interface will be available at: http://<RPI5_IP>:5000")
     print(f"Access from PC: http://192.168.x.x:5000 (replace with your RPI5 IP)")
     print(f"Press Ctrl+C to stop the server\n")
-    
+
     # Initial connection test
     if get_arduino_status():
-        print(f"✓ Connected to Arduino at {ARDUINO_1_IP}")
+        print(f"✓ Connected to Arduino at {primary.host}")
     else:
-        print(f"✗ Could not connect to Arduino at {ARDUINO_1_IP}")
+        print(f"✗ Could not connect to Arduino at {primary.host if primary else 'unknown address'}")
         print(f"  You can change the IP in the web interface settings")
-    
+
     print(f"{'='*50}\n")
+    # Development server; production runs under gunicorn (see wsgi.py)
+    start_background()
     app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+WSGI Entry Point for the RPI5 Web Interface
+Production serving mode, run from the rpi5 directory:
+    gunicorn -c gunicorn.conf.py wsgi:app
+Each worker starts its background thread here; one of them becomes the
+leader and polls the boards, the others mirror its state.
+"""
+
+from web_server import app, start_background
+
+start_background()
+
+application = app
@@ -1,66 +1,72 @@
 console.log('[INIT] Script loaded');
 
-async function fetchArduino1Status() {
-    try {
-        const response = await fetch('/api/arduino1/status');
-        console.log('[DEBUG] Fetching Arduino 1 status. Response status:', response.status);
-        
-        if (response.ok) {
-            const data = await response.json();
-            console.log('[DEBUG] Arduino 1 data:', data);
-            document.getElementById('arduino1-status').innerText = 'Connected';
-            document.getElementById('arduino1-led').innerText = data.builtin_led || 'OFF';
-            document.getElementById('arduino1-temp').innerText = data.temperature || '-';
-            document.getElementById('arduino1-humidity').innerText = data.humidity || '-';
+// Conditional polling: the last payload and version of each status URL are
+// kept. The server answers 304 when nothing changed, otherwise only the
+// fields that changed since that version (see status_versions.py).
+const versionedPayloads = {};
+
+function applyDelta(target, changed, removed) {
+    for (const [key, value] of Object.entries(changed)) {
+        const current = target[key];
+        if (value && typeof value === 'object' && current && typeof current === 'object') {
+            applyDelta(current, value, {});
         } else {
-            document.getElementById('arduino1-status').innerText = 'Disconnected';
-            console.warn('[WARN] Arduino 1 status returned:', response.status);
+            target[key] = value;
+        }
+    }
+    for (const [key, value] of Object.entries(removed)) {
+        if (value === true) {
+            delete target[key];
+        } else if (target[key]) {
+            applyDelta(target[key], {}, value);
         }
-    } catch (error) {
-        document.getElementById('arduino1-status').innerText = 'Disconnected';
-        console.error('[ERROR] Error fetching Arduino 1 status:', error);
     }
 }
 
-async function fetchArduino3Status() {
-    try {
-        const response = await fetch('/api/arduino3/status');
-        if (response.ok) {
-            const data = await response.json();
-            document.getElementById('arduino3-status').innerText = 'Connected';
-            document.getElementById('arduino3-led').innerText = data.builtin_led || 'OFF';
-            document.getElementById('arduino3-relay0').innerText = data.relay_channel_1 || 'OFF';
-            document.getElementById('arduino3-relay1').innerText = data.relay_channel_2 || 'OFF';
-        } else {
-            document.getElementById('arduino3-status').innerText = 'Disconnected';
-            document.getElementById('arduino3-led').innerText = 'N/A';
-            document.getElementById('arduino3-relay0').innerText = 'N/A';
-            document.getElementById('arduino3-relay1').innerText = 'N/A';
-        }
-    } catch (error) {
-        document.getElementById('arduino3-status').innerText = 'Disconnected';
-        document.getElementById('arduino3-led').innerText = 'N/A';
-        document.getElementById('arduino3-relay0').innerText = 'N/A';
-        document.getElementById('arduino3-relay1').innerText = 'N/A';
-        console.error('Error fetching Arduino 3 status:', error);
+async function fetchVersioned(url) {
+    const known = versionedPayloads[url];
+    const separator = url.includes('?') ? '&' : '?';
+    const headers = known ? { 'If-None-Match': `W/"${known.version}"` } : {};
+    const response = await fetch(`${url}${separator}since=${known ? known.version : ''}`, { headers, cache: 'no-store' });
+    if (response.status === 304) {
+        return { ok: true, status: response.status, data: known.data };
+    }
+    if (!response.ok) {
+        delete versionedPayloads[url];
+        return { ok: false, status: response.status, data: null };
+    }
+    const delta = await response.json();
+    const current = versionedPayloads[url];
+    if (!delta.full && current !== known) {
+        // An overlapping request already moved past the version this delta is based on
+        return { ok: true, status: response.status, data: (current || known).data };
     }
+    const data = delta.full ? delta.changed : known.data;
+    if (!delta.full) {
+        applyDelta(data, delta.changed, delta.removed);
+    }
+    versionedPayloads[url] = { version: delta.version, data };
+    return { ok: true, status: response.status, data };
 }
 
-async function fetchArduino3Mh() {
+// Polling fallback: one request returns every board (see /api/dashboard)
+async function fetchDashboard() {
     try {
-        const response = await fetch('/api/arduino3/mh');
-        if (response.ok) {
-            const data = await response.json();
-            document.getElementById('arduino3-mh-digital').innerText = data.digital ?? 'N/A';
-            document.getElementById('arduino3-mh-analog').innerText = data.analog ?? 'N/A';
-        } else {
-            document.getElementById('arduino3-mh-digital').innerText = 'N/A';
-            document.getElementById('arduino3-mh-analog').innerText = 'N/A';
+        const response = await fetchVersioned('/api/dashboard');
+        if (!response.ok) {
+            console.warn('[WARN] Dashboard returned:', response.status);
+            return;
+        }
+        for (const [device, state] of Object.entries(response.data)) {
+            deviceState[device] = state;
+            renderDevice(device);
         }
     } catch (error) {
-        document.getElementById('arduino3-mh-digital').innerText = 'N/A';
-        document.getElementById('arduino3-mh-analog').innerText = 'N/A';
-        console.error('Error fetching Arduino 3 MH sensor:', error);
+        for (const device of Object.keys(deviceRenderers)) {
+            deviceState[device] = { fields: {}, error: error.message };
+            renderDevice(device);
+        }
+        console.error('[ERROR] Error fetching dashboard:', error);
     }
 }
 
@@ -74,7 +80,7 @@ async function toggleArduino1LED() {
         if (response.ok) {
             const data = await response.json();
             console.log('[DEBUG] Toggle response:', data);
-            await fetchArduino1Status();
+            await fetchDashboard();
         } else {
             const error = await response.text();
             console.error('[ERROR] Failed to toggle LED. Status:', response.status, 'Error:', error);
@@ -90,7 +96,7 @@ async function toggleArduino3LED() {
     try {
         const response = await fetch('/api/arduino3/led/toggle', { method: 'POST' });
         if (response.ok) {
-            await fetchArduino3Status();
+            await fetchDashboard();
         } else {
             alert('Failed to toggle Arduino 3 LED');
         }
@@ -104,7 +110,7 @@ async function relay1On() {
     try {
         const response = await fetch('/api/arduino3/relay1/on', { method: 'POST' });
         if (response.ok) {
-            await fetchArduino3Status();
+            await fetchDashboard();
         } else {
             alert('Failed to turn Relay D0 ON');
         }
@@ -118,7 +124,7 @@ async function relay1Off() {
     try {
         const response = await fetch('/api/arduino3/relay1/off', { method: 'POST' });
         if (response.ok) {
-            await fetchArduino3Status();
+            await fetchDashboard();
         } else {
             alert('Failed to turn Relay D0 OFF');
         }
@@ -132,7 +138,7 @@ async function relay2On() {
     try {
         const response = await fetch('/api/arduino3/relay2/on', { method: 'POST' });
         if (response.ok) {
-            await fetchArduino3Status();
+            await fetchDashboard();
         } else {
             alert('Failed to turn Relay D1 ON');
         }
@@ -146,7 +152,7 @@ async function relay2Off() {
     try {
         const response = await fetch('/api/arduino3/relay2/off', { method: 'POST' });
         if (response.ok) {
-            await fetchArduino3Status();
+            await fetchDashboard();
         } else {
             alert('Failed to turn Relay D1 OFF');
         }
@@ -156,10 +162,136 @@ async function relay2Off() {
     }
 }
 
-// Fetch initial status and set up periodic updates
-fetchArduino1Status();
-fetchArduino3Status();
-fetchArduino3Mh();
-setInterval(fetchArduino1Status, 5000);
-setInterval(fetchArduino3Status, 5000);
-setInterval(fetchArduino3Mh, 5000);
\ No newline at end of file
+// Live updates: one Server-Sent Events connection per tab replaces the
+// polling timers. The server sends a snapshot on connect, then deltas.
+const deviceState = {};
+
+function renderArduino1(state) {
+    const fields = state.fields || {};
+    if (state.error) {
+        document.getElementById('arduino1-status').innerText = 'Disconnected';
+        return;
+    }
+    document.getElementById('arduino1-status').innerText = 'Connected';
+    document.getElementById('arduino1-led').innerText = fields.builtin_led || 'OFF';
+    document.getElementById('arduino1-temp').innerText = fields.temperature || '-';
+    document.getElementById('arduino1-humidity').innerText = fields.humidity || '-';
+}
+
+function renderArduino3(state) {
+    const fields = state.fields || {};
+    if (state.error) {
+        document.getElementById('arduino3-status').innerText = 'Disconnected';
+        document.getElementById('arduino3-led').innerText = 'N/A';
+        document.getElementById('arduino3-relay0').innerText = 'N/A';
+        document.getElementById('arduino3-relay1').innerText = 'N/A';
+        return;
+    }
+    document.getElementById('arduino3-status').innerText = 'Connected';
+    document.getElementById('arduino3-led').innerText = fields.builtin_led || 'OFF';
+    document.getElementById('arduino3-relay0').innerText = fields.relay_channel_1 || 'OFF';
+    document.getElementById('arduino3-relay1').innerText = fields.relay_channel_2 || 'OFF';
+    document.getElementById('arduino3-mh-digital').innerText = fields.mh_digital ?? 'N/A';
+    document.getElementById('arduino3-mh-analog').innerText = fields.mh_analog ?? 'N/A';
+}
+
+const deviceRenderers = {
+    arduino1: renderArduino1,
+    arduino3: renderArduino3
+};
+
+function renderDevice(device) {
+    const render = deviceRenderers[device];
+    if (render) {
+        render(deviceState[device]);
+    }
+}
+
+function startPolling() {
+    fetchDashboard();
+    setInterval(fetchDashboard, 5000);
+}
+
+function startLiveUpdates() {
+    if (!window.EventSource) {
+        console.warn('[WARN] EventSource not supported, falling back to polling');
+        startPolling();
+        return;
+    }
+    const source = new EventSource('/api/stream');
+    source.addEventListener('snapshot', (event) => {
+        const snapshot = JSON.parse(event.data);
+        for (const [device, state] of Object.entries(snapshot)) {
+            deviceState[device] = state;
+            renderDevice(device);
+        }
+    });
+    source.addEventListener('delta', (event) => {
+        const delta = JSON.parse(event.data);
+        const state = deviceState[delta.device] || (deviceState[delta.device] = { fields: {} });
+        Object.assign(state.fields, delta.fields);
+        state.error = delta.error;
+        state.last_update = delta.last_update;
+        renderDevice(delta.device);
+    });
+    source.onerror = () => {
+        // The browser reconnects on its own; the server resends a snapshot
+        console.warn('[WARN] Live update stream interrupted, reconnecting...');
+    };
+}
+
+// Boards of other gateways (see federation.py), shown when sites are configured
+async function fetchSites() {
+    const container = document.getElementById('sites');
+    try {
+        const response = await fetch('/api/sites', { cache: 'no-store' });
+        if (!response.ok) {
+            return;
+        }
+        const sites = await response.json();
+        container.replaceChildren(...Object.entries(sites).map(([name, site]) => renderSite(name, site)));
+    } catch (error) {
+        console.error('[ERROR] Error fetching sites:', error);
+    }
+}
+
+function renderSite(name, site) {
+    const card = document.createElement('div');
+    card.className = 'card';
+    const title = document.createElement('h2');
+    const state = site.stale ? `stale, last heard ${site.age ?? '-'} s ago` : 'connected';
+    title.innerText = `${name} (${state})`;
+    card.appendChild(title);
+    for (const [board, status] of Object.entries(site.boards)) {
+        const fields = status.error ? (status.last_known || {}) : status;
+        const values = Object.entries(fields)
+            .filter(([key]) => !['site', 'stale', 'last_update', 'error', 'last_known'].includes(key))
+            .map(([key, value]) => `${key}: ${value}`);
+        const line = document.createElement('p');
+        line.innerText = `${board.split('/')[1]}: ${status.error ? status.error + ' - ' : ''}${values.join(', ') || '-'}`;
+        card.appendChild(line);
+    }
+    return card;
+}
+
+function startSites() {
+    if (document.getElementById('sites')) {
+        fetchSites();
+        setInterval(fetchSites, 5000);
+    }
+}
+
+// The page is rendered with the cached state; keep it so deltas apply to it
+function loadInitialState() {
+    const element = document.getElementById('initial-state');
+    if (!element) {
+        return;
+    }
+    for (const [device, state] of Object.entries(JSON.parse(element.textContent))) {
+        deviceState[device] = state;
+    }
+}
+
+loadInitialState();
+startLiveUpdates();
+startSites();
\ No newline at end of file